@@ -0,0 +1,101 @@
+"""
+Adversarial parsing benchmark.
+
+Times :meth:`.OpaqueKey.from_string` on hostile inputs of increasing length, for
+every key namespace, and reports how parse time grows with input length. Parsing
+is linear when the time per character stays flat as the input grows.
+
+Run with::
+
+    python benchmarks/adversarial_parsing.py [--sizes 1000,10000,100000]
+
+The inputs are longer than :attr:`.OpaqueKey.MAX_KEY_LENGTH`, which would reject them
+before any parsing, so the limit is lifted to time the parsers themselves, unless
+``--keep-limit`` is given.
+
+The script exits with status 1 if any input's parse time grows faster than
+``--max-growth`` times its length.
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import timeit
+
+from opaque_keys import InvalidKeyError, OpaqueKey
+from opaque_keys.edx.keys import AssetKey, CourseKey, DefinitionKey, UsageKey
+
+VERSION = u'519665f6223ebd6980884f2b'
+
+# (name, key type, function of n returning a hostile serialized key of roughly n characters)
+CASES = [
+    ('course plus run', CourseKey, lambda n: u'course-v1:' + u'a+' * (n // 2) + u'!'),
+    ('course plus trailing', CourseKey, lambda n: u'course-v1:' + u'a+' * (n // 2)),
+    ('course prefixes', CourseKey, lambda n: u'course-v1:o+c+' + u'branch@' * (n // 7)),
+    ('course version', CourseKey, lambda n: u'course-v1:version@' + u'a' * n + u'g'),
+    ('library plus run', CourseKey, lambda n: u'library-v1:' + u'a+' * (n // 2) + u'!'),
+    ('slashes', CourseKey, lambda n: u'slashes:' + u'a/' * (n // 2)),
+    ('block plus run', UsageKey, lambda n: u'block-v1:' + u'a+' * (n // 2) + u'!'),
+    ('block colon run', UsageKey, lambda n: u'block-v1:o+c+r+type@' + u'a:' * (n // 2) + u'!'),
+    ('block id colons', UsageKey, lambda n: u'block-v1:o+c+r+type@t+block@' + u':' * n + u'+'),
+    ('block prefixes', UsageKey, lambda n: u'block-v1:' + u'type@a+' * (n // 7)),
+    ('lib-block plus run', UsageKey, lambda n: u'lib-block-v1:' + u'a+' * (n // 2) + u'!'),
+    ('location plus run', UsageKey, lambda n: u'location:' + u'a+' * (n // 2) + u'!'),
+    ('i4x slashes', UsageKey, lambda n: u'i4x://' + u'a/' * (n // 2)),
+    ('i4x revisions', UsageKey, lambda n: u'i4x://o/c/t/n' + u'@a' * (n // 2) + u'/'),
+    ('aside v1 colons', UsageKey, lambda n: u'aside-usage-v1:' + u'$:' * (n // 2)),
+    ('aside v2 dollars', UsageKey, lambda n: u'aside-usage-v2:' + u'$$' * (n // 2) + u'$::a'),
+    ('aside v2 colons', UsageKey, lambda n: u'aside-usage-v2:' + u'$::' * (n // 3)),
+    ('asset plus run', AssetKey, lambda n: u'asset-v1:' + u'a+' * (n // 2) + u'!'),
+    ('c4x slashes', AssetKey, lambda n: u'/c4x/' + u'a/' * (n // 2) + u'@'),
+    ('definition', DefinitionKey, lambda n: u'def-v1:' + VERSION * (n // 24) + u'+type@'),
+]
+
+
+def time_parse(key_type, serialized, repeat):
+    """
+    Return the best time, in seconds, taken to parse (or reject) `serialized` as a `key_type`.
+    """
+    def parse():  # pylint: disable=missing-docstring
+        try:
+            key_type.from_string(serialized)
+        except InvalidKeyError:
+            pass
+    return min(timeit.repeat(parse, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    """
+    Run the benchmark, and return the process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="Comma-separated input lengths, in increasing order")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions per input")
+    parser.add_argument('--max-growth', type=float, default=4.0,
+                        help="Largest acceptable ratio of time-per-character between the longest and shortest inputs")
+    parser.add_argument('--keep-limit', action='store_true',
+                        help="Time the inputs with OpaqueKey.MAX_KEY_LENGTH in force, rather than lifted")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if not args.keep_limit:
+        OpaqueKey.MAX_KEY_LENGTH = None
+
+    print(u'{:<22}'.format(u'case') + u''.join(u'{:>14}'.format(size) for size in sizes) + u'{:>10}'.format(u'growth'))
+    failed = False
+    for name, key_type, make in CASES:
+        inputs = [make(size) for size in sizes]
+        times = [time_parse(key_type, serialized, args.repeat) for serialized in inputs]
+        # Ratio of the time per character at the largest size to that at the smallest
+        growth = (times[-1] / len(inputs[-1])) / (times[0] / len(inputs[0]))
+        failed = failed or growth > args.max_growth
+        print(
+            u'{:<22}'.format(name) +
+            u''.join(u'{:>12.1f}us'.format(seconds * 1e6) for seconds in times) +
+            u'{:>10.2f}'.format(growth)
+        )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Bulk name cleaning benchmark.
+
+Times cleaning the names of a synthetic course import, one name at a time with
+:meth:`.BlockUsageLocator.clean_for_url_name` (and the deprecated ``Location``
+wrapper), and as a batch with :meth:`.BlockUsageLocator.clean_all_for_url_name`,
+both for names not cleaned before and for names already cleaned. Then times the
+html ids of the deprecated usage keys of the blocks, one key at a time with
+:meth:`.BlockUsageLocator.html_id`, and as a batch with :meth:`.BlockUsageLocator.html_ids`.
+
+Run with::
+
+    python benchmarks/bulk_cleaning.py [--names 100000]
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import timeit
+import warnings
+
+from opaque_keys.edx.locations import Location
+from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
+
+# Names that many blocks of a course share
+COMMON_NAMES = [
+    u'Discussion', u'Video', u'Problem', u'Homework', u'Lecture Notes', u'Quiz', u'Readings',
+    u'Introduction', u'Summary', u'Knowledge Check', u'Open Response Assessment', u'Transcript',
+]
+WORDS = [
+    u'Week', u'Unit', u'Lesson', u'Part', u'Lab', u'Review:', u'Overview', u'Exercise', u'(optional)',
+    u'Q&A', u'Cell/Biology', u'Einf\xfchrung', u'd\xe9but', u'3.2', u'A/B', u'100%', u'#1',
+]
+
+
+def make_names(count, seed=0):
+    """
+    Return `count` names like those of the blocks of an imported course: a mix of shared
+    display names, numbered display names, and hexadecimal url names.
+    """
+    rng = random.Random(seed)
+    names = []
+    for index in range(count):
+        kind = rng.random()
+        if kind < 0.3:
+            names.append(rng.choice(COMMON_NAMES))
+        elif kind < 0.7:
+            words = rng.sample(WORDS, rng.randint(1, 4))
+            names.append(u'{} {}: {}'.format(rng.choice(COMMON_NAMES), index % 50, u' '.join(words)))
+        else:
+            names.append(u'{:032x}'.format(rng.getrandbits(128)))
+    return names
+
+
+def make_keys(names, courses=20):
+    """
+    Return a deprecated usage key for each of `names`, spread over `courses` courses.
+    """
+    course_keys = [
+        CourseLocator(u'edX', u'Course{}'.format(index), None, deprecated=True) for index in range(courses)
+    ]
+    return [
+        BlockUsageLocator(course_keys[index % courses], u'html', name, deprecated=True)
+        for index, name in enumerate(BlockUsageLocator.clean_all_for_url_name(names))
+    ]
+
+
+def least_time(function, inputs):
+    """
+    Return the least time taken by `function` on any of `inputs`, calling it once on each.
+    """
+    times = []
+    for value in inputs:
+        start = timeit.default_timer()
+        function(value)
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+
+def main(argv=None):
+    """
+    Run the benchmark, and return the process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000, help="Number of names in the import")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions")
+    args = parser.parse_args(argv)
+    names = make_names(args.names)
+    # Names that no repetition has cleaned before, and keys whose html ids haven't been built
+    fresh_names = [[u'{} ({})'.format(name, index) for name in names] for index in range(args.repeat)]
+    fresh_keys = [make_keys(names) for __ in range(2 * args.repeat)]
+
+    def one_at_a_time(values):  # pylint: disable=missing-docstring
+        return [BlockUsageLocator.clean_for_url_name(value) for value in values]
+
+    def location_one_at_a_time(values):  # pylint: disable=missing-docstring
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return [Location.clean_for_url_name(value) for value in values]
+
+    def html_id_at_a_time(keys):  # pylint: disable=missing-docstring
+        return [key.html_id() for key in keys]
+
+    expected = one_at_a_time(names)
+    if BlockUsageLocator.clean_all_for_url_name(names) != expected or \
+            BlockUsageLocator.clean_all_for_url_name(names) != expected:
+        print(u'Batch cleaning differs from cleaning one name at a time')
+        return 1
+    if BlockUsageLocator.html_ids(make_keys(names)) != html_id_at_a_time(make_keys(names)):
+        print(u'Batch html ids differ from html ids one key at a time')
+        return 1
+
+    print(u'{} names, {} distinct'.format(len(names), len(set(names))))
+    for name, function, inputs in [
+            (u'one at a time', one_at_a_time, fresh_names),
+            (u'Location one at a time', location_one_at_a_time, fresh_names),
+            (u'batch, new names', BlockUsageLocator.clean_all_for_url_name, fresh_names),
+            (u'batch, cleaned names', BlockUsageLocator.clean_all_for_url_name, [names] * args.repeat),
+            (u'html_id one at a time', html_id_at_a_time, fresh_keys[:args.repeat]),
+            (u'html_ids', BlockUsageLocator.html_ids, fresh_keys[args.repeat:]),
+    ]:
+        seconds = least_time(function, inputs)
+        print(u'{:<24}{:>10.1f}ms{:>10.2f}us/name'.format(name, seconds * 1e3, seconds * 1e6 / len(names)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,7 @@ from abc import ABCMeta, abstractmethod
 from functools import total_ordering
 
 from six import (
+    binary_type,
     iteritems,
     python_2_unicode_compatible,
     text_type,
@@ -33,14 +34,23 @@ class InvalidKeyError(Exception):
 class OpaqueKeyMetaclass(ABCMeta):
     """
     Metaclass for :class:`OpaqueKey`. Sets the default value for the values in ``KEY_FIELDS`` to
-    ``None``.
+    ``None``, except for those that a base class stores with a (non-abstract) data descriptor.
     """
     def __new__(mcs, name, bases, attrs):
         if '__slots__' not in attrs:
             for field in attrs.get('KEY_FIELDS', []):
-                attrs.setdefault(field, None)
+                if not any(mcs._stores_field(base, field) for base in bases):
+                    attrs.setdefault(field, None)
         return super(OpaqueKeyMetaclass, mcs).__new__(mcs, name, bases, attrs)
 
+    @staticmethod
+    def _stores_field(base, field):
+        """
+        Return whether `base` stores `field` with a data descriptor, such as a slot.
+        """
+        descriptor = getattr(base, field, None)
+        return hasattr(descriptor, '__set__') and not getattr(descriptor, '__isabstractmethod__', False)
+
 
 @python_2_unicode_compatible
 @total_ordering
@@ -104,6 +114,11 @@ class OpaqueKey(with_metaclass(OpaqueKeyMetaclass)):
     CANONICAL_NAMESPACE = None
     NAMESPACE_SEPARATOR = u':'
     CHECKED_INIT = True
+    # The longest serialized key that :meth:`from_string` and :meth:`from_bytes` will parse, or
+    # None for no limit. Longer input is rejected before any key class sees it, which bounds the
+    # time spent on hostile input independently of the key formats installed. Real keys are far
+    # shorter (most are stored in 255 character columns).
+    MAX_KEY_LENGTH = 1024
 
     # ============= ABSTRACT METHODS ==============
     @classmethod
@@ -150,6 +165,47 @@ class OpaqueKey(with_metaclass(OpaqueKeyMetaclass)):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def _from_bytes(cls, serialized):
+        """
+        Return an instance of `cls` parsed from its UTF-8 encoded `serialized` form.
+
+        Subclasses can override this to match directly against the encoded bytes;
+        by default, `serialized` is decoded and passed to :meth:`_from_string`.
+
+        Args:
+            cls: The :class:`OpaqueKey` subclass.
+            serialized (bytes): A serialized :class:`OpaqueKey`, with namespace already removed.
+
+        Raises:
+            InvalidKeyError: Should be raised if `serialized` is not a valid serialized key
+                understood by `cls`.
+        """
+        return cls._from_string(cls._decode_bytes(serialized))
+
+    @classmethod
+    def _from_deprecated_bytes(cls, serialized):
+        """
+        Return an instance of `cls` parsed from its UTF-8 encoded deprecated `serialized` form.
+
+        By default, `serialized` is decoded and passed to :meth:`_from_deprecated_string`.
+
+        Raises:
+            InvalidKeyError: Should be raised if `serialized` is not a valid serialized key
+                understood by `cls`.
+        """
+        return cls._from_deprecated_string(cls._decode_bytes(serialized))
+
+    @classmethod
+    def _decode_bytes(cls, serialized):
+        """
+        Decode the UTF-8 bytes `serialized`, raising InvalidKeyError if they aren't valid UTF-8.
+        """
+        try:
+            return serialized.decode('utf-8')
+        except UnicodeDecodeError:
+            raise InvalidKeyError(cls, serialized)
+
     def _to_deprecated_string(self):
         """
         Return a deprecated serialization of `self`.
@@ -183,7 +239,7 @@ class OpaqueKey(with_metaclass(OpaqueKeyMetaclass)):
         Args:
             serialized: A stringified form of a :class:`OpaqueKey`
         """
-        if serialized is None:
+        if serialized is None or cls._too_long(serialized):
             raise InvalidKeyError(cls, serialized)
 
         # pylint: disable=protected-access
@@ -197,6 +253,56 @@ class OpaqueKey(with_metaclass(OpaqueKeyMetaclass)):
                 return cls.deprecated_fallback._from_deprecated_string(serialized)
             raise InvalidKeyError(cls, serialized)
 
+    @classmethod
+    def from_bytes(cls, serialized):
+        """
+        Return a :class:`OpaqueKey` object deserialized from the UTF-8 encoded
+        `serialized` argument. This object will be an instance of a subclass of
+        the `cls` argument.
+
+        Only the namespace and the fields extracted by the key implementation are
+        decoded, so keys read from event streams don't need to be decoded up front.
+
+        Args:
+            serialized (bytes): A UTF-8 encoded stringified form of a :class:`OpaqueKey`
+        """
+        if serialized is None:
+            raise InvalidKeyError(cls, serialized)
+        if not isinstance(serialized, binary_type):
+            serialized = memoryview(serialized).tobytes()
+        if cls._too_long(serialized):
+            raise InvalidKeyError(cls, serialized)
+
+        # pylint: disable=protected-access
+        # load drivers before checking for attr
+        cls._drivers()
+        try:
+            namespace, separator, rest = serialized.partition(cls.NAMESPACE_SEPARATOR.encode('ascii'))
+            if not separator:
+                raise InvalidKeyError(cls, serialized)
+            return cls.get_namespace_plugin(cls._decode_bytes(namespace))._from_bytes(rest)
+        except InvalidKeyError:
+            if hasattr(cls, 'deprecated_fallback'):
+                return cls.deprecated_fallback._from_deprecated_bytes(serialized)
+            raise InvalidKeyError(cls, serialized)
+
+    @classmethod
+    def from_buffer(cls, serialized):
+        """
+        Return a :class:`OpaqueKey` object deserialized from a buffer (such as a
+        ``memoryview`` or ``bytearray``) holding a UTF-8 encoded stringified key.
+
+        See :meth:`from_bytes`.
+        """
+        return cls.from_bytes(serialized)
+
+    @classmethod
+    def _too_long(cls, serialized):
+        """
+        Return whether `serialized` is longer than ``MAX_KEY_LENGTH``.
+        """
+        return cls.MAX_KEY_LENGTH is not None and len(serialized) > cls.MAX_KEY_LENGTH
+
     @classmethod
     def _separate_namespace(cls, serialized):
         """
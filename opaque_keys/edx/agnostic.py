@@ -0,0 +1,73 @@
+"""
+Mappings keyed on the identity of locators, ignoring some of their fields.
+
+Caches of course content are usually looked up by the version agnostic identity of
+a locator. Keying a plain dict by ``key.version_agnostic()`` builds one or two
+throwaway locators for every lookup; :class:`AgnosticKeyDict` instead hashes and
+compares the locator's fields directly, skipping the ignored ones.
+"""
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping  # pylint: disable=deprecated-class
+
+from opaque_keys.edx.locator import BlockLocatorBase
+
+
+class AgnosticKeyDict(MutableMapping):
+    """
+    A mapping from locators to values, in which locators that differ only in the fields
+    named in `ignore` (by default, their version) are the same key.
+
+    As with a dict, the first locator stored for a key is the one returned when iterating.
+
+    Args:
+        items: A mapping, or iterable of (locator, value) pairs, to initialize the mapping with.
+        ignore: The names of the (course key) fields to ignore.
+    """
+    def __init__(self, items=(), ignore=BlockLocatorBase.VERSION_AGNOSTIC):
+        self.ignore = frozenset(ignore)
+        # Maps the agnostic identity of each locator to the (locator, value) stored for it
+        self._data = {}
+        self.update(items)
+
+    def _identity(self, key):
+        """
+        Return the agnostic identity of the locator `key`.
+        """
+        try:
+            return key._agnostic_key(self.ignore)  # pylint: disable=protected-access
+        except AttributeError:
+            raise TypeError("{!r} keys must be locators, not {!r}".format(self.__class__.__name__, key))
+
+    def __getitem__(self, key):
+        try:
+            return self._data[self._identity(key)][1]
+        except KeyError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        identity = self._identity(key)
+        existing = self._data.get(identity)
+        self._data[identity] = (key if existing is None else existing[0], value)
+
+    def __delitem__(self, key):
+        try:
+            del self._data[self._identity(key)]
+        except KeyError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            return self._identity(key) in self._data
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        return (key for key, __ in self._data.values())
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '{}({!r}, ignore={!r})'.format(self.__class__.__name__, dict(self.items()), sorted(self.ignore))
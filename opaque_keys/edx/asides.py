@@ -254,6 +254,19 @@ class AsideUsageKeyV2(AsideUsageKey):  # pylint: disable=abstract-method
         """
         return self.replace(usage_key=self.usage_key.map_into_course(course_key))
 
+    @classmethod
+    def _map_keys_of_type_into_course(cls, keys, course_key):
+        """
+        Return a list of each of `keys` mapped into `course_key`, as by :meth:`map_into_course`,
+        mapping all of their usage keys at once.
+        """
+        usage_keys = UsageKey.map_keys_into_course([key.usage_key for key in keys], course_key)
+        return [
+            key if usage_key is key.usage_key or usage_key == key.usage_key
+            else cls(usage_key, key.aside_type, deprecated=key.deprecated)
+            for key, usage_key in zip(keys, usage_keys)
+        ]
+
     def replace(self, **kwargs):
         """
         Return: a new :class:`AsideUsageKeyV2` with ``KEY_FIELDS`` specified in ``kwargs`` replaced
@@ -0,0 +1,174 @@
+"""
+Indexing the asset keys of courses.
+
+Listing the assets of a course, or finding one by its path, shouldn't mean parsing every
+asset key of the course. :class:`AssetIndex` holds many asset keys, looks them up by
+course, asset type and path in constant time, and lists the assets of a course whose
+paths start with a prefix from a sorted array of its paths::
+
+    index = AssetIndex(serialized_asset_keys)
+    logo = index.get(course_key, u'asset', u'logo.png')
+    images = index.assets(course_key, prefix=u'images_')
+"""
+from bisect import bisect_left
+
+from opaque_keys.edx.keys import AssetKey
+from opaque_keys.edx.locator import CourseLocator
+
+
+def _course_identity(course_key):
+    """
+    Return a value that's equal for equal course keys, like `course_key` itself, but is much
+    cheaper to hash and compare than a course locator.
+    """
+    if isinstance(course_key, CourseLocator):
+        # The fields that CourseLocator equality compares, so that equal keys of its subclasses
+        # (such as SlashSeparatedCourseKey) have the same identity
+        return (
+            course_key.org, course_key.course, course_key.run, course_key.branch,
+            course_key.version_guid, course_key.CANONICAL_NAMESPACE, course_key.deprecated,
+        )
+    return course_key
+
+
+class _CourseAssets(object):
+    """
+    The assets of a single course in an :class:`AssetIndex`.
+    """
+    __slots__ = ('course_key', 'keys', 'paths', 'is_sorted')
+
+    def __init__(self, course_key):
+        self.course_key = course_key
+        # Maps each (asset_type, path) to its asset key
+        self.keys = {}
+        # Each (path, asset_type), sorted when is_sorted is true
+        self.paths = []
+        self.is_sorted = True
+
+    def sorted_paths(self):
+        """
+        Return the sorted list of the (path, asset_type) of each asset.
+        """
+        if not self.is_sorted:
+            self.paths.sort()
+            self.is_sorted = True
+        return self.paths
+
+
+class AssetIndex(object):
+    """
+    An index of asset keys, by course, asset type and path.
+
+    Assets are indexed by the course key of their asset keys as it is, so keys of the same
+    course with different branches or versions, or in deprecated and canonical forms,
+    are indexed under different course keys.
+
+    Args:
+        asset_keys: An iterable of asset keys, or their serializations, to index.
+    """
+    def __init__(self, asset_keys=()):
+        # Maps the _course_identity of each course key to its _CourseAssets
+        self._courses = {}
+        self._count = 0
+        self.update(asset_keys)
+
+    def add(self, asset_key):
+        """
+        Add `asset_key`, or its serialization, to the index, replacing any asset key with the
+        same course, asset type and path.
+        """
+        if not isinstance(asset_key, AssetKey):
+            asset_key = AssetKey.from_string(asset_key)
+        course_key = asset_key.course_key
+        identity = _course_identity(course_key)
+        assets = self._courses.get(identity)
+        if assets is None:
+            assets = self._courses[identity] = _CourseAssets(course_key)
+        asset = (asset_key.asset_type, asset_key.path)
+        if asset not in assets.keys:
+            entry = (asset_key.path, asset_key.asset_type)
+            paths = assets.paths
+            # Keys that are added in order keep the paths sorted
+            if assets.is_sorted and paths and entry < paths[-1]:
+                assets.is_sorted = False
+            paths.append(entry)
+            self._count += 1
+        assets.keys[asset] = asset_key
+
+    def update(self, asset_keys):
+        """
+        Add each of `asset_keys`, or their serializations, to the index.
+        """
+        for asset_key in asset_keys:
+            self.add(asset_key)
+
+    def discard(self, asset_key):
+        """
+        Remove `asset_key`, or its serialization, from the index, if it's in it.
+        """
+        if not isinstance(asset_key, AssetKey):
+            asset_key = AssetKey.from_string(asset_key)
+        if asset_key not in self:
+            return
+        identity = _course_identity(asset_key.course_key)
+        assets = self._courses[identity]
+        del assets.keys[(asset_key.asset_type, asset_key.path)]
+        entry = (asset_key.path, asset_key.asset_type)
+        if assets.is_sorted:
+            del assets.paths[bisect_left(assets.paths, entry)]
+        else:
+            assets.paths.remove(entry)
+        if not assets.keys:
+            del self._courses[identity]
+        self._count -= 1
+
+    def get(self, course_key, asset_type, path):
+        """
+        Return the asset key of `course_key` with `asset_type` and `path`, or None if it isn't
+        in the index.
+        """
+        assets = self._courses.get(_course_identity(course_key))
+        if assets is None:
+            return None
+        return assets.keys.get((asset_type, path))
+
+    def assets(self, course_key, prefix=u'', asset_type=None):
+        """
+        Return a list of the asset keys of `course_key` whose paths start with `prefix`,
+        ordered by path, and only of `asset_type`, if it's given.
+        """
+        assets = self._courses.get(_course_identity(course_key))
+        if assets is None:
+            return []
+        paths = assets.sorted_paths()
+        keys = assets.keys
+        result = []
+        for index in range(bisect_left(paths, (prefix,)), len(paths)):
+            path, path_asset_type = paths[index]
+            if not path.startswith(prefix):
+                break
+            if asset_type is None or path_asset_type == asset_type:
+                result.append(keys[(path_asset_type, path)])
+        return result
+
+    def course_keys(self):
+        """
+        Return a list of the course keys with assets in the index.
+        """
+        return [assets.course_key for assets in self._courses.values()]
+
+    def __contains__(self, asset_key):
+        if not isinstance(asset_key, AssetKey):
+            return False
+        assets = self._courses.get(_course_identity(asset_key.course_key))
+        if assets is None:
+            return False
+        return assets.keys.get((asset_key.asset_type, asset_key.path)) == asset_key
+
+    def __iter__(self):
+        for assets in self._courses.values():
+            for asset_key in assets.keys.values():
+                yield asset_key
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,143 @@
+"""
+Caches for the regular expressions that validate key fields.
+
+Locators check each of their fields against a regex whenever they're constructed,
+but the values of those fields (orgs, courses, runs, block types) are drawn from
+vocabularies that are tiny compared to the number of keys built. :class:`CachedPattern`
+remembers the result of matching each string it has seen, so a repeated field is
+validated with a dict lookup instead of a regex match.
+
+Counting cache hits would cost about as much as the regex matches they save, so hit
+rates are only measured while :func:`track_pattern_stats` is enabled. Use it to check
+how well the caches fit a workload::
+
+    track_pattern_stats()
+    ...  # build some keys
+    for name, info in pattern_cache_info().items():
+        print(name, info.hits / float(info.hits + info.misses))
+"""
+from collections import namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Every CachedPattern created, for `track_pattern_stats` and `pattern_cache_info`
+_PATTERNS = []
+
+
+class _ResultCache(dict):
+    """
+    A dict of the results of `method`, keyed by its argument, that computes missing entries.
+
+    Looking up an existing entry is handled entirely by ``dict.__getitem__``, without running
+    any Python code.
+    """
+    __slots__ = ('method', 'maxsize', 'misses')
+
+    def __init__(self, method, maxsize):
+        super(_ResultCache, self).__init__()
+        self.method = method
+        self.maxsize = maxsize
+        self.misses = 0
+
+    def __missing__(self, string):
+        result = self.method(string)
+        self.misses += 1
+        if len(self) >= self.maxsize:
+            self.clear()
+        self[string] = result
+        return result
+
+
+class CachedPattern(object):
+    """
+    A compiled regex whose ``match`` and ``search`` results are cached by string.
+
+    All other attributes (``pattern``, ``sub``, and so on) are those of the wrapped regex.
+
+    The cache holds at most `maxsize` results for each method. When it fills up it is
+    emptied, so a stream of unique strings can't grow it without bound.
+
+    Args:
+        regex: A compiled regex.
+        name (str): The name to report the cache's statistics under. Defaults to the regex's pattern.
+        maxsize (int): The maximum number of results cached for each method.
+    """
+    def __init__(self, regex, name=None, maxsize=4096):
+        self.regex = regex
+        self.name = name or regex.pattern
+        self.maxsize = maxsize
+        self._match_cache = _ResultCache(regex.match, maxsize)
+        self._search_cache = _ResultCache(regex.search, maxsize)
+        self.tracking = False
+        self._lookups = 0
+        self.track_stats(False)
+        _PATTERNS.append(self)
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't the CachedPattern's own
+        if name == 'regex':
+            raise AttributeError(name)
+        return getattr(self.regex, name)
+
+    def __repr__(self):
+        return 'CachedPattern({!r})'.format(self.regex)
+
+    def _counted(self, cache):
+        """
+        Return a function that looks strings up in `cache`, counting the lookups.
+        """
+        def lookup(string):  # pylint: disable=missing-docstring
+            self._lookups += 1
+            return cache[string]
+        return lookup
+
+    def track_stats(self, enabled=True):
+        """
+        Start (or, if not `enabled`, stop) counting cache hits, and reset the statistics.
+
+        When not tracking, ``match`` and ``search`` are the ``__getitem__`` of their caches.
+        """
+        self.tracking = enabled
+        self._lookups = self._match_cache.misses = self._search_cache.misses = 0
+        if enabled:
+            self.match = self._counted(self._match_cache)
+            self.search = self._counted(self._search_cache)
+        else:
+            self.match = self._match_cache.__getitem__
+            self.search = self._search_cache.__getitem__
+
+    def cache_info(self):
+        """
+        Return a :class:`CacheInfo` of the number of cache hits and misses since statistics were
+        last reset, and the cache's size. ``hits`` is None unless stats are being tracked.
+        """
+        misses = self._match_cache.misses + self._search_cache.misses
+        return CacheInfo(
+            self._lookups - misses if self.tracking else None,
+            misses,
+            self.maxsize,
+            len(self._match_cache) + len(self._search_cache),
+        )
+
+    def cache_clear(self):
+        """
+        Empty the cache, and reset its statistics.
+        """
+        self._match_cache.clear()
+        self._search_cache.clear()
+        self.track_stats(self.tracking)
+
+
+def track_pattern_stats(enabled=True):
+    """
+    Start (or, if not `enabled`, stop) counting cache hits of every :class:`CachedPattern`.
+    """
+    for pattern in _PATTERNS:
+        pattern.track_stats(enabled)
+
+
+def pattern_cache_info():
+    """
+    Return a dict mapping the name of each :class:`CachedPattern` to its :class:`CacheInfo`.
+    """
+    return {pattern.name: pattern.cache_info() for pattern in _PATTERNS}
@@ -0,0 +1,130 @@
+"""
+Filling in the runs of deprecated keys.
+
+Deprecated usage and asset keys (``i4x://org/course/...`` and ``/c4x/org/course/...``)
+don't include the run of their course, so they parse into keys whose course key has a
+run of None. :class:`RunCatalog` maps the org and course of each course to its run, and
+fills the runs into many keys at once, sharing one course key between the keys of each
+course::
+
+    with io.open('course_ids.txt', encoding='utf-8') as course_ids:
+        catalog = RunCatalog.from_file(course_ids)
+    keys = catalog.upgrade_keys(UsageKey.from_string(serialized) for serialized in usage_ids)
+    print(catalog.unresolved)
+"""
+from collections import Counter
+
+from opaque_keys.edx.keys import CourseKey, CourseObjectMixin
+from opaque_keys.edx.locator import LibraryLocator
+
+
+class RunCatalog(object):
+    """
+    A catalog of the run of each (org, course).
+
+    An (org, course) listed with more than one run is ambiguous, and isn't resolved.
+
+    Attributes:
+        unresolved (Counter): The number of keys left without a run, by (org, course).
+
+    Args:
+        course_keys: An iterable of course keys, or their serializations, to catalog.
+    """
+    def __init__(self, course_keys=()):
+        # Maps each (org, course) to its run, or to None if it's ambiguous
+        self._runs = {}
+        # Maps each (org, course, branch) to the deprecated course key with its run filled in
+        self._course_keys = {}
+        self.unresolved = Counter()
+        self.update(course_keys)
+
+    @classmethod
+    def from_file(cls, lines):
+        """
+        Return a catalog of the course keys serialized on each non-blank line of the text
+        file (or other iterable of lines) `lines`.
+        """
+        return cls(line.strip() for line in lines if line.strip())
+
+    def update(self, course_keys):
+        """
+        Add each of `course_keys`, or their serializations, to the catalog.
+        """
+        runs = self._runs
+        for course_key in course_keys:
+            if not isinstance(course_key, CourseKey):
+                course_key = CourseKey.from_string(course_key)
+            if isinstance(course_key, LibraryLocator) or course_key.run is None:
+                continue
+            course = (course_key.org, course_key.course)
+            if course not in runs:
+                runs[course] = course_key.run
+            elif runs[course] != course_key.run:
+                runs[course] = None
+        self._course_keys.clear()
+
+    @property
+    def ambiguous(self):
+        """
+        The set of each (org, course) listed with more than one run.
+        """
+        return set(course for course, run in self._runs.items() if run is None)
+
+    def run(self, org, course):
+        """
+        Return the run of `org` and `course`, or None if it isn't known.
+        """
+        return self._runs.get((org, course))
+
+    def _upgrade_course_key(self, course_key):
+        """
+        Return the deprecated `course_key` with its run filled in, if it's missing and known.
+        """
+        if not course_key.deprecated or course_key.run is not None:
+            return course_key
+        identity = (course_key.org, course_key.course, course_key.branch)
+        try:
+            return self._course_keys[identity]
+        except KeyError:
+            pass
+        run = self._runs.get(identity[:2])
+        if run is None:
+            self.unresolved[identity[:2]] += 1
+            return course_key
+        upgraded = self._course_keys[identity] = course_key.replace(run=run)
+        return upgraded
+
+    def upgrade_keys(self, keys):
+        """
+        Return a list of each of `keys` (course keys, or keys of objects in courses), with the
+        run of its course filled in where it's missing from a deprecated key and known.
+
+        The upgraded keys of each course and branch share a course key. Keys that can't be
+        upgraded are returned unchanged, and counted in ``unresolved``.
+        """
+        keys = list(keys)
+        upgraded = list(keys)
+        # Maps the id of each upgraded course key to it, and the indexes of the keys to map into it
+        courses = {}
+        for index, key in enumerate(keys):
+            if isinstance(key, CourseKey):
+                upgraded[index] = self._upgrade_course_key(key)
+                continue
+            course_key = getattr(key, 'course_key', None)
+            if course_key is None:
+                continue
+            upgraded_course_key = self._upgrade_course_key(course_key)
+            if upgraded_course_key is not course_key:
+                courses.setdefault(id(upgraded_course_key), (upgraded_course_key, []))[1].append(index)
+
+        for course_key, indexes in courses.values():
+            mapped = CourseObjectMixin.map_keys_into_course([keys[index] for index in indexes], course_key)
+            for index, key in zip(indexes, mapped):
+                upgraded[index] = key
+        return upgraded
+
+    def upgrade_key(self, key):
+        """
+        Return `key` with the run of its course filled in, as by :meth:`upgrade_keys`.
+        """
+        return self.upgrade_keys([key])[0]
@@ -0,0 +1,191 @@
+"""
+Reporting the use of deprecated APIs.
+
+By default, each use of a deprecated property or method of a key raises a
+``DeprecationWarning``, as it always has. Every warning walks the stack and consults the
+warnings registry, even when the warning is filtered out, which is expensive on code
+paths that use deprecated APIs heavily.
+
+:class:`DeprecationCounter` replaces the warnings with counters of the uses at each call
+site, and the stacks of a sample of them::
+
+    counter = DeprecationCounter()
+    with counter.installed():
+        run_legacy_code()
+    counter.dump(sys.stderr)
+
+:func:`ignore` drops the uses altogether. Any other callable that takes
+``(message, stacklevel)`` can be installed with :func:`set_deprecation_handler`.
+"""
+from __future__ import print_function
+
+import sys
+import traceback
+import warnings
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+
+def warn(message, stacklevel):
+    """
+    Raise a ``DeprecationWarning`` with `message`. This is the default deprecation handler.
+
+    `stacklevel` is as for :func:`deprecation_warning`.
+    """
+    # Skip the frames of this function and deprecation_warning
+    warnings.warn(message, DeprecationWarning, stacklevel=stacklevel + 2)
+
+
+def ignore(message, stacklevel):  # pylint: disable=unused-argument
+    """
+    A deprecation handler that ignores every use of deprecated APIs, at the least cost.
+    """
+
+
+_HANDLER = [warn]
+
+
+def deprecation_warning(message, stacklevel=2):
+    """
+    Report the use of a deprecated API, described by `message`, to the current deprecation handler.
+
+    `stacklevel` is as for :func:`warnings.warn`: 2 (the default) attributes the use to the
+    caller of the function that calls ``deprecation_warning``.
+    """
+    _HANDLER[0](message, stacklevel)
+
+
+def get_deprecation_handler():
+    """
+    Return the current deprecation handler.
+    """
+    return _HANDLER[0]
+
+
+def set_deprecation_handler(handler):
+    """
+    Make `handler` the deprecation handler, and return the previous one.
+
+    `handler` is called with the message and stacklevel of each use of a deprecated API,
+    as passed to :func:`deprecation_warning`. None restores the default handler, :func:`warn`.
+    """
+    previous = _HANDLER[0]
+    _HANDLER[0] = warn if handler is None else handler
+    return previous
+
+
+CallSite = namedtuple('CallSite', ['filename', 'lineno', 'function', 'message'])
+
+
+class DeprecationCounter(object):
+    """
+    A deprecation handler that counts the uses of deprecated APIs at each call site, instead
+    of raising a warning for each of them.
+
+    The stack of the first use at each call site, and of every `sample_every`-th use after
+    it, is captured, up to `max_stacks` stacks of `stack_limit` frames per call site.
+    """
+    def __init__(self, sample_every=1000, max_stacks=5, stack_limit=20):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.sample_every = sample_every
+        self.max_stacks = max_stacks
+        self.stack_limit = stack_limit
+        # Count by (code, instruction, message), which is cheaper to hash than the CallSite
+        # (and needs no line number lookup), and only build the CallSite on the first use
+        self._counts = {}
+        self._sites = {}
+        self._stacks = {}
+
+    def __call__(self, message, stacklevel):
+        # Skip the frames of this method and deprecation_warning
+        try:
+            frame = sys._getframe(stacklevel + 1)  # pylint: disable=protected-access
+        except ValueError:
+            frame = sys._getframe(1)  # pylint: disable=protected-access
+        identity = (frame.f_code, frame.f_lasti, message)
+        counts = self._counts
+        try:
+            count = counts[identity] = counts[identity] + 1
+        except KeyError:
+            count = counts[identity] = 1
+            self._sites[identity] = CallSite(
+                frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, message
+            )
+        if (count - 1) % self.sample_every == 0:
+            stacks = self._stacks.setdefault(identity, [])
+            if len(stacks) < self.max_stacks:
+                stacks.append(traceback.extract_stack(frame, self.stack_limit))
+
+    @property
+    def counts(self):
+        """
+        A Counter of the number of uses, by :class:`CallSite`.
+        """
+        counts = Counter()
+        for identity, count in self._counts.items():
+            counts[self._sites[identity]] += count
+        return counts
+
+    @property
+    def stacks(self):
+        """
+        The captured stacks (lists of :func:`traceback.extract_stack` entries), by :class:`CallSite`.
+        """
+        stacks = {}
+        for identity, site_stacks in self._stacks.items():
+            stacks.setdefault(self._sites[identity], []).extend(site_stacks)
+        return stacks
+
+    def reset(self):
+        """
+        Forget every counted use.
+        """
+        self._counts.clear()
+        self._sites.clear()
+        self._stacks.clear()
+
+    def install(self):
+        """
+        Make this counter the deprecation handler, and return the previous handler.
+        """
+        return set_deprecation_handler(self)
+
+    @contextmanager
+    def installed(self):
+        """
+        Make this counter the deprecation handler for the duration of a ``with`` block.
+        """
+        previous = self.install()
+        try:
+            yield self
+        finally:
+            set_deprecation_handler(previous)
+
+    def report(self):
+        """
+        Return a list of ``(call_site, count, stacks)`` for each call site, the most used first.
+        """
+        stacks = self.stacks
+        return [(site, count, stacks.get(site, [])) for site, count in self.counts.most_common()]
+
+    def dump(self, stream=None, stacks=True):
+        """
+        Write a report of the counted uses to `stream` (by default, ``sys.stderr``),
+        including the sampled stacks if `stacks` is true.
+        """
+        if stream is None:
+            stream = sys.stderr
+        report = self.report()
+        print(u'{} uses of deprecated APIs at {} call sites'.format(
+            sum(count for __, count, __ in report), len(report)
+        ), file=stream)
+        for site, count, site_stacks in report:
+            print(u'{:>8} {}:{} in {}: {}'.format(
+                count, site.filename, site.lineno, site.function, site.message
+            ), file=stream)
+            if stacks:
+                for stack in site_stacks:
+                    for line in traceback.format_list(stack):
+                        stream.write(u''.join(u' ' * 9 + part for part in line.splitlines(True)))
+                    print(u'', file=stream)
@@ -0,0 +1,148 @@
+"""
+Declarative grammars for the '+'-separated serializations of locator keys.
+
+A :class:`KeyGrammar` lists the fields of a key in order. From that single
+description it generates both the regular expression used to parse a key and
+the templates used to serialize one, so that the two can't drift apart.
+
+Every field is a run of characters from its character class, optionally
+preceded by a ``<prefix>@`` marker, and fields are separated by ``+``. Neither
+``+`` nor ``@`` may appear in a field's character class, so each field run ends
+at a fixed position and the generated regular expressions match in time linear
+in the length of their input.
+"""
+import re
+
+SEPARATOR = u'+'
+PREFIX_SEPARATOR = u'@'
+
+# Separator: requires a non-trailing '+' or end of string
+_SEP_SOURCE = r'(?:\+(?=.)|\Z)'
+
+
+class Field(object):
+    """
+    A single field of a key.
+
+    Args:
+        name (str): The name of the field, which is also the name of its group in the generated regex.
+        chars (str): A regex character class matching each character of the field's value.
+        prefix (str): If set, the field is serialized as ``<prefix>@<value>``.
+        optional (bool): Whether the field may be omitted.
+    """
+    def __init__(self, name, chars, prefix=None, optional=False):
+        for reserved in (SEPARATOR, PREFIX_SEPARATOR):
+            if re.match(chars, reserved, re.UNICODE):
+                raise ValueError("The characters of field {!r} may not include {!r}".format(name, reserved))
+        self.name = name
+        self.chars = chars
+        self.prefix = prefix
+        self.optional = optional
+
+    def pattern(self, group_prefix=u''):
+        """
+        Return the regex source matching this field, in a group named `group_prefix` + the field name.
+        """
+        marker = re.escape(self.prefix + PREFIX_SEPARATOR) if self.prefix else u''
+        return u'{}(?P<{}{}>{}+)'.format(marker, group_prefix, self.name, self.chars)
+
+    @property
+    def template(self):
+        """The format string serializing this field."""
+        if self.prefix:
+            return u'{}{}{{{}}}'.format(self.prefix, PREFIX_SEPARATOR, self.name)
+        return u'{{{}}}'.format(self.name)
+
+
+class FieldGroup(object):
+    """
+    A run of unprefixed fields, which is present or omitted as a whole.
+
+    The first field of the group is required whenever the group is present. Later
+    fields can be marked `optional`, in which case they may be left off the end.
+    """
+    def __init__(self, *fields, **kwargs):
+        self.optional = kwargs.pop('optional', False)
+        if kwargs:
+            raise TypeError('FieldGroup() got unexpected arguments {!r}'.format(list(kwargs)))
+        if not fields or fields[0].optional:
+            raise ValueError("A FieldGroup must start with a required field")
+        if any(field.prefix for field in fields):
+            raise ValueError("The fields of a FieldGroup can't have prefixes")
+        self.fields = fields
+
+    def pattern(self, group_prefix=u''):
+        """
+        Return the regex source matching this group of fields, in groups named `group_prefix` + the field name.
+        """
+        parts = [self.fields[0].pattern(group_prefix)]
+        for field in self.fields[1:]:
+            part = re.escape(SEPARATOR) + field.pattern(group_prefix)
+            parts.append(u'(?:{})?'.format(part) if field.optional else part)
+        return u''.join(parts)
+
+
+class KeyGrammar(object):
+    """
+    The grammar of a '+'-separated key: a sequence of :class:`Field` and :class:`FieldGroup`
+    elements.
+    """
+    def __init__(self, *elements):
+        self.elements = elements
+        self.fields = []
+        for element in elements:
+            self.fields.extend(element.fields if isinstance(element, FieldGroup) else [element])
+        self.names = tuple(field.name for field in self.fields)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Duplicate field names in {!r}".format(self.names))
+
+        self.source = self.pattern()
+        self.regex = re.compile(u'^' + self.source + r'\Z', re.UNICODE)
+        # In bytes mode, character classes only match ASCII, so only ASCII keys will match.
+        self.bytes_regex = re.compile((u'^' + self.source + r'\Z').encode('ascii'))
+        self._templates = {}
+
+    def pattern(self, group_prefix=u''):
+        """
+        Return the (unanchored) regex source matching every field in the grammar, with each
+        field captured by a group named `group_prefix` + the field name.
+
+        The prefix allows several grammars to be combined into a single regex.
+        """
+        parts = []
+        for index, element in enumerate(self.elements):
+            part = element.pattern(group_prefix)
+            if index < len(self.elements) - 1:
+                part += _SEP_SOURCE
+            parts.append(u'(?:{})?'.format(part) if element.optional else part)
+        return u''.join(parts)
+
+    def parse(self, serialized):
+        """
+        Return a dict mapping each field name in the grammar to its value in `serialized`
+        (or None, for omitted fields), or None if `serialized` doesn't match the grammar.
+        """
+        match = self.regex.match(serialized)
+        if match is None:
+            return None
+        return match.groupdict()
+
+    def template(self, *names):
+        """
+        Return the format string serializing the fields `names`, which must be in grammar order.
+        """
+        try:
+            return self._templates[names]
+        except KeyError:
+            fields = [field for field in self.fields if field.name in names]
+            if tuple(field.name for field in fields) != names:
+                raise ValueError("{!r} aren't fields of this grammar, in order".format(names))
+            template = self._templates[names] = SEPARATOR.join(field.template for field in fields)
+            return template
+
+    def serialize(self, **values):
+        """
+        Return the serialization of the fields in `values`. Fields whose value is None are omitted.
+        """
+        names = tuple(name for name in self.names if values.get(name) is not None)
+        return self.template(*names).format(**values)
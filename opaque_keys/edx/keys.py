@@ -51,6 +51,13 @@ class CourseKey(OpaqueKey):
         """
         raise NotImplementedError()
 
+    def make_usage_keys(self, pairs):
+        """
+        Return a list of the usage keys made by :meth:`make_usage_key` for each
+        (block_type, block_id) in `pairs`.
+        """
+        return [self.make_usage_key(block_type, block_id) for block_type, block_id in pairs]
+
     @abstractmethod
     def make_asset_key(self, asset_type, path):  # pragma: no cover
         """
@@ -106,6 +113,38 @@ class CourseObjectMixin(object):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def map_keys_into_course(cls, keys, course_key):
+        """
+        Return a list of each of `keys` mapped into the course identified by `course_key`, as
+        by :meth:`map_into_course`. The keys may be of any mix of types.
+
+        Args:
+            keys: An iterable of :class:`CourseObjectMixin` instances.
+            course_key (:class:`CourseKey`): The course to map the keys into.
+        """
+        keys = list(keys)
+        indexes_by_type = {}
+        for index, key in enumerate(keys):
+            indexes_by_type.setdefault(type(key), []).append(index)
+
+        mapped = list(keys)
+        for key_type, indexes in indexes_by_type.items():
+            # pylint: disable=protected-access
+            mapped_keys = key_type._map_keys_of_type_into_course([keys[index] for index in indexes], course_key)
+            for index, mapped_key in zip(indexes, mapped_keys):
+                mapped[index] = mapped_key
+        return mapped
+
+    @classmethod
+    def _map_keys_of_type_into_course(cls, keys, course_key):
+        """
+        Return a list of each of `keys`, which are all instances of exactly `cls`, mapped into `course_key`.
+
+        Subclasses can override this to map many keys at once faster than :meth:`map_into_course`.
+        """
+        return [key.map_into_course(course_key) for key in keys]
+
 
 class AssetKey(CourseObjectMixin, OpaqueKey):
     """
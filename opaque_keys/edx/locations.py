@@ -3,9 +3,8 @@ Deprecated OpaqueKey implementations used by XML and Mongo modulestores
 """
 from __future__ import absolute_import
 
-import re
-import warnings
-
+from opaque_keys.edx.deprecation import deprecation_warning
+from opaque_keys.edx.grammar import Field, KeyGrammar
 from opaque_keys.edx.keys import i4xEncoder as real_i4xEncoder
 from opaque_keys.edx.locator import AssetLocator, BlockUsageLocator, CourseLocator, Locator
 
@@ -20,42 +19,26 @@ class i4xEncoder(real_i4xEncoder):  # pylint: disable=invalid-name
 
     def __init__(self, *args, **kwargs):
         """Deprecated. Use :class:`keys.i4xEncoder.default`"""
-        warnings.warn(
-            "locations.i4xEncoder.default is deprecated! Please use keys.i4xEncoder.default",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("locations.i4xEncoder.default is deprecated! Please use keys.i4xEncoder.default")
         super(i4xEncoder, self).__init__(*args, **kwargs)
 
 
 class SlashSeparatedCourseKey(CourseLocator):
     """Deprecated. Use :class:`locator.CourseLocator`"""
     def __init__(self, org, course, run, **kwargs):
-        warnings.warn(
-            "SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator")
         super(SlashSeparatedCourseKey, self).__init__(org, course, run, deprecated=True, **kwargs)
 
     @classmethod
     def from_deprecated_string(cls, serialized):
         """Deprecated. Use :class:`locator.CourseLocator.from_string`"""
-        warnings.warn(
-            "SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator")
         return CourseLocator.from_string(serialized)
 
     @classmethod
     def from_string(cls, serialized):
         """Deprecated. Use :meth:`locator.CourseLocator.from_string`."""
-        warnings.warn(
-            "SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("SlashSeparatedCourseKey is deprecated! Please use locator.CourseLocator")
         return CourseLocator.from_string(serialized)
 
     def replace(self, **kwargs):
@@ -84,32 +67,25 @@ class LocationBase(object):
     def _deprecation_warning(cls):
         """Display a deprecation warning for the given cls"""
         if issubclass(cls, Location):
-            warnings.warn(
+            deprecation_warning(
                 "Location is deprecated! Please use locator.BlockUsageLocator",
-                DeprecationWarning,
                 stacklevel=3
             )
         elif issubclass(cls, AssetLocation):
-            warnings.warn(
+            deprecation_warning(
                 "AssetLocation is deprecated! Please use locator.AssetLocator",
-                DeprecationWarning,
                 stacklevel=3
             )
         else:
-            warnings.warn(
+            deprecation_warning(
                 "{} is deprecated!".format(cls),
-                DeprecationWarning,
                 stacklevel=3
             )
 
     @property
     def tag(self):
         """Deprecated. Returns the deprecated tag for this Location."""
-        warnings.warn(
-            "Tag is no longer supported as a property of Locators.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("Tag is no longer supported as a property of Locators.")
         return self.DEPRECATED_TAG
 
     @classmethod
@@ -148,6 +124,30 @@ class LocationBase(object):
         cls._deprecation_warning()
         return BlockUsageLocator.clean_for_html(value)
 
+    @classmethod
+    def clean_all(cls, values):
+        """Deprecated. See BlockUsageLocator.clean_all"""
+        cls._deprecation_warning()
+        return BlockUsageLocator.clean_all(values)
+
+    @classmethod
+    def clean_all_keeping_underscores(cls, values):
+        """Deprecated. See BlockUsageLocator.clean_all_keeping_underscores"""
+        cls._deprecation_warning()
+        return BlockUsageLocator.clean_all_keeping_underscores(values)
+
+    @classmethod
+    def clean_all_for_url_name(cls, values):
+        """Deprecated. See BlockUsageLocator.clean_all_for_url_name"""
+        cls._deprecation_warning()
+        return BlockUsageLocator.clean_all_for_url_name(values)
+
+    @classmethod
+    def clean_all_for_html(cls, values):
+        """Deprecated. See BlockUsageLocator.clean_all_for_html"""
+        cls._deprecation_warning()
+        return BlockUsageLocator.clean_all_for_html(values)
+
     def __init__(self, org, course, run, category, name, revision=None, **kwargs):
         self._deprecation_warning()
 
@@ -209,13 +209,14 @@ class DeprecatedLocation(BlockUsageLocator):
     The short-lived location:org+course+run+block_type+block_id syntax
     """
     CANONICAL_NAMESPACE = 'location'
-    URL_RE_SOURCE = r"""
-        (?P<org>{ALLOWED_ID_CHARS}+)\+(?P<course>{ALLOWED_ID_CHARS}+)\+(?P<run>{ALLOWED_ID_CHARS}+)\+
-        (?P<block_type>{ALLOWED_ID_CHARS}+)\+
-        (?P<block_id>{ALLOWED_ID_CHARS}+)
-        """.format(ALLOWED_ID_CHARS=Locator.ALLOWED_ID_CHARS)
+    GRAMMAR = KeyGrammar(*[
+        Field(name, Locator.ALLOWED_ID_CHARS)
+        for name in ('org', 'course', 'run', 'block_type', 'block_id')
+    ])
 
-    URL_RE = re.compile('^' + URL_RE_SOURCE + r'\Z', re.VERBOSE | re.UNICODE)
+    URL_RE_SOURCE = GRAMMAR.source
+    URL_RE = GRAMMAR.regex
+    URL_RE_BYTES = GRAMMAR.bytes_regex
 
     def __init__(self, course_key, block_type, block_id):
         if course_key.version_guid is not None:
@@ -231,21 +232,42 @@ class DeprecatedLocation(BlockUsageLocator):
         """
         see super
         """
-        # Allow access to _from_string protected method
-        parsed_parts = cls.parse_url(serialized)
+        return cls._from_parsed(cls.parse_url(serialized), serialized)
+
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        see super
+        """
         course_key = CourseLocator(
-            parsed_parts.get('org'), parsed_parts.get('course'), parsed_parts.get('run'),
+            parse.get('org'), parse.get('course'), parse.get('run'),
             # specifically not saying deprecated=True b/c that would lose the run on serialization
         )
-        block_id = parsed_parts.get('block_id')
-        return cls(course_key, parsed_parts.get('block_type'), block_id)
+        block_id = parse.get('block_id')
+        return cls(course_key, parse.get('block_type'), block_id)
 
     def _to_string(self):
         """
         Return a string representing this location.
         """
-        parts = [self.org, self.course, self.run, self.block_type, self.block_id]
-        return u"+".join(parts)
+        return self.GRAMMAR.serialize(
+            org=self.org, course=self.course, run=self.run, block_type=self.block_type, block_id=self.block_id
+        )
+
+
+class DeprecatedAssetLocation(DeprecatedLocation, AssetLocator):
+    """
+    The short-lived asset-location:org+course+run+asset_type+path syntax
+    """
+    CANONICAL_NAMESPACE = 'asset-location'
+    GRAMMAR = KeyGrammar(*[
+        Field(name, Locator.DEPRECATED_ALLOWED_ID_CHARS if name == 'block_id' else Locator.ALLOWED_ID_CHARS)
+        for name in ('org', 'course', 'run', 'block_type', 'block_id')
+    ])
+
+    URL_RE_SOURCE = GRAMMAR.source
+    URL_RE = GRAMMAR.regex
+    URL_RE_BYTES = GRAMMAR.bytes_regex
 
 
 class AssetLocation(LocationBase, AssetLocator):
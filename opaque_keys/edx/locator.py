@@ -4,23 +4,176 @@ Identifier for course resources.
 
 from __future__ import absolute_import
 
+import binascii
+import functools
 import inspect
 import logging
 import re
-import warnings
 from abc import abstractproperty
+from collections import OrderedDict
 
 from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from bson.son import SON
 
-from six import string_types, text_type
+from six import binary_type, string_types, text_type
 from opaque_keys import OpaqueKey, InvalidKeyError
+from opaque_keys.edx.cache import CachedPattern
+from opaque_keys.edx.deprecation import deprecation_warning
+from opaque_keys.edx.grammar import SEPARATOR, Field, FieldGroup, KeyGrammar
 from opaque_keys.edx.keys import CourseKey, UsageKey, DefinitionKey, AssetKey
 
 log = logging.getLogger(__name__)
 
 
+def _bytes_pattern(regex):
+    """
+    Return a bytes-mode compilation of the text pattern `regex`.
+
+    Character classes such as ``\\w`` only match ASCII characters in bytes mode, so
+    keys containing non-ASCII characters won't match, and have to be decoded and
+    parsed as text.
+    """
+    return re.compile(regex.pattern.encode('ascii'), regex.flags & ~re.UNICODE)
+
+
+def _match_bytes(regex, serialized):
+    """
+    Match the bytes-mode `regex` against `serialized`, and return the decoded named groups.
+
+    Returns None if `regex` doesn't match, or a matched field isn't valid UTF-8.
+    """
+    match = regex.match(serialized)
+    if match is None:
+        return None
+    try:
+        return {
+            name: value if value is None else value.decode('utf-8')
+            for name, value in match.groupdict().items()
+        }
+    except UnicodeDecodeError:
+        return None
+
+
+# The hex string of an ObjectId, and a newline-separated list of them
+_OBJECT_ID_HEX_RE = re.compile(r'[0-9a-fA-F]{24}\Z')
+_OBJECT_ID_HEX_LIST_RE = re.compile(r'(?:[0-9a-fA-F]{24}\n)*[0-9a-fA-F]{24}\Z')
+
+
+def _is_object_id_binary(value):
+    """
+    Return whether `value` is the 12 byte binary form of an ObjectId, as stored by :class:`_ObjectIdField`.
+    """
+    return isinstance(value, binary_type) and len(value) == 12
+
+
+def _object_id_text(value):
+    """
+    Return the serialization of `value`, the stored value of an :class:`_ObjectIdField`.
+    """
+    if _is_object_id_binary(value):
+        return binascii.hexlify(value).decode('ascii')
+    return text_type(value)
+
+
+class _ObjectIdField(object):
+    """
+    A key field holding an ObjectId.
+
+    Only the ObjectId's 12 byte binary form is stored (in the attribute `attr`), and an
+    ObjectId is built from it whenever the field is read, so keys that are only parsed,
+    compared, hashed and serialized never build one. An ObjectId hashes, compares and
+    orders exactly as its binary form does. Values that aren't ObjectIds are stored as-is.
+    """
+    def __init__(self, attr):
+        self.attr = attr
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.attr)
+        if _is_object_id_binary(value):
+            return ObjectId(value)
+        return value
+
+    def __set__(self, instance, value):
+        if isinstance(value, ObjectId):
+            value = value.binary
+        object.__setattr__(instance, self.attr, value)
+
+
+# Maps each locator class to the attributes holding the values of its KEY_FIELDS, and to the
+# (field, attribute) pairs of its KEY_FIELDS (see Locator._key_attrs)
+_KEY_ATTRS = {}
+_KEY_FIELD_ATTRS = {}
+
+# The most keys derived from one locator that `_derived_key` will remember
+_MAX_DERIVED_KEYS = 8
+
+
+def _derived_key(method):
+    """
+    Decorate a method returning a key derived from a locator (such as ``version_agnostic``), so
+    that each locator builds the key for each argument only once, and returns the same key after.
+
+    Locators are immutable, so the derived keys never change.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):  # pylint: disable=missing-docstring
+        if kwargs:
+            return method(self, *args, **kwargs)
+        memo_key = (method.__name__,) + args
+        try:
+            derived = self._derived  # pylint: disable=protected-access
+        except AttributeError:
+            derived = {}
+            object.__setattr__(self, '_derived', derived)
+        try:
+            return derived[memo_key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable arguments
+            return method(self, *args)
+        key = method(self, *args)
+        if len(derived) >= _MAX_DERIVED_KEYS:
+            derived.clear()
+        derived[memo_key] = key
+        return key
+    return wrapper
+
+
+# Maps each regex of invalid chars passed to BlockUsageLocator._clean to a regex matching
+# runs of those chars and underscores
+_COLLAPSING_RES = {}
+
+# Matches the source of a regex made of a single negated character class that includes \w,
+# such as BlockUsageLocator.DEPRECATED_INVALID_CHARS, which can't match any alphanumeric char
+_WORD_CHARS_VALID_RE = re.compile(r'^\[\^\\w[^\\\[\]]*\]\Z')
+
+
+def _skipping_valid_words(source, invalid):
+    """
+    Return the regex source `source`, which can only match where the regex `invalid` matches
+    or at an underscore, preceded by a lookahead that lets the regex engine skip quickly over
+    alphanumeric chars, if `invalid` can't match them.
+    """
+    if _WORD_CHARS_VALID_RE.match(invalid.pattern):
+        return u'(?=[\\W_])' + source
+    return source
+
+
+# Maps each (regex of invalid chars, collapse) passed to BlockUsageLocator._clean_all to
+# the dict of the values it has cleaned
+_CLEANED_VALUES = {}
+
+# The most cleaned values remembered for each (regex of invalid chars, collapse)
+_MAX_CLEANED_VALUES = 1 << 16
+
+# The most names that each query returned by BlockUsageLocator.deprecated_son_queries matches
+DEPRECATED_SON_CHUNK_SIZE = 1000
+
+
 class LocalId(object):
     """
     Class for local ids for non-persisted xblocks (which can have hardcoded block_ids if necessary)
@@ -46,6 +199,9 @@ class Locator(OpaqueKey):
     ALLOWED_ID_CHARS = r'[\w\-~.:]'
     DEPRECATED_ALLOWED_ID_CHARS = r'[\w\-~.:%]'
 
+    # Bytes-mode compilation of the class's URL_RE, if it has one. See `_from_bytes`.
+    URL_RE_BYTES = None
+
     @abstractproperty
     def version(self):  # pragma: no cover
         """
@@ -69,6 +225,139 @@ class Locator(OpaqueKey):
         except InvalidId:
             raise InvalidKeyError(cls, '"%s" is not a valid version_guid' % value)
 
+    @classmethod
+    def is_valid_object_id(cls, value):
+        """
+        Return whether `value` is an ObjectId, the 12 byte binary form of one, or the 24 digit hex
+        string of one, without raising (or catching) any exceptions.
+        """
+        if isinstance(value, ObjectId):
+            return True
+        if isinstance(value, binary_type) and len(value) == 12:
+            return True
+        return isinstance(value, string_types) and _OBJECT_ID_HEX_RE.match(value) is not None
+
+    @classmethod
+    def as_object_ids(cls, values):
+        """
+        Return a list of the ObjectIds of `values`, each of which is an ObjectId, the 12 byte
+        binary form of one, or the 24 digit hex string of one.
+
+        Every value is validated before any ObjectId is built. A list of hex strings is validated
+        all at once, by a single regex match.
+
+        Raises:
+            InvalidKeyError: for the first value that isn't a valid ObjectId
+        """
+        values = list(values)
+        if not values:
+            return []
+        try:
+            joined = u'\n'.join(values)
+            # The length check stops a value containing the separator from passing as several
+            all_valid = len(joined) == 25 * len(values) - 1 and _OBJECT_ID_HEX_LIST_RE.match(joined) is not None
+        except TypeError:
+            # Not all of the values are strings
+            all_valid = False
+
+        if not all_valid:
+            for value in values:
+                if not cls.is_valid_object_id(value):
+                    raise InvalidKeyError(cls, '"%s" is not a valid version_guid' % (value,))
+        return [value if isinstance(value, ObjectId) else ObjectId(value) for value in values]
+
+    @classmethod
+    def _object_id_binary(cls, value):
+        """
+        Return the binary form of the ObjectId whose hex string is `value`, without building the ObjectId.
+
+        Raises:
+            InvalidKeyError: if `value` isn't 24 hex digits
+        """
+        if len(value) != 24:
+            raise InvalidKeyError(cls, '"%s" is not a valid version_guid' % value)
+        try:
+            return binascii.unhexlify(value)
+        except (TypeError, ValueError):
+            raise InvalidKeyError(cls, '"%s" is not a valid version_guid' % value)
+
+    @classmethod
+    def _key_attrs(cls):
+        """
+        Return the attributes holding the values of ``KEY_FIELDS``, which are the fields themselves,
+        except for each :class:`_ObjectIdField`, whose value is held in its binary form.
+        """
+        try:
+            return _KEY_ATTRS[cls]
+        except KeyError:
+            pass
+        field_attrs = []
+        for field in cls.KEY_FIELDS:  # pylint: disable=no-member
+            descriptor = getattr(cls, field, None)
+            field_attrs.append((field, descriptor.attr if isinstance(descriptor, _ObjectIdField) else field))
+        _KEY_FIELD_ATTRS[cls] = tuple(field_attrs)
+        attrs = _KEY_ATTRS[cls] = tuple(attr for __, attr in field_attrs)
+        return attrs
+
+    @classmethod
+    def _key_field_attrs(cls):
+        """
+        Return the (field, attribute) pair of each of ``KEY_FIELDS``, where the attribute is as
+        returned by `_key_attrs`.
+        """
+        try:
+            return _KEY_FIELD_ATTRS[cls]
+        except KeyError:
+            cls._key_attrs()
+            return _KEY_FIELD_ATTRS[cls]
+
+    @property
+    def _key(self):
+        """Returns a tuple of key fields"""
+        attrs = _KEY_ATTRS.get(type(self)) or self._key_attrs()
+        return tuple(getattr(self, attr) for attr in attrs) + (self.CANONICAL_NAMESPACE, self.deprecated)
+
+    @classmethod
+    def _from_bytes(cls, serialized):
+        """
+        Return an instance of `cls` parsed from the UTF-8 encoded `serialized` key.
+
+        ASCII keys are matched directly against ``URL_RE_BYTES``, so that only the extracted
+        fields are decoded. Anything else is decoded and parsed by `_from_string`.
+        """
+        if cls.URL_RE_BYTES is not None:
+            parse = _match_bytes(cls.URL_RE_BYTES, serialized)
+            if parse is not None:
+                return cls._from_parsed(parse, serialized)
+        return super(Locator, cls)._from_bytes(serialized)
+
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return an instance of `cls` built from `parse`, the named groups of a ``URL_RE`` match
+        against `serialized`.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def _from_validated(cls, **fields):
+        """
+        Return an instance of `cls` with its ``KEY_FIELDS`` set to `fields`, skipping the
+        validation done by the constructor.
+
+        Only for fields that are already known to be valid, such as those extracted by a
+        ``GRAMMAR`` match.
+        """
+        deprecated = fields.pop('deprecated', False)
+        key = cls.__new__(cls)
+        # Set the fields directly, rather than through the immutability check in OpaqueKey.__setattr__
+        set_attr = object.__setattr__
+        for name, value in fields.items():
+            set_attr(key, name, value)
+        set_attr(key, 'deprecated', deprecated)
+        set_attr(key, '_initialized', True)
+        return key
+
 
 # `BlockLocatorBase` is another abstract base class, so don't worry that it doesn't
 # provide implementations for _from_string, _to_string, and version.
@@ -85,26 +374,32 @@ class BlockLocatorBase(Locator):
     BLOCK_PREFIX = r"block"
     BLOCK_ALLOWED_ID_CHARS = r'[\w\-~.:%]'
 
-    ALLOWED_ID_RE = re.compile(r'^' + Locator.ALLOWED_ID_CHARS + r'+\Z', re.UNICODE)
-    DEPRECATED_ALLOWED_ID_RE = re.compile(r'^' + Locator.DEPRECATED_ALLOWED_ID_CHARS + r'+\Z', re.UNICODE)
-
-    URL_RE_SOURCE = r"""
-        ((?P<org>{ALLOWED_ID_CHARS}+)\+(?P<course>{ALLOWED_ID_CHARS}+)(\+(?P<run>{ALLOWED_ID_CHARS}+))?{SEP})??
-        ({BRANCH_PREFIX}@(?P<branch>{ALLOWED_ID_CHARS}+){SEP})?
-        ({VERSION_PREFIX}@(?P<version_guid>[a-f0-9]+){SEP})?
-        ({BLOCK_TYPE_PREFIX}@(?P<block_type>{ALLOWED_ID_CHARS}+){SEP})?
-        ({BLOCK_PREFIX}@(?P<block_id>{BLOCK_ALLOWED_ID_CHARS}+))?
-    """.format(
-        ALLOWED_ID_CHARS=Locator.ALLOWED_ID_CHARS,
-        BLOCK_ALLOWED_ID_CHARS=BLOCK_ALLOWED_ID_CHARS,
-        BRANCH_PREFIX=BRANCH_PREFIX,
-        VERSION_PREFIX=Locator.VERSION_PREFIX,
-        BLOCK_TYPE_PREFIX=Locator.BLOCK_TYPE_PREFIX,
-        BLOCK_PREFIX=BLOCK_PREFIX,
-        SEP=r'(\+(?=.)|\Z)',  # Separator: requires a non-trailing '+' or end of string
+    # Field values repeat across keys far more often than they vary, so their validation is cached
+    ALLOWED_ID_RE = CachedPattern(
+        re.compile(r'^' + Locator.ALLOWED_ID_CHARS + r'+\Z', re.UNICODE),
+        name='BlockLocatorBase.ALLOWED_ID_RE',
+    )
+    DEPRECATED_ALLOWED_ID_RE = CachedPattern(
+        re.compile(r'^' + Locator.DEPRECATED_ALLOWED_ID_CHARS + r'+\Z', re.UNICODE),
+        name='BlockLocatorBase.DEPRECATED_ALLOWED_ID_RE',
+    )
+
+    GRAMMAR = KeyGrammar(
+        FieldGroup(
+            Field('org', Locator.ALLOWED_ID_CHARS),
+            Field('course', Locator.ALLOWED_ID_CHARS),
+            Field('run', Locator.ALLOWED_ID_CHARS, optional=True),
+            optional=True,
+        ),
+        Field('branch', Locator.ALLOWED_ID_CHARS, prefix=BRANCH_PREFIX, optional=True),
+        Field('version_guid', r'[a-f0-9]', prefix=Locator.VERSION_PREFIX, optional=True),
+        Field('block_type', Locator.ALLOWED_ID_CHARS, prefix=Locator.BLOCK_TYPE_PREFIX, optional=True),
+        Field('block_id', BLOCK_ALLOWED_ID_CHARS, prefix=BLOCK_PREFIX, optional=True),
     )
 
-    URL_RE = re.compile('^' + URL_RE_SOURCE + r'\Z', re.VERBOSE | re.UNICODE)
+    URL_RE_SOURCE = GRAMMAR.source
+    URL_RE = GRAMMAR.regex
+    URL_RE_BYTES = GRAMMAR.bytes_regex
 
     @classmethod
     def parse_url(cls, string):  # pylint: disable=redefined-outer-name
@@ -118,10 +413,69 @@ class BlockLocatorBase(Locator):
         Raises:
             InvalidKeyError: if string cannot be parsed -or- string ends with a newline.
         """
-        match = cls.URL_RE.match(string)
-        if not match:
+        parse = cls.GRAMMAR.parse(string)
+        if parse is None:
             raise InvalidKeyError(cls, string)
-        return match.groupdict()
+        return parse
+
+    def _to_string(self):
+        """
+        Return a string representing this locator.
+
+        Locators are immutable, so the string is built once by `_serialize` and kept on the key.
+        Every usage key in a course shares its course key's string as a prefix.
+        """
+        try:
+            return self._serialized
+        except AttributeError:
+            serialized = self._serialize()
+            object.__setattr__(self, '_serialized', serialized)
+            return serialized
+
+    def _serialize(self):
+        """
+        Return a newly built string representing this locator.
+        """
+        raise NotImplementedError()
+
+    # The fields ignored by `version_agnostic`
+    VERSION_AGNOSTIC = frozenset(['version_guid'])
+
+    def _agnostic_key(self, ignore):
+        """
+        Return the tuple of key fields identifying this locator, with the fields named in `ignore` set to None.
+
+        The tuple hashes and compares just as the ``_key`` of the locator with those fields replaced
+        by None would, without building that locator.
+        """
+        return tuple(
+            None if field in ignore else getattr(self, attr)
+            for field, attr in _KEY_FIELD_ATTRS.get(type(self)) or self._key_field_attrs()
+        ) + (self.CANONICAL_NAMESPACE, self.deprecated)
+
+    def agnostic_hash(self, ignore=VERSION_AGNOSTIC):
+        """
+        Return the hash of this locator, ignoring the fields named in `ignore` (by default, the version).
+        """
+        return hash(self._agnostic_key(ignore))
+
+    def version_agnostic_hash(self):
+        """
+        Return ``hash(self.version_agnostic())``, without building the version agnostic locator.
+        """
+        return hash(self._agnostic_key(self.VERSION_AGNOSTIC))
+
+    def agnostic_eq(self, other, ignore=VERSION_AGNOSTIC):
+        """
+        Return whether this locator is equal to `other`, ignoring the fields named in `ignore`
+        (by default, the version). For usage locators, the fields of the course key are ignored.
+
+        ``a.agnostic_eq(b)`` is equivalent to ``a.version_agnostic() == b.version_agnostic()``, without
+        building either version agnostic locator.
+        """
+        if not isinstance(other, BlockLocatorBase):
+            return False
+        return self._agnostic_key(ignore) == other._agnostic_key(ignore)  # pylint: disable=protected-access
 
 
 class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-method
@@ -145,11 +499,16 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
 
     CANONICAL_NAMESPACE = 'course-v1'
     KEY_FIELDS = ('org', 'course', 'run', 'branch', 'version_guid')
-    __slots__ = KEY_FIELDS
+    __slots__ = ('org', 'course', 'run', 'branch', '_version_guid', '_serialized', '_derived')
     CHECKED_INIT = False
 
+    version_guid = _ObjectIdField('_version_guid')
+
     # Characters that are forbidden in the deprecated format
-    INVALID_CHARS_DEPRECATED = re.compile(r"[^\w.%-]", re.UNICODE)
+    INVALID_CHARS_DEPRECATED = CachedPattern(
+        re.compile(r"[^\w.%-]", re.UNICODE),
+        name='CourseLocator.INVALID_CHARS_DEPRECATED',
+    )
 
     def __init__(self, org=None, course=None, run=None, branch=None, version_guid=None, deprecated=False, **kwargs):
         """
@@ -162,11 +521,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         """
         offering_arg = kwargs.pop('offering', None)
         if offering_arg:
-            warnings.warn(
-                "offering is deprecated! Use course and run instead.",
-                DeprecationWarning,
-                stacklevel=2
-            )
+            deprecation_warning("offering is deprecated! Use course and run instead.")
             course, __, run = offering_arg.partition("/")
 
         if deprecated:
@@ -204,7 +559,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         if self.deprecated and (self.org is None or self.course is None):
             raise InvalidKeyError(self.__class__, "Deprecated strings must set both org and course.")
 
-        if not self.deprecated and self.version_guid is None and \
+        if not self.deprecated and self._version_guid is None and \
                 (self.org is None or self.course is None or self.run is None):
             raise InvalidKeyError(self.__class__, "Either version_guid or org, course, and run should be set")
 
@@ -223,10 +578,8 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         Deprecated. The ambiguously named field from CourseLocation which code
         expects to find. Equivalent to version_guid.
         """
-        warnings.warn(
-            "version is no longer supported as a property of Locators. Please use the version_guid property.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "version is no longer supported as a property of Locators. Please use the version_guid property."
         )
         return self.version_guid
 
@@ -235,10 +588,8 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         """
         Deprecated. Use course and run independently.
         """
-        warnings.warn(
-            "Offering is no longer a supported property of Locator. Please use the course and run properties.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "Offering is no longer a supported property of Locator. Please use the course and run properties."
         )
         if not self.course and not self.run:
             return None
@@ -252,12 +603,27 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         Return a CourseLocator parsing the given serialized string
         :param serialized: matches the string to a CourseLocator
         """
-        parse = cls.parse_url(serialized)
-
-        if parse['version_guid']:
-            parse['version_guid'] = cls.as_object_id(parse['version_guid'])
+        return cls._from_parsed(cls.parse_url(serialized), serialized)
 
-        return cls(**{key: parse.get(key) for key in cls.KEY_FIELDS})
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return a CourseLocator built from the fields parsed out of `serialized`
+        """
+        version_guid = parse['version_guid']
+        if version_guid:
+            version_guid = cls._object_id_binary(version_guid)
+        elif parse['run'] is None:
+            raise InvalidKeyError(cls, "Either version_guid or org, course, and run should be set")
+
+        # GRAMMAR has already checked the characters of each field
+        return cls._from_validated(
+            org=parse['org'],
+            course=parse['course'],
+            run=parse['run'],
+            branch=parse['branch'],
+            version_guid=version_guid,
+        )
 
     def html_id(self):
         """
@@ -277,6 +643,16 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
             deprecated=self.deprecated,
         )
 
+    def make_usage_keys(self, pairs):
+        """
+        Return a list of the usage keys in this course of each (block_type, block_id) in `pairs`,
+        all sharing this course key. The block ids are validated together.
+
+        Raises:
+            InvalidKeyError: if any of the block ids is invalid.
+        """
+        return BlockUsageLocator._from_block_pairs(self, pairs)  # pylint: disable=protected-access
+
     def make_asset_key(self, asset_type, path):
         return AssetLocator(self, asset_type, path, deprecated=self.deprecated)
 
@@ -289,13 +665,10 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         Raises:
             InvalidKeyError: if the url does not parse
         """
-        warnings.warn(
-            "make_usage_key_from_deprecated_string is deprecated! Please use make_usage_key",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("make_usage_key_from_deprecated_string is deprecated! Please use make_usage_key")
         return BlockUsageLocator.from_string(location_url).replace(run=self.run)
 
+    @_derived_key
     def version_agnostic(self):
         """
         We don't care if the locator's version is not the current head; so, avoid version conflict
@@ -307,6 +680,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         """
         return self.replace(version_guid=None)
 
+    @_derived_key
     def course_agnostic(self):
         """
         We only care about the locator's version not its course.
@@ -317,6 +691,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         """
         return self.replace(org=None, course=None, run=None, branch=None)
 
+    @_derived_key
     def for_branch(self, branch):
         """
         Return a new CourseLocator for another branch of the same course (also version agnostic)
@@ -325,6 +700,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
             raise InvalidKeyError(self.__class__, "Branches must have full course ids not just versions")
         return self.replace(branch=branch, version_guid=None)
 
+    @_derived_key
     def for_version(self, version_guid):
         """
         Return a new CourseLocator for another version of the same course and branch. Usually used
@@ -332,18 +708,16 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
         """
         return self.replace(version_guid=version_guid)
 
-    def _to_string(self):
+    def _serialize(self):
         """
         Return a string representing this location.
         """
-        parts = []
+        fields = {}
         if self.course and self.run:
-            parts.extend([self.org, self.course, self.run])
-            if self.branch:
-                parts.append(u"{prefix}@{branch}".format(prefix=self.BRANCH_PREFIX, branch=self.branch))
-        if self.version_guid:
-            parts.append(u"{prefix}@{guid}".format(prefix=self.VERSION_PREFIX, guid=self.version_guid))
-        return u"+".join(parts)
+            fields.update(org=self.org, course=self.course, run=self.run, branch=self.branch or None)
+        if self._version_guid:
+            fields['version_guid'] = _object_id_text(self._version_guid)
+        return self.GRAMMAR.serialize(**fields)
 
     def _to_deprecated_string(self):
         """Returns an 'old-style' course id, represented as 'org/course/run'"""
@@ -351,11 +725,7 @@ class CourseLocator(BlockLocatorBase, CourseKey):   # pylint: disable=abstract-m
 
     def to_deprecated_string(self):
         """Deprecated. Use unicode(key) instead."""
-        warnings.warn(
-            "to_deprecated_string is deprecated! Use unicode(key) instead.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("to_deprecated_string is deprecated! Use unicode(key) instead.")
         return text_type(self)
 
     @classmethod
@@ -407,9 +777,11 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
     CANONICAL_NAMESPACE = 'library-v1'
     RUN = 'library'  # For backwards compatibility, LibraryLocators have a read-only 'run' property equal to this
     KEY_FIELDS = ('org', 'library', 'branch', 'version_guid')
-    __slots__ = KEY_FIELDS
+    __slots__ = ('org', 'library', 'branch', '_version_guid', '_serialized', '_derived')
     CHECKED_INIT = False
 
+    version_guid = _ObjectIdField('_version_guid')
+
     def __init__(self, org=None, library=None, branch=None, version_guid=None, **kwargs):
         """
         Construct a LibraryLocator
@@ -425,11 +797,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         if 'course' in kwargs:
             if library is not None:
                 raise ValueError("Cannot specify both 'library' and 'course'")
-            warnings.warn(
-                "For LibraryLocators, use 'library' instead of 'course'.",
-                DeprecationWarning,
-                stacklevel=2
-            )
+            deprecation_warning("For LibraryLocators, use 'library' instead of 'course'.")
             library = kwargs.pop('course')
 
         run = kwargs.pop('run', self.RUN)
@@ -455,7 +823,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
             **kwargs
         )
 
-        if self.version_guid is None and (self.org is None or self.library is None):  # pylint: disable=no-member
+        if self._version_guid is None and (self.org is None or self.library is None):  # pylint: disable=no-member
             raise InvalidKeyError(self.__class__, "Either version_guid or org and library should be set")
 
     @property
@@ -463,7 +831,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         """
         Deprecated. Return a 'run' for compatibility with CourseLocator.
         """
-        warnings.warn("Accessing 'run' on a LibraryLocator is deprecated.", DeprecationWarning, stacklevel=2)
+        deprecation_warning("Accessing 'run' on a LibraryLocator is deprecated.")
         return self.RUN
 
     @property
@@ -471,7 +839,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         """
         Deprecated. Return a 'course' for compatibility with CourseLocator.
         """
-        warnings.warn("Accessing 'course' on a LibraryLocator is deprecated.", DeprecationWarning, stacklevel=2)
+        deprecation_warning("Accessing 'course' on a LibraryLocator is deprecated.")
         return self.library  # pylint: disable=no-member
 
     @property
@@ -480,10 +848,8 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         Deprecated. The ambiguously named field from CourseLocation which code
         expects to find. Equivalent to version_guid.
         """
-        warnings.warn(
-            "version is no longer supported as a property of Locators. Please use the version_guid property.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "version is no longer supported as a property of Locators. Please use the version_guid property."
         )
         return self.version_guid  # pylint: disable=no-member
 
@@ -493,17 +859,27 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         Return a LibraryLocator parsing the given serialized string
         :param serialized: matches the string to a LibraryLocator
         """
-        parse = cls.parse_url(serialized)
-
-        # The regex detects the "library" key part as "course"
-        # since we're sharing a regex with CourseLocator
-        parse["library"] = parse["course"]
-        del parse["course"]
+        return cls._from_parsed(cls.parse_url(serialized), serialized)
 
-        if parse['version_guid']:
-            parse['version_guid'] = cls.as_object_id(parse['version_guid'])
-
-        return cls(**{key: parse.get(key) for key in cls.KEY_FIELDS})
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return a LibraryLocator built from the fields parsed out of `serialized`
+        """
+        version_guid = parse['version_guid']
+        if version_guid:
+            version_guid = cls._object_id_binary(version_guid)
+        elif parse['org'] is None:
+            raise InvalidKeyError(cls, "Either version_guid or org and library should be set")
+
+        # The grammar detects the "library" key part as "course"
+        # since we're sharing a grammar with CourseLocator
+        return cls._from_validated(
+            org=parse['org'],
+            library=parse['course'],
+            branch=parse['branch'],
+            version_guid=version_guid,
+        )
 
     def html_id(self):
         """
@@ -518,9 +894,20 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
             block_id=block_id,
         )
 
+    def make_usage_keys(self, pairs):
+        """
+        Return a list of the usage keys in this library of each (block_type, block_id) in `pairs`,
+        all sharing this library key. The block types and ids are validated together.
+
+        Raises:
+            InvalidKeyError: if any of the block types or ids is invalid.
+        """
+        return LibraryUsageLocator._from_block_pairs(self, pairs)  # pylint: disable=protected-access
+
     def make_asset_key(self, asset_type, path):
         return AssetLocator(self, asset_type, path, deprecated=False)
 
+    @_derived_key
     def version_agnostic(self):
         """
         We don't care if the locator's version is not the current head; so, avoid version conflict
@@ -532,6 +919,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         """
         return self.replace(version_guid=None)
 
+    @_derived_key
     def course_agnostic(self):
         """
         We only care about the locator's version not its library.
@@ -542,6 +930,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         """
         return self.replace(org=None, library=None, branch=None)
 
+    @_derived_key
     def for_branch(self, branch):
         """
         Return a new CourseLocator for another branch of the same library (also version agnostic)
@@ -550,6 +939,7 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
             raise InvalidKeyError(self.__class__, "Branches must have full library ids not just versions")
         return self.replace(branch=branch, version_guid=None)
 
+    @_derived_key
     def for_version(self, version_guid):
         """
         Return a new LibraryLocator for another version of the same library and branch. Usually used
@@ -557,18 +947,18 @@ class LibraryLocator(BlockLocatorBase, CourseKey):
         """
         return self.replace(version_guid=version_guid)
 
-    def _to_string(self):
+    def _serialize(self):
         """
         Return a string representing this location.
         """
-        parts = []
-        if self.library:  # pylint: disable=no-member
-            parts.extend([self.org, self.library])  # pylint: disable=no-member
-            if self.branch:  # pylint: disable=no-member
-                parts.append(u"{prefix}@{branch}".format(prefix=self.BRANCH_PREFIX, branch=self.branch))  # pylint: disable=no-member
-        if self.version_guid:  # pylint: disable=no-member
-            parts.append(u"{prefix}@{guid}".format(prefix=self.VERSION_PREFIX, guid=self.version_guid))  # pylint: disable=no-member
-        return u"+".join(parts)
+        # pylint: disable=no-member
+        fields = {}
+        if self.library:
+            # The grammar is shared with CourseLocator, so the library is serialized as the course
+            fields.update(org=self.org, course=self.library, branch=self.branch or None)
+        if self._version_guid:
+            fields['version_guid'] = _object_id_text(self._version_guid)
+        return self.GRAMMAR.serialize(**fields)
 
     def _to_deprecated_string(self):
         """ LibraryLocators are never deprecated. """
@@ -626,6 +1016,7 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         (@(?P<revision>[^/]+))?  # branch == revision
         \\Z
     """, re.VERBOSE)
+    DEPRECATED_URL_RE_BYTES = _bytes_pattern(DEPRECATED_URL_RE)
 
     # TODO (cpennington): We should decide whether we want to expand the
     # list of valid characters in a location
@@ -636,6 +1027,14 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
     # html ids can contain word chars and dashes
     DEPRECATED_INVALID_HTML_CHARS = re.compile(r"[^\w-]", re.UNICODE)
 
+    # Serializes the block fields, which follow the serialized course key
+    BLOCK_TEMPLATE = SEPARATOR + BlockLocatorBase.GRAMMAR.template('block_type', 'block_id')
+
+    # Matches a newline-separated list of ids that each match ALLOWED_ID_RE
+    ALLOWED_ID_LIST_RE = re.compile(
+        r'^(?:{chars}+\n)*{chars}+\Z'.format(chars=BlockLocatorBase.ALLOWED_ID_CHARS), re.UNICODE
+    )
+
     def __init__(self, course_key, block_type, block_id, **kwargs):
         """
         Construct a BlockUsageLocator
@@ -678,7 +1077,15 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
 
         invalid should be a compiled regexp of chars to replace with '_'
         """
-        return re.sub('_+', '_', invalid.sub('_', value))
+        try:
+            collapsing = _COLLAPSING_RES[invalid]
+        except KeyError:
+            # Replacing each run of invalid chars and underscores with a single '_' is the same as
+            # replacing invalid chars with '_', and then collapsing runs of '_', in one pass
+            collapsing = _COLLAPSING_RES[invalid] = re.compile(
+                _skipping_valid_words(u'(?:(?:{})|_)+'.format(invalid.pattern), invalid), invalid.flags,
+            )
+        return collapsing.sub('_', value)
 
     @classmethod
     def clean(cls, value):
@@ -719,19 +1126,120 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         """
         return cls._clean(value, cls.DEPRECATED_INVALID_HTML_CHARS)
 
+    @classmethod
+    def _clean_all(cls, values, invalid, collapse=True):
+        """
+        Return a list of the `values` cleaned with `invalid` (collapsing runs of '_', unless
+        not `collapse`), as `_clean` or ``invalid.sub`` would.
+
+        The results are remembered, so repeated values cost only a dict lookup.
+        """
+        try:
+            cleaned = _CLEANED_VALUES[invalid, collapse]
+        except KeyError:
+            cleaned = _CLEANED_VALUES[invalid, collapse] = {}
+
+        results = []
+        for value in values:
+            result = cleaned.get(value)
+            if result is None:
+                result = cls._clean(value, invalid) if collapse else invalid.sub('_', value)
+                if len(cleaned) >= _MAX_CLEANED_VALUES:
+                    cleaned.clear()
+                cleaned[value] = result
+            results.append(result)
+        return results
+
+    @classmethod
+    def clean_all(cls, values):
+        """
+        Should only be called on deprecated-style values
+
+        Return a list of each of `values`, cleaned as by `clean`.
+        """
+        return cls._clean_all(values, cls.DEPRECATED_INVALID_CHARS)
+
+    @classmethod
+    def clean_all_keeping_underscores(cls, values):
+        """
+        Should only be called on deprecated-style values
+
+        Return a list of each of `values`, cleaned as by `clean_keeping_underscores`.
+        """
+        return cls._clean_all(values, cls.DEPRECATED_INVALID_CHARS, collapse=False)
+
+    @classmethod
+    def clean_all_for_url_name(cls, values):
+        """
+        Should only be called on deprecated-style values
+
+        Return a list of each of `values`, cleaned as by `clean_for_url_name`.
+        """
+        return cls._clean_all(values, cls.DEPRECATED_INVALID_CHARS_NAME)
+
+    @classmethod
+    def clean_all_for_html(cls, values):
+        """
+        Should only be called on deprecated-style values
+
+        Return a list of each of `values`, cleaned as by `clean_for_html`.
+        """
+        return cls._clean_all(values, cls.DEPRECATED_INVALID_HTML_CHARS)
+
+    @classmethod
+    def _valid_ids(cls, values):
+        """
+        Return whether every one of `values` is a text string matching ALLOWED_ID_RE, checked
+        with a single regex match.
+        """
+        if not values or not all(isinstance(value, text_type) for value in values):
+            return False
+        joined = u'\n'.join(values)
+        # The count rules out values that themselves contain newlines
+        return joined.count(u'\n') == len(values) - 1 and cls.ALLOWED_ID_LIST_RE.match(joined) is not None
+
+    @classmethod
+    def _from_block_pairs(cls, course_key, pairs):
+        """
+        Return a list of the BlockUsageLocators in `course_key` of each (block_type, block_id)
+        in `pairs`, as made by the constructor.
+
+        When every block id is valid, the keys are built without re-running the constructor's checks.
+        """
+        pairs = list(pairs)
+        if not cls._valid_ids(set(block_id for __, block_id in pairs)):
+            # Let the constructor raise the error for the first invalid block id (if any)
+            return [cls(course_key, block_type, block_id) for block_type, block_id in pairs]
+        deprecated = course_key.deprecated
+        return [
+            cls._from_validated(course_key=course_key, block_type=block_type, block_id=block_id, deprecated=deprecated)
+            for block_type, block_id in pairs
+        ]
+
     @classmethod
     def _from_string(cls, serialized):
         """
-        Requests CourseLocator to deserialize its part and then adds the local deserialization of block
+        Return a BlockUsageLocator parsing the given serialized string, matching it only once
+        for both the course key and the block fields.
         """
-        # Allow access to _from_string protected method
-        course_key = CourseLocator._from_string(serialized)  # pylint: disable=protected-access
-        parsed_parts = cls.parse_url(serialized)
-        block_id = parsed_parts.get('block_id', None)
+        return cls._from_parsed(cls.parse_url(serialized), serialized)
+
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return a BlockUsageLocator built from the fields parsed out of `serialized`
+        """
+        block_id = parse['block_id']
         if block_id is None:
             raise InvalidKeyError(cls, serialized)
-        return cls(course_key, parsed_parts.get('block_type'), block_id)
-
+        # Allow access to _from_parsed protected method
+        course_key = CourseLocator._from_parsed(parse, serialized)  # pylint: disable=protected-access
+        if u'%' in block_id:
+            # GRAMMAR accepts '%' in block ids, which only some key classes allow
+            block_id = cls._parse_block_ref(block_id)
+        return cls._from_validated(course_key=course_key, block_type=parse['block_type'], block_id=block_id)
+
+    @_derived_key
     def version_agnostic(self):
         """
         We don't care if the locator's version is not the current head; so, avoid version conflict
@@ -743,6 +1251,7 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         """
         return self.replace(course_key=self.course_key.version_agnostic())
 
+    @_derived_key
     def course_agnostic(self):
         """
         We only care about the locator's version not its course.
@@ -753,12 +1262,25 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         """
         return self.replace(course_key=self.course_key.course_agnostic())
 
+    def _agnostic_key(self, ignore):
+        """
+        Return the tuple of key fields identifying this locator, with the fields of its course key
+        named in `ignore` set to None.
+
+        The course key's own tuple stands in for the course key (the first of ``KEY_FIELDS``),
+        which it hashes and compares like.
+        """
+        # pylint: disable=protected-access
+        return (self.course_key._agnostic_key(ignore),) + super(BlockUsageLocator, self)._agnostic_key(ignore)[1:]
+
+    @_derived_key
     def for_branch(self, branch):
         """
         Return a UsageLocator for the same block in a different branch of the course.
         """
         return self.replace(course_key=self.course_key.for_branch(branch))
 
+    @_derived_key
     def for_version(self, version_guid):
         """
         Return a UsageLocator for the same block in a different branch of the course.
@@ -818,10 +1340,8 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         """
         Deprecated. Use course and run independently.
         """
-        warnings.warn(
-            "Offering is no longer a supported property of Locator. Please use the course and run properties.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "Offering is no longer a supported property of Locator. Please use the course and run properties."
         )
         if not self.course and not self.run:
             return None
@@ -845,10 +1365,8 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         Deprecated. The ambiguously named field from CourseLocation which code
         expects to find. Equivalent to version_guid.
         """
-        warnings.warn(
-            "Version is no longer supported as a property of Locators. Please use the version_guid property.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "Version is no longer supported as a property of Locators. Please use the version_guid property."
         )
 
         # Returns the version guid for this object.
@@ -860,11 +1378,7 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         Deprecated. The ambiguously named field from Location which code
         expects to find. Equivalent to block_id.
         """
-        warnings.warn(
-            "Name is no longer supported as a property of Locators. Please use the block_id property.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("Name is no longer supported as a property of Locators. Please use the block_id property.")
         return self.block_id
 
     @property
@@ -873,10 +1387,8 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         Deprecated. The ambiguously named field from Location which code
         expects to find. Equivalent to block_type.
         """
-        warnings.warn(
-            "Category is no longer supported as a property of Locators. Please use the block_type property.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "Category is no longer supported as a property of Locators. Please use the block_type property."
         )
         return self.block_type
 
@@ -886,10 +1398,8 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         Deprecated. The ambiguously named field from Location which code
         expects to find. Equivalent to branch.
         """
-        warnings.warn(
-            "Revision is no longer supported as a property of Locators. Please use the branch property.",
-            DeprecationWarning,
-            stacklevel=2
+        deprecation_warning(
+            "Revision is no longer supported as a property of Locators. Please use the branch property."
         )
         return self.branch
 
@@ -917,17 +1427,48 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         """
         return self.replace(course_key=course_key)
 
+    @classmethod
+    def _map_keys_of_type_into_course(cls, keys, course_key):
+        """
+        Return a list of each of `keys` mapped into `course_key`, as by :meth:`map_into_course`.
+
+        The mapped keys reuse the block fields of `keys`, which are already valid, and share `course_key`.
+        """
+        if cls not in (BlockUsageLocator, AssetLocator):
+            # Subclasses may construct keys differently
+            return super(BlockUsageLocator, cls)._map_keys_of_type_into_course(keys, course_key)
+
+        deprecated = course_key.deprecated
+        # Maps the id of each course key that `keys` are in to whether it's equal to `course_key`
+        same_course = {}
+        mapped = []
+        for key in keys:
+            old_course_key = key.course_key
+            try:
+                is_same = same_course[id(old_course_key)]
+            except KeyError:
+                is_same = same_course[id(old_course_key)] = old_course_key == course_key
+            if is_same:
+                # As with replace(), keys already in the course are returned unchanged
+                mapped.append(key)
+            elif key.deprecated and not deprecated:
+                # Deprecated block ids might not be valid in non-deprecated keys
+                mapped.append(key.map_into_course(course_key))
+            else:
+                mapped.append(cls._from_validated(
+                    course_key=course_key, block_type=key.block_type, block_id=key.block_id, deprecated=deprecated,
+                ))
+        return mapped
+
     def _to_string(self):
         """
         Return a string representing this location.
         """
+        # The course key's string is memoized, and shared by every block in the course
         # Allow access to _to_string protected method
-        return u"{course_key}+{BLOCK_TYPE_PREFIX}@{block_type}+{BLOCK_PREFIX}@{block_id}".format(
-            course_key=self.course_key._to_string(),  # pylint: disable=protected-access
-            BLOCK_TYPE_PREFIX=self.BLOCK_TYPE_PREFIX,
+        return self.course_key._to_string() + self.BLOCK_TEMPLATE.format(  # pylint: disable=protected-access
             block_type=self.block_type,
-            BLOCK_PREFIX=self.BLOCK_PREFIX,
-            block_id=self.block_id
+            block_id=self.block_id,
         )
 
     def html_id(self):
@@ -940,12 +1481,59 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         (e.g., I'm assuming periods are fine).
         """
         if self.deprecated:
-            id_fields = [self.DEPRECATED_TAG, self.org, self.course, self.block_type, self.block_id, self.version_guid]
-            id_string = u"-".join([v for v in id_fields if v is not None])
-            return self.clean_for_html(id_string)
+            try:
+                return self._html_id
+            except AttributeError:
+                id_fields = [
+                    self.DEPRECATED_TAG, self.org, self.course, self.block_type, self.block_id, self.version_guid,
+                ]
+                return self._remember_html_id(self.clean_for_html(u"-".join([v for v in id_fields if v is not None])))
         else:
             return self.block_id
 
+    def _remember_html_id(self, html_id):
+        """
+        Cache and return `html_id` as the html_id of this (immutable) key.
+        """
+        object.__setattr__(self, '_html_id', html_id)
+        return html_id
+
+    @classmethod
+    def html_ids(cls, keys):
+        """
+        Return a list of the html_id of each of the usage `keys`.
+
+        The fields of html ids are joined with '-', which clean_for_html keeps, so they can be
+        cleaned separately. The cleaned tag, org and course of deprecated keys are shared
+        between the keys of each course.
+        """
+        # pylint: disable=protected-access
+        # Maps the (tag, org, course) of deprecated keys to the start of their html ids
+        prefixes = {}
+        html_ids = []
+        for key in keys:
+            if not key.deprecated:
+                html_ids.append(key.html_id())
+                continue
+            try:
+                html_ids.append(key._html_id)
+                continue
+            except AttributeError:
+                pass
+            course_key = key.course_key
+            prefix_fields = (key.DEPRECATED_TAG, course_key.org, course_key.course)
+            try:
+                prefix = prefixes[prefix_fields]
+            except KeyError:
+                prefix = prefixes[prefix_fields] = key.clean_for_html(u"-".join(
+                    [v for v in prefix_fields if v is not None]
+                ))
+            id_fields = [key.block_type, key.block_id, key.version_guid]
+            html_ids.append(key._remember_html_id(
+                prefix + u"-" + key.clean_for_html(u"-".join([v for v in id_fields if v is not None]))
+            ))
+        return html_ids
+
     def _to_deprecated_string(self):
         """
         Returns an old-style location, represented as:
@@ -959,11 +1547,7 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
 
     def to_deprecated_string(self):
         """Deprecated. Use unicode(key) instead."""
-        warnings.warn(
-            "to_deprecated_string is deprecated! Use unicode(key) instead.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("to_deprecated_string is deprecated! Use unicode(key) instead.")
         return text_type(self)
 
     @classmethod
@@ -986,7 +1570,24 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         match = cls.DEPRECATED_URL_RE.match(serialized)
         if match is None:
             raise InvalidKeyError(BlockUsageLocator, serialized)
-        groups = match.groupdict()
+        return cls._from_deprecated_parsed(match.groupdict())
+
+    @classmethod
+    def _from_deprecated_bytes(cls, serialized):
+        """
+        Return an instance of `cls` parsed from its UTF-8 encoded deprecated `serialized` form,
+        decoding only the fields matched by ``DEPRECATED_URL_RE_BYTES``.
+        """
+        groups = _match_bytes(cls.DEPRECATED_URL_RE_BYTES, serialized)
+        if groups is None:
+            return super(BlockUsageLocator, cls)._from_deprecated_bytes(serialized)
+        return cls._from_deprecated_parsed(groups)
+
+    @classmethod
+    def _from_deprecated_parsed(cls, groups):
+        """
+        Return an instance of `cls` built from the named groups of a deprecated url match
+        """
         course_key = CourseLocator(
             org=groups['org'],
             course=groups['course'],
@@ -1014,6 +1615,37 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         son[prefix + 'revision'] = self.course_key.branch
         return son
 
+    @classmethod
+    def deprecated_son_queries(cls, keys, prefix='', tag='i4x', chunk_size=DEPRECATED_SON_CHUNK_SIZE):
+        """
+        Return a list of SON query documents that together match the documents whose ids are the
+        `to_deprecated_son` of any of the `keys`, for instance in ``{'$or': queries}``.
+
+        The keys are grouped by org, course, revision and category, and each query matches the
+        names of up to `chunk_size` keys of one group with ``$in``. A group of one key is queried
+        with exactly its `to_deprecated_son`.
+        """
+        fields = [prefix + field for field in ('tag', 'org', 'course', 'category', 'name', 'revision')]
+        # Maps each (org, course, revision, category) to an OrderedDict of the names in that group
+        groups = OrderedDict()
+        for key in keys:
+            course_key = key.course_key
+            group = (course_key.org, course_key.course, course_key.branch, key.block_type)
+            try:
+                names = groups[group]
+            except KeyError:
+                names = groups[group] = OrderedDict()
+            names[key.block_id] = None
+
+        queries = []
+        for (org, course, revision, category), names in groups.items():
+            names = list(names)
+            for start in range(0, len(names), chunk_size):
+                chunk = names[start:start + chunk_size]
+                name = chunk[0] if len(chunk) == 1 else {'$in': chunk}
+                queries.append(SON(zip(fields, (tag, org, course, category, name, revision))))
+        return queries
+
     @classmethod
     def _from_deprecated_son(cls, id_dict, run):
         """
@@ -1028,6 +1660,35 @@ class BlockUsageLocator(BlockLocatorBase, UsageKey):
         )
         return cls(course_key, id_dict['category'], id_dict['name'], deprecated=True)
 
+    @classmethod
+    def from_deprecated_sons(cls, id_dicts, run):
+        """
+        Yield the key decoding each of `id_dicts` (such as the ``_id`` of each document read by
+        an old Mongo cursor) and `run`, as `_from_deprecated_son` would.
+
+        The keys of each course and revision share one course key, and each distinct name is
+        validated only once.
+        """
+        # Maps each (org, course, revision) to its course key
+        course_keys = {}
+        # The names already validated
+        valid_names = set()
+        for id_dict in id_dicts:
+            course = (id_dict['org'], id_dict['course'], id_dict['revision'])
+            try:
+                course_key = course_keys[course]
+            except KeyError:
+                course_key = course_keys[course] = CourseLocator(
+                    course[0], course[1], run, course[2], deprecated=True,
+                )
+            name = id_dict['name']
+            if name not in valid_names:
+                cls._parse_block_ref(name, True)
+                valid_names.add(name)
+            yield cls._from_validated(
+                course_key=course_key, block_type=id_dict['category'], block_id=name, deprecated=True,
+            )
+
 
 # register BlockUsageLocator as the deprecated fallback for UsageKey
 UsageKey.set_deprecated_fallback(BlockUsageLocator)
@@ -1087,24 +1748,44 @@ class LibraryUsageLocator(BlockUsageLocator):
         return super(LibraryUsageLocator, self).replace(**kwargs)
 
     @classmethod
-    def _from_string(cls, serialized):
+    def _from_block_pairs(cls, course_key, pairs):
         """
-        Requests LibraryLocator to deserialize its part and then adds the local deserialization of block
+        Return a list of the LibraryUsageLocators in the library `course_key` of each
+        (block_type, block_id) in `pairs`, as made by the constructor.
         """
-        # Allow access to _from_string protected method
-        library_key = LibraryLocator._from_string(serialized)  # pylint: disable=protected-access
-        parsed_parts = LibraryLocator.parse_url(serialized)
+        pairs = list(pairs)
+        if course_key.deprecated or not cls._valid_ids(set(value for pair in pairs for value in pair)):
+            return [cls(course_key, block_type, block_id) for block_type, block_id in pairs]
+        return [
+            cls._from_validated(library_key=course_key, block_type=block_type, block_id=block_id)
+            for block_type, block_id in pairs
+        ]
 
-        block_id = parsed_parts.get('block_id', None)
-        if block_id is None:
-            raise InvalidKeyError(cls, serialized)
+    @classmethod
+    def _from_string(cls, serialized):
+        """
+        Return a LibraryUsageLocator parsing the given serialized string, matching it only once
+        for both the library key and the block fields.
+        """
+        return cls._from_parsed(cls.parse_url(serialized), serialized)
 
-        block_type = parsed_parts.get('block_type')
-        if block_type is None:
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return a LibraryUsageLocator built from the fields parsed out of `serialized`
+        """
+        block_id = parse['block_id']
+        block_type = parse['block_type']
+        if block_id is None or block_type is None:
             raise InvalidKeyError(cls, serialized)
-
-        return cls(library_key, parsed_parts.get('block_type'), block_id)
-
+        # Allow access to _from_parsed protected method
+        library_key = LibraryLocator._from_parsed(parse, serialized)  # pylint: disable=protected-access
+        if u'%' in block_id:
+            # GRAMMAR accepts '%' in block ids, which LibraryUsageLocators don't allow
+            block_id = cls._parse_block_ref(block_id)
+        return cls._from_validated(library_key=library_key, block_type=block_type, block_id=block_id)
+
+    @_derived_key
     def version_agnostic(self):
         """
         We don't care if the locator's version is not the current head; so, avoid version conflict
@@ -1116,12 +1797,14 @@ class LibraryUsageLocator(BlockUsageLocator):
         """
         return self.replace(library_key=self.library_key.version_agnostic())
 
+    @_derived_key
     def for_branch(self, branch):
         """
         Return a UsageLocator for the same block in a different branch of the library.
         """
         return self.replace(library_key=self.library_key.for_branch(branch))
 
+    @_derived_key
     def for_version(self, version_guid):
         """
         Return a UsageLocator for the same block in a different version of the library.
@@ -1139,11 +1822,7 @@ class LibraryUsageLocator(BlockUsageLocator):
     @property
     def run(self):
         """Returns the run for this object's library_key."""
-        warnings.warn(
-            "Run is a deprecated property of LibraryUsageLocators.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("Run is a deprecated property of LibraryUsageLocators.")
         return self.library_key.RUN
 
     def _to_deprecated_string(self):
@@ -1155,15 +1834,30 @@ class LibraryUsageLocator(BlockUsageLocator):
         """ Disable some deprecated methods of our parent class. """
         raise NotImplementedError
 
+    @classmethod
+    def _from_deprecated_bytes(cls, serialized):
+        """ Disable some deprecated methods of our parent class. """
+        raise NotImplementedError
+
     def to_deprecated_son(self, prefix='', tag='i4x'):
         """ Disable some deprecated methods of our parent class. """
         raise NotImplementedError
 
+    @classmethod
+    def deprecated_son_queries(cls, keys, prefix='', tag='i4x', chunk_size=None):
+        """ Disable some deprecated methods of our parent class. """
+        raise NotImplementedError
+
     @classmethod
     def _from_deprecated_son(cls, id_dict, run):
         """ Disable some deprecated methods of our parent class. """
         raise NotImplementedError
 
+    @classmethod
+    def from_deprecated_sons(cls, id_dicts, run):
+        """ Disable some deprecated methods of our parent class. """
+        raise NotImplementedError
+
 
 class DefinitionLocator(Locator, DefinitionKey):
     """
@@ -1175,7 +1869,8 @@ class DefinitionLocator(Locator, DefinitionKey):
 
     # override the abstractproperty
     block_type = None
-    definition_id = None
+    definition_id = _ObjectIdField('_definition_id')
+    _definition_id = None
 
     def __init__(self, block_type, definition_id, deprecated=False):    # pylint: disable=unused-argument
         if isinstance(definition_id, string_types):
@@ -1190,14 +1885,14 @@ class DefinitionLocator(Locator, DefinitionKey):
         Return a string representing this location.
         unicode(self) returns something like this: "519665f6223ebd6980884f2b+type+problem"
         """
-        return u"{}+{}@{}".format(text_type(self.definition_id), self.BLOCK_TYPE_PREFIX, self.block_type)
+        return self.GRAMMAR.serialize(definition_id=_object_id_text(self._definition_id), block_type=self.block_type)
 
-    URL_RE = re.compile(
-        r"^(?P<definition_id>[a-f0-9]+)\+{}@(?P<block_type>{ALLOWED_ID_CHARS}+)\Z".format(
-            Locator.BLOCK_TYPE_PREFIX, ALLOWED_ID_CHARS=Locator.ALLOWED_ID_CHARS
-        ),
-        re.VERBOSE | re.UNICODE
+    GRAMMAR = KeyGrammar(
+        Field('definition_id', r'[a-f0-9]'),
+        Field('block_type', Locator.ALLOWED_ID_CHARS, prefix=Locator.BLOCK_TYPE_PREFIX),
     )
+    URL_RE = GRAMMAR.regex
+    URL_RE_BYTES = GRAMMAR.bytes_regex
 
     @classmethod
     def _from_string(cls, serialized):
@@ -1205,15 +1900,21 @@ class DefinitionLocator(Locator, DefinitionKey):
         Return a DefinitionLocator parsing the given serialized string
         :param serialized: matches the string to
         """
-        parse = cls.URL_RE.match(serialized)
-        if not parse:
+        parse = cls.GRAMMAR.parse(serialized)
+        if parse is None:
             raise InvalidKeyError(cls, serialized)
+        return cls._from_parsed(parse, serialized)
 
-        parse = parse.groupdict()
-        if parse['definition_id']:
-            parse['definition_id'] = cls.as_object_id(parse['definition_id'])
-
-        return cls(**{key: parse.get(key) for key in cls.KEY_FIELDS})
+    @classmethod
+    def _from_parsed(cls, parse, serialized):
+        """
+        Return a DefinitionLocator built from the fields parsed out of `serialized`
+        """
+        # GRAMMAR has already checked the characters of each field
+        return cls._from_validated(
+            definition_id=cls._object_id_binary(parse['definition_id']),
+            block_type=parse['block_type'],
+        )
 
     def version(self):
         """
@@ -1222,25 +1923,194 @@ class DefinitionLocator(Locator, DefinitionKey):
         return self.definition_id
 
 
+class _VersionIndex(object):
+    """
+    The state shared by the nodes of a :class:`VersionTree` history.
+    """
+    __slots__ = ('root', 'tree_dict', 'nodes', 'complete', 'order', 'jumps')
+
+    def __init__(self, tree_dict):
+        self.root = None
+        self.tree_dict = tree_dict
+        # Maps each version to its node, as the nodes are built
+        self.nodes = {}
+        # Whether every node of the history has been built
+        self.complete = not tree_dict
+        # Once the history has been ranked for ancestry queries, its nodes in preorder, and
+        # the ranks of the 2**k-th ancestor of each node, by k (with the root as its own parent)
+        self.order = None
+        self.jumps = None
+
+
 class VersionTree(object):
     """
     Holds trees of Locators to represent version histories.
+
+    The children of each version are built from `tree_dict` when they're first read, rather
+    than all at once, and the nodes of a history share an index of their versions.
+
+    The first ancestry query (:meth:`is_ancestor`, :meth:`lowest_common_ancestor`) builds the
+    whole history and ranks its nodes, so that later queries don't walk the tree.
     """
     def __init__(self, locator, tree_dict=None):
         """
         :param locator: must be version specific (Course has version_guid or definition had id)
+        :param tree_dict: maps the version of each locator of the history to a list of the
+            locators of its children
+        """
+        index = _VersionIndex(tree_dict)
+        self._init_node(locator, index, None)
+        index.root = self
+
+    def _init_node(self, locator, index, parent):
+        """
+        Make this the node of `locator`, a child of the node `parent`, in the history indexed by `index`.
         """
         if not isinstance(locator, Locator) and not inspect.isabstract(locator):
             raise TypeError("locator {} must be a concrete subclass of Locator".format(locator))
-        version = ((hasattr(locator, 'version_guid') and locator.version_guid) or
-                   (hasattr(locator, 'definition_id') and locator.definition_id))
+        version = getattr(locator, 'version_guid', None) or getattr(locator, 'definition_id', None)
         if not version:
             raise ValueError("locator must be version specific (Course has version_guid or definition had id)")
+        if version in index.nodes:
+            raise ValueError("version {} appears more than once in the history".format(version))
         self.locator = locator
-        if tree_dict is None:
-            self.children = []
-        else:
-            self.children = [VersionTree(child, tree_dict) for child in tree_dict.get(version, [])]
+        self.version = version
+        self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+        self._index = index
+        self._children = None if index.tree_dict else []
+        # The preorder rank of this node, and of its last descendant, once the history is ranked
+        self._rank = self._last = None
+        index.nodes[version] = self
+
+    @property
+    def children(self):
+        """
+        The VersionTrees of the children of this version.
+        """
+        if self._children is None:
+            index = self._index
+            children = []
+            try:
+                for locator in index.tree_dict.get(self.version, ()):
+                    child = object.__new__(type(self))
+                    child._init_node(locator, index, self)  # pylint: disable=protected-access
+                    children.append(child)
+            except (TypeError, ValueError):
+                # Leave the history as it was, so that reading the children raises again
+                for child in children:
+                    del index.nodes[child.version]
+                raise
+            self._children = children
+        return self._children
+
+    def walk(self):
+        """
+        Yield this node and every node below it, parents before their children.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def expand(self):
+        """
+        Build every node of the history below this one, and return this node.
+        """
+        for __ in self.walk():
+            pass
+        return self
+
+    def find(self, version):
+        """
+        Return the node of `version` in the history that this node belongs to, or None if
+        the version isn't in it.
+        """
+        index = self._index
+        node = index.nodes.get(version)
+        if node is None and not index.complete:
+            index.root.expand()
+            index.complete = True
+            node = index.nodes.get(version)
+        return node
+
+    def _find_ranked(self, version):
+        """
+        Return the node of `version` in the ranked history, or raise a ValueError if it isn't in it.
+        """
+        # pylint: disable=protected-access
+        index = self._index
+        if index.jumps is None:
+            order = list(index.root.walk())
+            index.complete = True
+            for rank, node in enumerate(order):
+                node._rank = rank
+            # Descendants follow their ancestors in preorder, so each node's descendants are
+            # ranked from its own rank to the last rank of its last child
+            for node in reversed(order):
+                children = node.children
+                node._last = children[-1]._last if children else node._rank
+            jump = [0 if node.parent is None else node.parent._rank for node in order]
+            jumps = [jump]
+            while 1 << len(jumps) < len(order):
+                jump = [jump[parent] for parent in jump]
+                jumps.append(jump)
+            index.order = order
+            index.jumps = jumps
+        node = index.nodes.get(version)
+        if node is None:
+            raise ValueError("version {} isn't in the history".format(version))
+        return node
+
+    def ancestors(self, version):
+        """
+        Return the nodes of the ancestors of `version` in the history that this node belongs
+        to, from its parent to the root.
+        """
+        node = self.find(version)
+        if node is None:
+            raise ValueError("version {} isn't in the history".format(version))
+        ancestors = []
+        node = node.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        return ancestors
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+        Return whether the version `ancestor` is an ancestor (but not the same version) of
+        the version `descendant`, in the history that this node belongs to.
+        """
+        ancestor = self._find_ranked(ancestor)
+        descendant = self._find_ranked(descendant)
+        # pylint: disable=protected-access
+        return ancestor._rank < descendant._rank <= ancestor._last
+
+    def lowest_common_ancestor(self, version_a, version_b):
+        """
+        Return the node of the latest version that both `version_a` and `version_b` descend
+        from (or are), in the history that this node belongs to.
+        """
+        # pylint: disable=protected-access
+        node_a = self._find_ranked(version_a)
+        node_b = self._find_ranked(version_b)
+        rank_b = node_b._rank
+        if node_a._rank <= rank_b <= node_a._last:
+            return node_a
+        if rank_b <= node_a._rank <= node_b._last:
+            return node_b
+        # Climb from version_a to the highest ancestor that isn't an ancestor of version_b:
+        # its parent is the lowest common ancestor
+        index = self._index
+        order = index.order
+        rank = node_a._rank
+        for jump in reversed(index.jumps):
+            ancestor = order[jump[rank]]
+            if not ancestor._rank <= rank_b <= ancestor._last:
+                rank = ancestor._rank
+        return order[index.jumps[0][rank]]
 
 
 class AssetLocator(BlockUsageLocator, AssetKey):    # pylint: disable=abstract-method
@@ -1261,10 +2131,14 @@ class AssetLocator(BlockUsageLocator, AssetKey):    # pylint: disable=abstract-m
         (@(?P<revision>[^/]+))?
         \Z
     """, re.VERBOSE)
+    DEPRECATED_URL_RE_BYTES = _bytes_pattern(ASSET_URL_RE)
 
     ALLOWED_ID_RE = BlockUsageLocator.DEPRECATED_ALLOWED_ID_RE
     # Allow empty asset ids. Used to generate a prefix url
-    DEPRECATED_ALLOWED_ID_RE = re.compile(r'^' + Locator.DEPRECATED_ALLOWED_ID_CHARS + r'+\Z', re.UNICODE)
+    DEPRECATED_ALLOWED_ID_RE = CachedPattern(
+        re.compile(r'^' + Locator.DEPRECATED_ALLOWED_ID_CHARS + r'+\Z', re.UNICODE),
+        name='AssetLocator.DEPRECATED_ALLOWED_ID_RE',
+    )
 
     @property
     def path(self):
@@ -1298,11 +2172,7 @@ class AssetLocator(BlockUsageLocator, AssetKey):    # pylint: disable=abstract-m
 
     def to_deprecated_string(self):
         """Deprecated. Use unicode(key) instead."""
-        warnings.warn(
-            "to_deprecated_string is deprecated! Use unicode(key) instead.",
-            DeprecationWarning,
-            stacklevel=2
-        )
+        deprecation_warning("to_deprecated_string is deprecated! Use unicode(key) instead.")
         return text_type(self)
 
     @property
@@ -1315,15 +2185,7 @@ class AssetLocator(BlockUsageLocator, AssetKey):    # pylint: disable=abstract-m
         match = cls.ASSET_URL_RE.match(serialized)
         if match is None:
             raise InvalidKeyError(cls, serialized)
-        groups = match.groupdict()
-        course_key = CourseLocator(
-            groups['org'],
-            groups['course'],
-            None,
-            groups.get('revision', None),
-            deprecated=True
-        )
-        return cls(course_key, groups['category'], groups['name'], deprecated=True)
+        return cls._from_deprecated_parsed(match.groupdict())
 
     def to_deprecated_list_repr(self):
         """
@@ -0,0 +1,427 @@
+"""
+Migration of serialized keys from deprecated to canonical forms.
+
+Reads a file of serialized keys, one per line (or, with ``--csv``, in some columns of a
+CSV file), and writes the file with each key in its canonical form:
+
+=================================================  ===============================
+Deprecated form                                    Canonical form
+=================================================  ===============================
+``org/course/run``, ``slashes:org+course+run``     ``course-v1:org+course+run``
+``i4x://org/course/type/id``                       ``block-v1:org+course+run+...``
+``location:org+course+run+type+id``                ``block-v1:org+course+run+...``
+``/c4x/org/course/type/id``                        ``asset-v1:org+course+run+...``
+``asset-location:org+course+run+type+id``          ``asset-v1:org+course+run+...``
+``aside-usage-v1:...``, ``aside-def-v1:...``       ``aside-usage-v2:...``, ``aside-def-v2:...``
+=================================================  ===============================
+
+Deprecated usage and asset keys don't include the run of their course, which is looked up
+in a file of course keys given with ``--courses`` (see :class:`.RunCatalog`). Keys that can't
+be converted are written unchanged, and counted.
+
+The input is converted in chunks of lines by a pool of processes. Every few chunks, the
+output is flushed and the position reached in both files is saved to a checkpoint file, so
+that a run that is interrupted continues from its last checkpoint when it's run again::
+
+    python -m opaque_keys.edx.migrate keys.txt canonical_keys.txt --courses course_ids.txt
+    python -m opaque_keys.edx.migrate rows.csv canonical_rows.csv --csv --columns usage_id,course_id --header
+
+CSV records with quoted newlines are kept whole: chunks of a CSV file are only cut between records.
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+from collections import Counter
+
+import six
+
+from opaque_keys import InvalidKeyError, OpaqueKey
+from opaque_keys.edx.asides import AsideDefinitionKeyV1, AsideDefinitionKeyV2, AsideUsageKeyV1, AsideUsageKeyV2
+from opaque_keys.edx.catalog import RunCatalog
+from opaque_keys.edx.keys import AssetKey, BlockTypeKey, CourseKey, DefinitionKey, UsageKey
+from opaque_keys.edx.locations import DeprecatedLocation
+from opaque_keys.edx.locator import AssetLocator, BlockUsageLocator, CourseLocator
+
+# The key type of deprecated keys that don't have a namespace, by their prefix
+_DEPRECATED_PREFIXES = (('i4x://', UsageKey), ('/c4x/', AssetKey))
+
+# The counts reported for each run
+COUNTS = ('converted', 'unchanged', 'failed')
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_CHECKPOINT_EVERY = 10
+
+# The state of each worker process, set by `_init_worker`
+_WORKER = {}
+
+# Maps each namespace to the key type that registered it, filled in by `_key_type`
+_NAMESPACE_KEY_TYPES = {}
+
+
+def _key_type(namespace):
+    """
+    Return the edx key type that registered `namespace`, or None if none did.
+    """
+    # pylint: disable=protected-access
+    if not _NAMESPACE_KEY_TYPES:
+        for key_type in (CourseKey, UsageKey, AssetKey, DefinitionKey, BlockTypeKey):
+            for extension in key_type._drivers():
+                _NAMESPACE_KEY_TYPES.setdefault(extension.name, key_type)
+    return _NAMESPACE_KEY_TYPES.get(namespace)
+
+
+def parse_key(serialized):
+    """
+    Return the key deserialized from `serialized`, in any canonical form, or any of the
+    deprecated forms parsed by the deprecated fallbacks of the edx key types.
+
+    Raises:
+        InvalidKeyError: if `serialized` isn't a valid key.
+    """
+    for prefix, key_type in _DEPRECATED_PREFIXES:
+        if serialized.startswith(prefix):
+            return key_type.from_string(serialized)
+    namespace, separator, __ = serialized.partition(OpaqueKey.NAMESPACE_SEPARATOR)
+    if separator:
+        key_type = _key_type(namespace)
+        if key_type is None:
+            raise InvalidKeyError(OpaqueKey, serialized)
+        return key_type.from_string(serialized)
+    # Deprecated course keys are the only keys without a namespace
+    return CourseKey.from_string(serialized)
+
+
+class KeyMigrator(object):
+    """
+    Converts keys to their canonical forms.
+
+    Args:
+        catalog (RunCatalog): The catalog to look up the runs of deprecated usage and asset keys in.
+    """
+    def __init__(self, catalog=None):
+        self.catalog = catalog if catalog is not None else RunCatalog()
+        # Maps each deprecated course key to its canonical course key
+        self._course_keys = {}
+        self.counts = Counter()
+
+    def _canonical_course_key(self, course_key):
+        """
+        Return the canonical form of the course key `course_key`.
+        """
+        if not course_key.deprecated:
+            return course_key
+        try:
+            return self._course_keys[course_key]
+        except KeyError:
+            pass
+        upgraded = self.catalog.upgrade_key(course_key) if course_key.run is None else course_key
+        canonical = self._course_keys[course_key] = CourseLocator(
+            upgraded.org, upgraded.course, upgraded.run, upgraded.branch,
+        )
+        return canonical
+
+    def canonical_key(self, key):
+        """
+        Return the canonical form of `key`.
+
+        Raises:
+            InvalidKeyError: if `key` doesn't have a canonical form (for instance, because the
+                run of its course isn't known).
+        """
+        key_class = type(key)
+        if key_class is AsideUsageKeyV1:
+            return AsideUsageKeyV2(self.canonical_key(key.usage_key), key.aside_type)
+        if key_class is AsideDefinitionKeyV1:
+            return AsideDefinitionKeyV2(self.canonical_key(key.definition_key), key.aside_type)
+        if isinstance(key, CourseLocator):
+            return self._canonical_course_key(key)
+        # DeprecatedLocation includes the namespaced asset-location keys
+        if isinstance(key, BlockUsageLocator) and (key.deprecated or isinstance(key, DeprecatedLocation)):
+            canonical_class = AssetLocator if isinstance(key, AssetLocator) else BlockUsageLocator
+            return canonical_class(self._canonical_course_key(key.course_key), key.block_type, key.block_id)
+        return key
+
+    def migrate(self, serialized):
+        """
+        Return the canonical serialization of the key `serialized`, or `serialized` if it can't
+        be converted, and count the result.
+        """
+        try:
+            migrated = six.text_type(self.canonical_key(parse_key(serialized)))
+        except (InvalidKeyError, ValueError, TypeError):
+            self.counts['failed'] += 1
+            return serialized
+        self.counts['converted' if migrated != serialized else 'unchanged'] += 1
+        return migrated
+
+
+def _csv_rows(lines):
+    """
+    Return an iterator of the rows of the UTF-8 encoded CSV `lines`, as lists of text fields.
+    """
+    if six.PY2:
+        return ([field.decode('utf-8') for field in row] for row in csv.reader(lines))
+    return csv.reader(line.decode('utf-8') for line in lines)
+
+
+def _csv_line(row):
+    """
+    Return the UTF-8 encoded CSV line of the text fields `row`.
+    """
+    if six.PY2:
+        output = io.BytesIO()
+        csv.writer(output, lineterminator='\n').writerow([field.encode('utf-8') for field in row])
+        return output.getvalue()
+    output = io.StringIO()
+    csv.writer(output, lineterminator='\n').writerow(row)
+    return output.getvalue().encode('utf-8')
+
+
+def migrate_lines(migrator, lines, columns=None):
+    """
+    Return the UTF-8 encoded text of the UTF-8 encoded `lines` with their keys migrated by
+    `migrator`.
+
+    Each line is a single key if `columns` is None, and otherwise a CSV row whose fields at the
+    indexes `columns` are keys. Empty fields and blank lines are left as they are.
+    """
+    output = []
+    if columns is None:
+        for line in lines:
+            serialized = line.rstrip(b'\r\n')
+            ending = line[len(serialized):]
+            if serialized:
+                serialized = migrator.migrate(serialized.decode('utf-8')).encode('utf-8')
+            output.append(serialized + ending)
+        return b''.join(output)
+
+    for row in _csv_rows(lines):
+        for index in columns:
+            if index < len(row) and row[index]:
+                row[index] = migrator.migrate(row[index])
+        output.append(_csv_line(row))
+    return b''.join(output)
+
+
+def _init_worker(courses_path):
+    """
+    Set up the state of a worker process.
+    """
+    _WORKER['migrator'] = KeyMigrator(_load_catalog(courses_path))
+
+
+def _migrate_chunk(args):
+    """
+    Return the migrated text of a chunk of lines, the length of the chunk, and the counts
+    of the keys in it.
+    """
+    lines, columns = args
+    migrator = _WORKER['migrator']
+    migrator.counts.clear()
+    return migrate_lines(migrator, lines, columns), sum(len(line) for line in lines), dict(migrator.counts)
+
+
+def _load_catalog(courses_path):
+    """
+    Return the :class:`.RunCatalog` of the course keys in the file `courses_path`, if any.
+    """
+    if courses_path is None:
+        return RunCatalog()
+    with io.open(courses_path, encoding='utf-8') as courses:
+        return RunCatalog.from_file(courses)
+
+
+def _in_quotes(line, in_quotes=False):
+    """
+    Return whether a CSV record continues past the UTF-8 encoded `line` in a quoted field,
+    given whether the line starts `in_quotes`.
+
+    Quotes open and close quoted fields in pairs, and quotes within them are doubled, so a
+    record ends with the first line that leaves it with an even number of quotes.
+    """
+    return in_quotes != (line.count(b'"') % 2 == 1)
+
+
+def _read_record(source):
+    """
+    Return the lines of the next CSV record read from the binary file `source`, joined.
+    """
+    record = line = source.readline()
+    in_quotes = _in_quotes(line)
+    while in_quotes and line:
+        line = source.readline()
+        record += line
+        in_quotes = _in_quotes(line, in_quotes)
+    return record
+
+
+def _chunks(source, chunk_size, records=False):
+    """
+    Yield lists of up to `chunk_size` lines read from the binary file `source`.
+
+    If `records`, the lines are of a CSV file, and a chunk may hold more lines, so that it
+    ends with the end of a record.
+
+    Raises:
+        ValueError: if a CSV file ends in a quoted field.
+    """
+    chunk = []
+    in_quotes = False
+    for line in iter(source.readline, b''):
+        chunk.append(line)
+        if records:
+            in_quotes = _in_quotes(line, in_quotes)
+        if len(chunk) >= chunk_size and not in_quotes:
+            yield chunk
+            chunk = []
+    if in_quotes:
+        raise ValueError("The CSV file ends in a quoted field")
+    if chunk:
+        yield chunk
+
+
+def _save_checkpoint(path, state):
+    """
+    Atomically replace the checkpoint file `path` with the JSON of `state`.
+    """
+    temp_path = path + '.tmp'
+    with io.open(temp_path, 'w', encoding='utf-8') as checkpoint:
+        checkpoint.write(six.text_type(json.dumps(state)))
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    os.rename(temp_path, path)
+
+
+def _resolve_columns(columns, header):
+    """
+    Return the indexes of the `columns`, a comma-separated list of column indexes or (with a
+    `header` row) names.
+    """
+    indexes = []
+    for column in columns.split(','):
+        column = column.strip()
+        if column.isdigit():
+            indexes.append(int(column))
+        elif header is not None and column in header:
+            indexes.append(header.index(column))
+        else:
+            raise ValueError("Unknown column {!r}".format(column))
+    return indexes
+
+
+def migrate_file(input_path, output_path, courses_path=None, csv_columns=None, header=False, processes=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    """
+    Write the file `input_path` to `output_path` with its keys migrated to their canonical forms,
+    and return a Counter of the number of keys converted, unchanged, and failed.
+
+    Args:
+        courses_path: A file of course keys to look up the runs of deprecated keys in.
+        csv_columns: If set, the input is a CSV file, and this is a comma-separated list of the
+            indexes (or, with `header`, names) of its columns of keys.
+        header (bool): Whether the first row of a CSV input is a header, to copy unchanged.
+        processes (int): The number of worker processes, by default one per CPU. With 1, the
+            keys are migrated in this process.
+        chunk_size (int): The number of lines handed to a worker at a time.
+        checkpoint_path: The checkpoint file, by default `output_path` + '.checkpoint'. If it
+            exists, the migration continues from it. It's removed once the migration is done.
+        checkpoint_every (int): The number of chunks written between checkpoints.
+    """
+    checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+    state = {'input': os.path.abspath(input_path), 'input_offset': 0, 'output_offset': 0, 'counts': {}}
+    if os.path.exists(checkpoint_path):
+        with io.open(checkpoint_path, encoding='utf-8') as checkpoint:
+            saved = json.load(checkpoint)
+        if saved.get('input') != state['input']:
+            raise ValueError("Checkpoint {} is for another input, {}".format(checkpoint_path, saved.get('input')))
+        state = saved
+        output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        if output_size < state['output_offset']:
+            raise ValueError("Checkpoint {} is at offset {} of {}, which only has {} bytes".format(
+                checkpoint_path, state['output_offset'], output_path, output_size,
+            ))
+    counts = Counter(state['counts'])
+
+    with io.open(input_path, 'rb') as source, io.open(output_path, 'ab') as destination:
+        # Drop anything written after the checkpoint
+        destination.seek(state['output_offset'])
+        destination.truncate()
+        columns = None
+        if csv_columns is not None:
+            header_row = None
+            if header:
+                header_line = _read_record(source)
+                header_row = next(_csv_rows([header_line]), [])
+                if not state['input_offset']:
+                    destination.write(header_line)
+            columns = _resolve_columns(csv_columns, header_row)
+        source.seek(max(state['input_offset'], source.tell()))
+        # The input read ahead by the workers isn't done until its output is written
+        input_offset = source.tell()
+
+        chunks = ((chunk, columns) for chunk in _chunks(source, chunk_size, records=columns is not None))
+        pool = None
+        if processes == 1:
+            _init_worker(courses_path)
+            results = six.moves.map(_migrate_chunk, chunks)
+        else:
+            pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(courses_path,))
+            results = pool.imap(_migrate_chunk, chunks)
+
+        try:
+            for done, (output, length, chunk_counts) in enumerate(results, 1):
+                destination.write(output)
+                input_offset += length
+                counts.update(chunk_counts)
+                if done % checkpoint_every == 0:
+                    destination.flush()
+                    os.fsync(destination.fileno())
+                    state.update(input_offset=input_offset, output_offset=destination.tell(), counts=dict(counts))
+                    _save_checkpoint(checkpoint_path, state)
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return counts
+
+
+def main(argv=None):
+    """
+    Run the migration, and return the process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help="The file of keys to migrate")
+    parser.add_argument('output', help="The file to write the migrated keys to")
+    parser.add_argument('--courses', help="A file of course keys, one per line, to look up the runs of keys in")
+    parser.add_argument('--csv', action='store_true', help="Read and write CSV files")
+    parser.add_argument('--columns', default='0', help="Comma-separated indexes or names of the CSV columns of keys")
+    parser.add_argument('--header', action='store_true', help="The first CSV row is a header")
+    parser.add_argument('--processes', type=int, help="The number of worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Lines per chunk of work")
+    parser.add_argument('--checkpoint', help="The checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help="Chunks written between checkpoints")
+    args = parser.parse_args(argv)
+
+    counts = migrate_file(
+        args.input, args.output, courses_path=args.courses, csv_columns=args.columns if args.csv else None,
+        header=args.header, processes=args.processes, chunk_size=args.chunk_size, checkpoint_path=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+    )
+    print(u', '.join(u'{} {}'.format(counts[name], name) for name in COUNTS), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""
+Rewriting of the course keys embedded in serialized keys within large texts.
+
+Data migrations that move content between courses (or from deprecated to canonical
+keys) need to rewrite every key of the old courses that appears in dumps that may be
+many gigabytes long. :class:`CourseKeyRewriter` finds the serialized course, usage and
+asset keys in a text with a single regex, built from the locator grammar, and swaps
+the course part of those that belong to a mapped course with string operations only,
+without building any key objects::
+
+    rewriter = CourseKeyRewriter({
+        CourseKey.from_string('course-v1:edX+DemoX+2014'): CourseKey.from_string('course-v1:edX+DemoX+2015'),
+    })
+    with io.open('dump.csv', encoding='utf-8') as source, io.open('new.csv', 'w', encoding='utf-8') as dest:
+        rewriter.rewrite_file(source, dest)
+    print(rewriter.counts)
+
+Keys are matched by the org, course and run of their course, and any branch or version
+in them is kept. Keys of deprecated source courses (``org/course/run``, ``i4x://`` and
+``/c4x/`` keys) are rewritten in canonical form, unless the target course is also
+deprecated. Deprecated usage and asset keys don't include the run of their course, so
+they're matched by org and course alone.
+
+Rendering course content similarly rewrites the URLs of its static assets, in either
+form (``/c4x/org/course/asset/name`` or ``/asset-v1:org+course+run+type@asset+block@name``),
+to the URLs they're served from. :class:`AssetUrlRewriter` finds them in a single scan of
+the document, and parses each distinct URL only once::
+
+    rewriter = AssetUrlRewriter(lambda asset_key: u'https://cdn.example.com/{}'.format(asset_key))
+    html = rewriter.rewrite(html)
+"""
+import re
+from collections import Counter
+
+from opaque_keys import InvalidKeyError, OpaqueKey
+from opaque_keys.edx.grammar import SEPARATOR, Field
+from opaque_keys.edx.keys import AssetKey
+from opaque_keys.edx.locator import AssetLocator, BlockLocatorBase, CourseLocator, Locator
+
+# The characters that can be part of a serialized key, next to which a key can't start or end
+_KEY_CHARS = u'\\w\\-~.:%+@'
+_NOT_BEFORE = u'(?![{}])'.format(_KEY_CHARS)
+# Deprecated keys are '/'-separated, so also can't end next to a '/'
+_NOT_BEFORE_DEPRECATED = u'(?![{}/])'.format(_KEY_CHARS)
+
+# The characters of the fields of deprecated keys
+_DEPRECATED_CHARS = r'[\w.%-]'
+_DEPRECATED_NAME_CHARS = r'[\w.:%-]'
+
+_FIELDS = {field.name: field for field in BlockLocatorBase.GRAMMAR.fields}
+_USAGE_BLOCK_ID = Field('block_id', Locator.ALLOWED_ID_CHARS, prefix=BlockLocatorBase.BLOCK_PREFIX)
+_CANONICAL_ID_RE = re.compile(u'^{}+\\Z'.format(Locator.ALLOWED_ID_CHARS), re.UNICODE)
+_CANONICAL_BLOCK_ID_RES = {
+    u'block-v1': _CANONICAL_ID_RE,
+    u'asset-v1': re.compile(u'^{}+\\Z'.format(BlockLocatorBase.BLOCK_ALLOWED_ID_CHARS), re.UNICODE),
+}
+
+# The rest of a canonical key, after its run, for each namespace
+_CANONICAL_RESTS = {
+    u'course-v1': (_FIELDS['branch'], _FIELDS['version_guid']),
+    u'block-v1': (_FIELDS['branch'], _FIELDS['version_guid'], _FIELDS['block_type'], _USAGE_BLOCK_ID),
+    u'asset-v1': (_FIELDS['branch'], _FIELDS['version_guid'], _FIELDS['block_type'], _FIELDS['block_id']),
+}
+_DEPRECATED_TAGS = {u'i4x://': u'block-v1', u'/c4x/': u'asset-v1'}
+
+# How much text `rewrite_file` reads at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# The longest key that `rewrite_chunks` carries over between chunks
+_MAX_CARRIED_KEY_LENGTH = OpaqueKey.MAX_KEY_LENGTH or DEFAULT_CHUNK_SIZE
+
+# The asset URLs that an AssetUrlRewriter remembers, before it starts over
+DEFAULT_MAX_CACHED_URLS = 1 << 16
+
+
+def _rest_pattern(fields, group_prefix):
+    """
+    Return the regex source matching the '+'-separated `fields` that follow the run of a
+    canonical key. Only the first two fields (branch and version) are optional.
+    """
+    parts = []
+    for index, field in enumerate(fields):
+        part = re.escape(SEPARATOR) + field.pattern(group_prefix)
+        parts.append(u'(?:{})?'.format(part) if index < 2 else part)
+    return u''.join(parts)
+
+
+def _literals(strings):
+    """
+    Return the regex source matching any of `strings`, trying longer strings first.
+    """
+    return u'|'.join(re.escape(string) for string in sorted(strings, key=len, reverse=True))
+
+
+def _is_key_char(char):
+    """
+    Return whether `char` can be part of a serialized key.
+    """
+    return char.isalnum() or char in u'_-~.:%+@/'
+
+
+class _TextRewriter(object):
+    """
+    The streaming of texts through a rewriter, which replaces the keys that its ``_regex``
+    matches with the result of its ``_replace`` method.
+    """
+    _regex = None
+
+    def _replace(self, match):
+        """
+        Return the rewritten form of the key matched by `match`.
+        """
+        raise NotImplementedError
+
+    def rewrite(self, text):
+        """
+        Return the rewritten `text`.
+        """
+        return self._regex.sub(self._replace, text)
+
+    def _rewrite_span(self, text, start, end):
+        """
+        Return the rewritten text from `start` to `end` (or to the end of a key that crosses
+        `end`), and where it stops. The text before `start` is only context for the regex.
+        """
+        parts = []
+        position = start
+        for match in self._regex.finditer(text, start):
+            if match.start() >= end:
+                break
+            parts.append(text[position:match.start()])
+            parts.append(self._replace(match))
+            position = match.end()
+        stop = max(end, position)
+        parts.append(text[position:stop])
+        return u''.join(parts), stop
+
+    def rewrite_chunks(self, chunks):
+        """
+        Yield the rewritten text of the text `chunks`, which may split keys between them.
+
+        Each chunk is rewritten up to its last character that can't be part of a key, and the
+        remainder is carried over to the next chunk. A run of key characters is carried over
+        until it's longer than twice the longest key, when all but the last ``MAX_KEY_LENGTH``
+        characters of it are rewritten, so that the carry-over (and the time spent on it)
+        stays bounded. Keys longer than ``MAX_KEY_LENGTH`` may not be rewritten where the
+        chunks split them.
+        """
+        # The text carried over, of which the first `start` characters were already rewritten,
+        # and are only kept as context
+        pending = u''
+        start = 0
+        for chunk in chunks:
+            # Only the new chunk needs searching for the last character that can't be part of a key
+            end = len(chunk)
+            while end > 0 and _is_key_char(chunk[end - 1]):
+                end -= 1
+            if end:
+                rewritten, __ = self._rewrite_span(pending + chunk[:end], start, len(pending) + end)
+                yield rewritten
+                pending = chunk[end:]
+                start = 0
+                continue
+            pending += chunk
+            if len(pending) - start > 2 * _MAX_CARRIED_KEY_LENGTH:
+                rewritten, stop = self._rewrite_span(pending, start, len(pending) - _MAX_CARRIED_KEY_LENGTH)
+                yield rewritten
+                pending = pending[stop - 1:]
+                start = 1
+        if len(pending) > start:
+            yield self._rewrite_span(pending, start, len(pending))[0]
+
+    def rewrite_file(self, source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Write the rewritten text of the text file `source` to the text file `destination`,
+        reading `chunk_size` characters at a time.
+        """
+        chunks = iter(lambda: source.read(chunk_size), u'')
+        for rewritten in self.rewrite_chunks(chunks):
+            destination.write(rewritten)
+
+
+class CourseKeyRewriter(_TextRewriter):
+    """
+    Rewrites the serialized keys in texts that belong to the source courses of `mapping`
+    into its target courses: :meth:`rewrite` returns a text with the keys of every source
+    course rewritten into its target course.
+
+    Attributes:
+        skipped (int): The number of keys of source courses left unchanged, because they
+            couldn't be rewritten in canonical form.
+
+    Args:
+        mapping: A mapping, or iterable of pairs, from source :class:`.CourseLocator` to target
+            :class:`.CourseLocator`.
+
+    Raises:
+        ValueError: if two deprecated source courses differ only by run, or a canonical
+            source course is mapped to a deprecated target course.
+    """
+    def __init__(self, mapping):
+        if hasattr(mapping, 'items'):
+            mapping = mapping.items()
+        # Map the serialized course part ('org+course+run', 'org/course/run' or 'org/course')
+        # of the keys of each source course to its target course key
+        self._canonical = {}
+        self._deprecated = {}
+        self._deprecated_runless = {}
+        # Maps each of those serialized course parts to its source course key
+        self._sources = {}
+        for source, target in mapping:
+            if not source.deprecated:
+                if target.deprecated:
+                    raise ValueError("Can't rewrite canonical keys of {} as deprecated keys".format(source))
+                self._add(self._canonical, SEPARATOR.join((source.org, source.course, source.run)), source, target)
+                continue
+            runless = u'/'.join((source.org, source.course))
+            existing = self._sources.get(runless)
+            if existing is not None and existing.run != source.run:
+                raise ValueError("Deprecated courses {} and {} can't be told apart".format(existing, source))
+            self._add(self._deprecated, u'/'.join((runless, source.run)), source, target)
+            self._add(self._deprecated_runless, runless, source, target)
+
+        # The number of keys rewritten, by serialized course part
+        self._hits = Counter()
+        self.skipped = 0
+        self._regex = self._build()
+
+    def _add(self, targets, course, source, target):
+        """
+        Map the serialized course part `course` of keys of `source` to `target` in `targets`,
+        with the serialized org, course and run of `target`.
+        """
+        targets[course] = (target, SEPARATOR.join((target.org, target.course, target.run)))
+        self._sources[course] = source
+
+    @property
+    def counts(self):
+        """
+        A Counter of the number of keys rewritten from each source course key.
+        """
+        counts = Counter()
+        for course, hits in self._hits.items():
+            counts[self._sources[course]] += hits
+        return counts
+
+    def _build(self):
+        """
+        Return the regex matching every serialized key of a source course.
+
+        Every alternative starts with a literal, which lets the regex engine skip quickly through
+        text that contains no keys, and ends with an empty group named for the kind of key it
+        matches, so that the match's ``lastgroup`` identifies it.
+        """
+        alternatives = []
+        if self._canonical:
+            courses = _literals(self._canonical)
+            for namespace, fields in sorted(_CANONICAL_RESTS.items()):
+                name = namespace[0]
+                alternatives.append(
+                    u'{namespace}:(?<![{key_chars}]{namespace}:)'
+                    u'(?P<{name}_course>{courses})(?P<{name}_rest>{rest}){not_before}(?P<{name}>)'.format(
+                        name=name, namespace=re.escape(namespace), key_chars=_KEY_CHARS, courses=courses,
+                        rest=_rest_pattern(fields, name + u'_'), not_before=_NOT_BEFORE,
+                    )
+                )
+        if self._deprecated:
+            alternatives.append(
+                u'(?:i4x://(?<![{key_chars}/]i4x://)|/c4x/(?<![{key_chars}/]/c4x/))(?P<d_course>{courses})/'
+                u'(?P<d_block_type>{chars}+)/(?P<d_block_id>{name_chars}+)(?:@(?P<d_branch>{chars}+))?'
+                u'{not_before}(?P<d>)'.format(
+                    key_chars=_KEY_CHARS, courses=_literals(self._deprecated_runless), chars=_DEPRECATED_CHARS,
+                    name_chars=_DEPRECATED_NAME_CHARS, not_before=_NOT_BEFORE_DEPRECATED,
+                )
+            )
+            # The boundary before a deprecated course key is checked by `_replace_deprecated_course`
+            alternatives.append(u'(?:{courses}){not_before}(?P<s>)'.format(
+                courses=_literals(self._deprecated), not_before=_NOT_BEFORE_DEPRECATED,
+            ))
+        # With no source courses, match nothing
+        return re.compile(u'|'.join(alternatives) or u'(?!)', re.UNICODE)
+
+    def _replace(self, match):
+        """
+        Return the rewritten form of the key matched by `match`.
+        """
+        kind = match.lastgroup
+        if kind == u'd':
+            return self._replace_deprecated_usage(match)
+        if kind == u's':
+            return self._replace_deprecated_course(match)
+        course = match.group(kind + u'_course')
+        self._hits[course] += 1
+        return u'{}{}{}'.format(
+            match.string[match.start():match.start(kind + u'_course')],
+            self._canonical[course][1],
+            match.group(kind + u'_rest'),
+        )
+
+    def _replace_deprecated_course(self, match):
+        """
+        Return the rewritten form of the deprecated course key matched by `match`.
+        """
+        start = match.start()
+        if start and _is_key_char(match.string[start - 1]):
+            return match.group(0)
+        course = match.group(0)
+        target, target_course = self._deprecated[course]
+        self._hits[course] += 1
+        if target.deprecated:
+            return u'/'.join((target.org, target.course, target.run))
+        return u'{}:{}'.format(CourseLocator.CANONICAL_NAMESPACE, target_course)
+
+    def _replace_deprecated_usage(self, match):
+        """
+        Return the rewritten form of the deprecated usage or asset key matched by `match`.
+        """
+        course = match.group(u'd_course')
+        target, target_course = self._deprecated_runless[course]
+        tag = match.string[match.start():match.start(u'd_course')]
+        if target.deprecated:
+            self._hits[course] += 1
+            # Keep the block type, block id and revision following the course
+            return u'{}{}/{}{}'.format(tag, target.org, target.course, match.string[match.end(u'd_course'):match.end()])
+
+        namespace = _DEPRECATED_TAGS[tag]
+        block_type, block_id, branch = match.group(u'd_block_type', u'd_block_id', u'd_branch')
+        if not (
+                _CANONICAL_ID_RE.match(block_type) and _CANONICAL_BLOCK_ID_RES[namespace].match(block_id) and
+                (branch is None or _CANONICAL_ID_RE.match(branch))
+        ):
+            self.skipped += 1
+            return match.group(0)
+        self._hits[course] += 1
+        return u'{}:{}{}+{}@{}+{}@{}'.format(
+            namespace, target_course,
+            u'' if branch is None else u'+{}@{}'.format(CourseLocator.BRANCH_PREFIX, branch),
+            BlockLocatorBase.BLOCK_TYPE_PREFIX, block_type, BlockLocatorBase.BLOCK_PREFIX, block_id,
+        )
+
+
+# Matches every asset URL in a document. Canonical URLs are matched with the fields of the
+# locator grammar, with or without a leading '/', and deprecated URLs with the fields of
+# ``AssetLocator.ASSET_URL_RE``, restricted to the characters that deprecated keys allow.
+# Neither may be part of a longer URL, such as one with a host.
+_ASSET_URL_RE = re.compile(
+    u'(?<![{key_chars}/])(?:'
+    u'/?{namespace}:{course}{rest}{not_before}'
+    u'|/{tag}/{chars}+/{chars}+/{chars}+/{chars}+(?:@{revision_chars}+)?{not_before_deprecated}'
+    u')'.format(
+        key_chars=_KEY_CHARS,
+        namespace=re.escape(AssetLocator.CANONICAL_NAMESPACE),
+        course=u''.join((
+            _FIELDS['org'].pattern(), re.escape(SEPARATOR), _FIELDS['course'].pattern(),
+            re.escape(SEPARATOR), _FIELDS['run'].pattern(),
+        )),
+        rest=_rest_pattern(_CANONICAL_RESTS[AssetLocator.CANONICAL_NAMESPACE], u'rest_'),
+        not_before=_NOT_BEFORE,
+        tag=re.escape(AssetLocator.DEPRECATED_TAG),
+        chars=Locator.DEPRECATED_ALLOWED_ID_CHARS,
+        revision_chars=Locator.ALLOWED_ID_CHARS,
+        not_before_deprecated=_NOT_BEFORE_DEPRECATED,
+    ),
+    re.UNICODE,
+)
+
+_CANONICAL_ASSET_URL_PREFIX = u'/{}:'.format(AssetLocator.CANONICAL_NAMESPACE)
+
+
+class AssetUrlRewriter(_TextRewriter):
+    """
+    Rewrites the URLs of the static assets in documents (such as the HTML of course content)
+    to the URLs returned by `url_for`: :meth:`rewrite` returns a document with every asset
+    URL in it rewritten.
+
+    Only the asset URL itself is replaced, so any query string or fragment following it is
+    kept. The rewritten URL of each distinct asset URL is remembered, up to `max_cached` of them.
+
+    Attributes:
+        rewritten (int): The number of asset URLs rewritten.
+        skipped (int): The number of asset URLs left unchanged, because they weren't valid
+            asset keys, or `url_for` returned None for them.
+
+    Args:
+        url_for: A function of an :class:`.AssetKey`, which returns the URL to rewrite its
+            asset URLs to, or None to leave them unchanged.
+        max_cached (int): The most asset URLs to remember the rewritten URLs of.
+    """
+    _regex = _ASSET_URL_RE
+
+    def __init__(self, url_for, max_cached=DEFAULT_MAX_CACHED_URLS):
+        self.url_for = url_for
+        self.max_cached = max_cached
+        # Maps each asset URL to its rewritten URL, or to None if it's left unchanged
+        self._urls = {}
+        self.rewritten = 0
+        self.skipped = 0
+
+    def _rewrite_url(self, url):
+        """
+        Return the rewritten form of the asset URL `url`, or None to leave it unchanged.
+        """
+        try:
+            if url.startswith(_CANONICAL_ASSET_URL_PREFIX):
+                url = url[1:]
+            asset_key = AssetKey.from_string(url)
+        except InvalidKeyError:
+            return None
+        return self.url_for(asset_key)
+
+    def _replace(self, match):
+        """
+        Return the rewritten form of the asset URL matched by `match`.
+        """
+        url = match.group(0)
+        try:
+            rewritten = self._urls[url]
+        except KeyError:
+            if len(self._urls) >= self.max_cached:
+                self._urls.clear()
+            rewritten = self._urls[url] = self._rewrite_url(url)
+        if rewritten is None:
+            self.skipped += 1
+            return url
+        self.rewritten += 1
+        return rewritten
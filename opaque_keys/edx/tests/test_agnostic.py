@@ -0,0 +1,100 @@
+"""
+Tests of version and branch agnostic hashing, equality and mappings of locators
+"""
+from unittest import TestCase
+
+import ddt
+
+from opaque_keys.edx.agnostic import AgnosticKeyDict
+from opaque_keys.edx.keys import AssetKey, CourseKey, UsageKey
+from opaque_keys.edx.tests.test_course_locators import ExtendedCourseLocator
+
+VERSION = '519665f6223ebd6980884f2b'
+OTHER_VERSION = '519665f6223ebd6980884f2c'
+
+KEYS = (
+    (CourseKey, 'course-v1:org+course+run+branch@draft+version@{}'),
+    (CourseKey, 'library-v1:org+lib+branch@draft+version@{}'),
+    (UsageKey, 'block-v1:org+course+run+branch@draft+version@{}+type@html+block@intro'),
+    (UsageKey, 'lib-block-v1:org+lib+branch@draft+version@{}+type@html+block@intro'),
+    (AssetKey, 'asset-v1:org+course+run+branch@draft+version@{}+type@asset+block@logo.png'),
+)
+
+
+@ddt.ddt
+class TestAgnosticViews(TestCase):
+    """
+    Tests of the agnostic hash and equality methods of locators
+    """
+    @ddt.data(*KEYS)
+    @ddt.unpack
+    def test_version_agnostic(self, key_type, serialized):
+        key = key_type.from_string(serialized.format(VERSION))
+        other = key_type.from_string(serialized.format(OTHER_VERSION))
+        self.assertNotEqual(key, other)
+        self.assertEqual(hash(key.version_agnostic()), key.version_agnostic_hash())
+        self.assertEqual(key.version_agnostic_hash(), other.version_agnostic_hash())
+        self.assertTrue(key.agnostic_eq(other))
+        self.assertTrue(key.agnostic_eq(key.version_agnostic()))
+        self.assertFalse(key.agnostic_eq(key.for_branch('published')))
+        self.assertFalse(key.agnostic_eq(str(key)))
+
+    @ddt.data(*KEYS)
+    @ddt.unpack
+    def test_branch_agnostic(self, key_type, serialized):
+        key = key_type.from_string(serialized.format(VERSION))
+        ignore = ('version_guid', 'branch')
+        self.assertEqual(hash(key.for_branch(None)), key.agnostic_hash(ignore))
+        self.assertTrue(key.agnostic_eq(key.for_branch('published'), ignore))
+
+    def test_subclass_key_fields(self):
+        key = ExtendedCourseLocator('org', 'course', 'run', version_guid=VERSION, ccx='1')
+        other_version = ExtendedCourseLocator('org', 'course', 'run', version_guid=OTHER_VERSION, ccx='1')
+        other_ccx = ExtendedCourseLocator('org', 'course', 'run', version_guid=OTHER_VERSION, ccx='2')
+        self.assertTrue(key.agnostic_eq(other_version))
+        self.assertFalse(key.agnostic_eq(other_ccx))
+        self.assertNotEqual(key.version_agnostic_hash(), other_ccx.version_agnostic_hash())
+        self.assertEqual(hash(key.version_agnostic()), key.version_agnostic_hash())
+
+        usage_key = key.make_usage_key('html', 'intro')
+        other_ccx_usage_key = other_ccx.make_usage_key('html', 'intro')
+        self.assertTrue(usage_key.agnostic_eq(other_version.make_usage_key('html', 'intro')))
+        self.assertFalse(usage_key.agnostic_eq(other_ccx_usage_key))
+
+
+class TestAgnosticKeyDict(TestCase):
+    """
+    Tests of :class:`.AgnosticKeyDict`
+    """
+    def setUp(self):
+        super(TestAgnosticKeyDict, self).setUp()
+        self.key = UsageKey.from_string(KEYS[2][1].format(VERSION))
+        self.other_version = UsageKey.from_string(KEYS[2][1].format(OTHER_VERSION))
+        self.other_block = self.key.replace(block_id='other')
+
+    def test_lookup(self):
+        mapping = AgnosticKeyDict({self.key: 1})
+        self.assertEqual(1, mapping[self.other_version])
+        self.assertEqual(1, mapping[self.key.version_agnostic()])
+        self.assertIn(self.other_version, mapping)
+        self.assertNotIn(self.other_block, mapping)
+        self.assertNotIn('not a key', mapping)
+        with self.assertRaises(KeyError):
+            mapping[self.other_block]  # pylint: disable=pointless-statement
+
+    def test_keeps_first_key(self):
+        mapping = AgnosticKeyDict()
+        mapping[self.key] = 1
+        mapping[self.other_version] = 2
+        self.assertEqual([(self.key, 2)], list(mapping.items()))
+        del mapping[self.other_version]
+        self.assertEqual(0, len(mapping))
+
+    def test_ignore(self):
+        mapping = AgnosticKeyDict([(self.key, 1)], ignore=('version_guid', 'branch'))
+        self.assertEqual(1, mapping[self.other_version.for_branch('published')])
+        self.assertNotIn(self.key.for_branch('published'), AgnosticKeyDict([(self.key, 1)]))
+
+    def test_non_locator(self):
+        with self.assertRaises(TypeError):
+            AgnosticKeyDict()['not a key'] = 1
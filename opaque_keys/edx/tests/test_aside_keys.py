@@ -201,6 +201,18 @@ class TestAsideKeys(TestCase):
         new_key = key.replace(**{attr: value})
         self.assertEqual(getattr(new_key, attr), value)
 
+    @ddt.data(AsideUsageKeyV1, AsideUsageKeyV2)
+    def test_map_keys_into_course(self, key_class):
+        course_key = CourseLocator('org', 'course', 'run')
+        new_course_key = CourseLocator('borg', 'horse', 'gun')
+        keys = [key_class(course_key.make_usage_key('html', 'block_id'), 'aside'),
+                key_class(new_course_key.make_usage_key('html', 'block_id'), 'aside')]
+        mapped = key_class.map_keys_into_course(keys, new_course_key)
+        self.assertEqual([key.map_into_course(new_course_key) for key in keys], mapped)
+        self.assertIsInstance(mapped[0], key_class)
+        self.assertIs(new_course_key, mapped[0].course_key)
+        self.assertIs(keys[1], mapped[1])
+
     @ddt.data(*itertools.product([
         AsideDefinitionKeyV1,
         AsideDefinitionKeyV2,
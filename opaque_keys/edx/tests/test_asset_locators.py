@@ -27,6 +27,15 @@ class TestAssetLocators(TestCase):
             text_type(AssetKey.from_string(path)),
         )
 
+    @ddt.data(
+        "/c4x/org/course/asset/path",
+        "/c4x/org/course/asset/path@revision",
+        "asset-v1:org+course+run+type@asset+block@path",
+    )
+    def test_bytes_round_trip(self, path):
+        self.assertEqual(AssetKey.from_string(path), AssetKey.from_bytes(path.encode('utf-8')))
+        self.assertEqual(path, text_type(AssetKey.from_bytes(path.encode('utf-8'))))
+
     def test_map_into_course_asset_location(self):
         original_course = CourseKey.from_string('org/course/run')
         new_course = CourseKey.from_string('edX/toy/2012_Fall')
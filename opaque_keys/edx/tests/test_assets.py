@@ -0,0 +1,119 @@
+"""
+Tests of indexing the asset keys of courses
+"""
+import warnings
+from unittest import TestCase
+
+import ddt
+
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.assets import AssetIndex
+from opaque_keys.edx.keys import AssetKey
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+from opaque_keys.edx.locator import CourseLocator
+
+COURSE = CourseLocator('edX', 'DemoX', '2014')
+OTHER_COURSE = CourseLocator('edX', 'DemoX', '2015')
+DEPRECATED_COURSE = CourseLocator('MITx', '6.002x', None, deprecated=True)
+
+
+@ddt.ddt
+class TestAssetIndex(TestCase):
+    """
+    Tests of :class:`.AssetIndex`
+    """
+    def setUp(self):
+        super(TestAssetIndex, self).setUp()
+        self.index = AssetIndex([
+            'asset-v1:edX+DemoX+2014+type@asset+block@images_b.png',
+            COURSE.make_asset_key('asset', 'logo.png'),
+            'asset-v1:edX+DemoX+2014+type@asset+block@images_a.png',
+            'asset-v1:edX+DemoX+2014+type@thumbnail+block@images_a.jpg',
+            'asset-v1:edX+DemoX+2015+type@asset+block@images_c.png',
+            '/c4x/MITx/6.002x/asset/images_d.png',
+        ])
+
+    def test_get(self):
+        self.assertEqual(COURSE.make_asset_key('asset', 'logo.png'), self.index.get(COURSE, 'asset', 'logo.png'))
+        self.assertEqual(
+            AssetKey.from_string('/c4x/MITx/6.002x/asset/images_d.png'),
+            self.index.get(DEPRECATED_COURSE, 'asset', 'images_d.png'),
+        )
+        self.assertIsNone(self.index.get(COURSE, 'thumbnail', 'logo.png'))
+        self.assertIsNone(self.index.get(OTHER_COURSE, 'asset', 'logo.png'))
+        self.assertIsNone(self.index.get(COURSE.for_branch('draft'), 'asset', 'logo.png'))
+        self.assertIsNone(self.index.get(CourseLocator('edX', 'Other', '2014'), 'asset', 'logo.png'))
+
+    @ddt.data(
+        (u'', None, [u'images_a.jpg', u'images_a.png', u'images_b.png', u'logo.png']),
+        (u'images_', None, [u'images_a.jpg', u'images_a.png', u'images_b.png']),
+        (u'images_', u'asset', [u'images_a.png', u'images_b.png']),
+        (u'images_a', u'thumbnail', [u'images_a.jpg']),
+        (u'logo.png', None, [u'logo.png']),
+        (u'logo.png.', None, []),
+        (u'z', None, []),
+    )
+    @ddt.unpack
+    def test_assets(self, prefix, asset_type, paths):
+        self.assertEqual(paths, [key.path for key in self.index.assets(COURSE, prefix, asset_type)])
+
+    def test_course_key_subclass(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            course_key = SlashSeparatedCourseKey('MITx', '6.002x', None)
+        self.assertEqual(DEPRECATED_COURSE, course_key)
+        self.assertEqual([u'images_d.png'], [key.path for key in self.index.assets(course_key)])
+        self.index.add(course_key.make_asset_key('asset', 'images_e.png'))
+        self.assertEqual(3, len(self.index.course_keys()))
+        self.assertEqual(
+            [u'images_d.png', u'images_e.png'],
+            [key.path for key in self.index.assets(DEPRECATED_COURSE)],
+        )
+
+    def test_version(self):
+        version = '519665f6223ebd6980884f2b'
+        self.index.add(COURSE.for_version(version).make_asset_key('asset', 'logo.png'))
+        self.assertEqual(4, len(self.index.course_keys()))
+        course_key = CourseLocator('edX', 'DemoX', '2014', version_guid=version)
+        self.assertIsNotNone(self.index.get(course_key, 'asset', 'logo.png'))
+
+    def test_assets_of_unknown_course(self):
+        self.assertEqual([], self.index.assets(CourseLocator('edX', 'Other', '2014')))
+
+    def test_add(self):
+        self.assertEqual(6, len(self.index))
+        self.index.add(COURSE.make_asset_key('asset', 'images_a.png'))
+        self.assertEqual(6, len(self.index))
+        self.index.add(COURSE.make_asset_key('asset', 'images_aa.png'))
+        self.assertEqual(7, len(self.index))
+        self.assertEqual(
+            [u'images_a.png', u'images_aa.png', u'images_b.png'],
+            [key.path for key in self.index.assets(COURSE, u'images_', u'asset')],
+        )
+        with self.assertRaises(InvalidKeyError):
+            self.index.add('block-v1:edX+DemoX+2014+type@html+block@intro')
+
+    def test_discard(self):
+        self.index.discard('asset-v1:edX+DemoX+2014+type@asset+block@images_a.png')
+        self.index.discard(COURSE.make_asset_key('asset', 'missing.png'))
+        self.assertEqual(5, len(self.index))
+        paths = [key.path for key in self.index.assets(COURSE, u'images_')]
+        self.assertEqual([u'images_a.jpg', u'images_b.png'], paths)
+        self.index.discard(COURSE.make_asset_key('asset', 'logo.png'))
+        self.assertEqual([u'images_a.jpg', u'images_b.png'], [key.path for key in self.index.assets(COURSE)])
+
+        self.index.discard('asset-v1:edX+DemoX+2015+type@asset+block@images_c.png')
+        self.assertNotIn(OTHER_COURSE, self.index.course_keys())
+        self.assertEqual([], self.index.assets(OTHER_COURSE))
+
+    def test_contains(self):
+        self.assertIn(COURSE.make_asset_key('asset', 'logo.png'), self.index)
+        self.assertNotIn(COURSE.make_asset_key('asset', 'missing.png'), self.index)
+        self.assertNotIn(COURSE, self.index)
+
+    def test_iter(self):
+        self.assertEqual(6, len(set(self.index)))
+        self.assertEqual(
+            set([COURSE, OTHER_COURSE, DEPRECATED_COURSE]),
+            set(self.index.course_keys()),
+        )
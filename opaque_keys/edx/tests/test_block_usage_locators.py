@@ -6,6 +6,7 @@ from six import text_type
 
 import ddt
 import itertools  # pylint: disable=wrong-import-order
+import pickle  # pylint: disable=wrong-import-order
 from bson.objectid import ObjectId
 
 from opaque_keys import InvalidKeyError
@@ -58,6 +59,73 @@ class TestBlockUsageLocators(LocatorBaseTest):
             text_type(UsageKey.from_string(url))
         )
 
+    @ddt.data(
+        "block-v1:org+course+run+{}@category+{}@name".format(BlockUsageLocator.BLOCK_TYPE_PREFIX,
+                                                             BlockUsageLocator.BLOCK_PREFIX),
+        BLOCK_URL,
+        "i4x://org/course/category/name@revision",
+        "i4x://org.dept%sub-prof/course.num%section-4/category/name:12%33-44",
+        u"block-v1:org+cours\xe9+run+{}@category+{}@name".format(BlockUsageLocator.BLOCK_TYPE_PREFIX,
+                                                                 BlockUsageLocator.BLOCK_PREFIX),
+        u"i4x://org/course/category/n\xe4me",
+    )
+    def test_bytes_roundtrip(self, url):
+        encoded = url.encode('utf-8')
+        self.assertEqual(UsageKey.from_string(url), UsageKey.from_bytes(encoded))
+        self.assertEqual(UsageKey.from_string(url), UsageKey.from_buffer(memoryview(encoded)))
+        self.assertEqual(url, text_type(UsageKey.from_bytes(encoded)))
+
+    @ddt.data(
+        "block-v1:org+course+run+type@category+block@name",
+        "block-v1:org+course+run+branch@draft+type@category+block@name",
+        "block-v1:org+course+run+version@519665f6223ebd6980884f2b+block@name",
+        "block-v1:version@519665f6223ebd6980884f2b+type@category+block@name",
+    )
+    def test_parsed_matches_constructed(self, url):
+        parsed = UsageKey.from_string(url)
+        constructed = BlockUsageLocator(parsed.course_key.replace(), parsed.block_type, parsed.block_id)
+        self.assertEqual(constructed, parsed)
+        self.assertEqual(hash(constructed), hash(parsed))
+        self.assertFalse(parsed.deprecated)
+        with self.assertRaises(AttributeError):
+            parsed.block_id = 'other'  # pylint: disable=assigning-non-slot
+        with self.assertRaises(AttributeError):
+            parsed.course_key.org = 'other'
+
+    @ddt.data(
+        "block-v1:org+course+run+type@category+block@na%me",
+        "block-v1:org+course+type@category+block@name",
+        "block-v1:org+course+run+version@519665f6+type@category+block@name",
+    )
+    def test_parsed_invalid(self, url):
+        with self.assertRaises(InvalidKeyError):
+            UsageKey.from_string(url)
+
+    def test_derived_keys_memoized(self):
+        usage_key = UsageKey.from_string(BLOCK_URL)
+        version = ObjectId(TEST_ID_LOC)
+        self.assertIs(usage_key.version_agnostic(), usage_key.version_agnostic())
+        self.assertIs(usage_key.course_agnostic(), usage_key.course_agnostic())
+        self.assertIs(usage_key.for_branch('published'), usage_key.for_branch('published'))
+        self.assertIsNot(usage_key.for_branch('published'), usage_key.for_branch(None))
+        self.assertIs(usage_key.for_version(version), usage_key.for_version(version))
+        self.assertEqual(usage_key.for_branch('published'), usage_key.for_branch(branch='published'))
+        self.assertIsNone(usage_key.version_agnostic().version_guid)
+        self.assertEqual(usage_key, pickle.loads(pickle.dumps(usage_key)))
+        with self.assertRaises(InvalidKeyError):
+            usage_key.course_agnostic().for_branch('published')
+
+    @ddt.data(
+        b"block-v1:org+course+run+type@category",
+        b"block-v1:org+course+run+type@category+block@name+",
+        b"block-v1:org+course+run+type@category+block@na\xffme",
+        b"i4x://org/course/category/na\xffme",
+        b"i4x://org/course/category",
+    )
+    def test_invalid_bytes(self, serialized):
+        with self.assertRaises(InvalidKeyError):
+            UsageKey.from_bytes(serialized)
+
     @ddt.data(
         ((), {
             'org': 'org',
@@ -152,6 +220,58 @@ class TestBlockUsageLocators(LocatorBaseTest):
         course_key = CourseLocator('org', 'course', 'run', version_guid='rev', deprecated=True)
         locator = BlockUsageLocator(course_key, block_type='cat', block_id='name:more_name', deprecated=True)
         self.assertEqual(locator.html_id(), "i4x-org-course-cat-name_more_name-rev")
+        self.assertIs(locator.html_id(), locator.html_id())
+
+    def test_clean_collapses_runs(self):
+        self.assertEqual(BlockUsageLocator.clean_for_html(u'a_:_.b__c::d'), u'a_b_c_d')
+        self.assertEqual(BlockUsageLocator.clean(u'_ a :_b_'), u'_a_b_')
+
+    @ddt.data(
+        (BlockUsageLocator.clean, BlockUsageLocator.clean_all),
+        (BlockUsageLocator.clean_keeping_underscores, BlockUsageLocator.clean_all_keeping_underscores),
+        (BlockUsageLocator.clean_for_url_name, BlockUsageLocator.clean_all_for_url_name),
+        (BlockUsageLocator.clean_for_html, BlockUsageLocator.clean_all_for_html),
+    )
+    @ddt.unpack
+    def test_clean_all(self, clean, clean_all):
+        values = [pair[0] for pair in GENERAL_PAIRS] + [
+            u'a:b', u'a.b', u'a__b', u'a_', u'_b', u'a b', u'a\nb', u'\n', u'a b',
+        ]
+        expected = [clean(value) for value in values]
+        self.assertEqual(clean_all(values), expected)
+        # Values cleaned before are remembered
+        self.assertEqual(clean_all(iter(values)), expected)
+        self.assertEqual(clean_all(values), expected)
+        self.assertEqual(clean_all([]), [])
+
+    def test_html_ids(self):
+        course_key = CourseLocator('org', 'course', 'run')
+        deprecated_course_key = CourseLocator('org', 'course', 'run', deprecated=True)
+        keys = [
+            BlockUsageLocator(course_key, 'cat', 'name:more_name'),
+            BlockUsageLocator(deprecated_course_key, 'cat', 'name:more_name', deprecated=True),
+            BlockUsageLocator(deprecated_course_key, 'cat', 'other.name', deprecated=True),
+            BlockUsageLocator(
+                CourseLocator('org', 'course', 'run', version_guid='rev', deprecated=True), 'cat', 'x', deprecated=True
+            ),
+        ]
+        expected = [
+            u'name:more_name',
+            u'i4x-org-course-cat-name_more_name',
+            u'i4x-org-course-cat-other_name',
+            u'i4x-org-course-cat-x-rev',
+        ]
+        self.assertEqual(BlockUsageLocator.html_ids(keys), expected)
+        self.assertEqual([key.html_id() for key in keys], expected)
+
+    def test_html_ids_of_generator(self):
+        # Keys freed while the generator runs must not share the html id prefixes of earlier courses
+        html_ids = BlockUsageLocator.html_ids(
+            UsageKey.from_string('i4x://org{0}/course{0}/html/n{0}'.format(index)) for index in range(2000)
+        )
+        expected = [u'i4x-org{0}-course{0}-html-n{0}'.format(index) for index in range(2000)]
+        self.assertEqual([], [pair for pair in zip(expected, html_ids) if pair[0] != pair[1]])
+        self.assertEqual(2000, len(html_ids))
 
     @ddt.data(
         'course',
@@ -195,6 +315,30 @@ class TestBlockUsageLocators(LocatorBaseTest):
 
         self.assertEqual(expected, actual)
 
+    @ddt.data(*product((True, False), repeat=2))
+    @ddt.unpack
+    def test_map_keys_into_course(self, deprecated_source, deprecated_dest):
+        original_course = CourseLocator('org', 'course', 'run', deprecated=deprecated_source)
+        new_course = CourseLocator('edX', 'toy', '2012_Fall', deprecated=deprecated_dest)
+        keys = [
+            original_course.make_usage_key('cat', 'name:more_name'),
+            original_course.make_asset_key('asset', 'foo.bar'),
+            new_course.make_usage_key('cat', 'name'),
+        ]
+        mapped = UsageKey.map_keys_into_course(iter(keys), new_course)
+        self.assertEqual([key.map_into_course(new_course) for key in keys], mapped)
+        self.assertEqual([type(key) for key in keys], [type(key) for key in mapped])
+        for key in mapped:
+            self.assertIs(new_course, key.course_key)
+            self.assertEqual(deprecated_dest, key.deprecated)
+        self.assertIs(keys[2], mapped[2])
+
+    def test_map_keys_into_course_invalid(self):
+        original_course = CourseLocator('org', 'course', 'run', deprecated=True)
+        keys = [original_course.make_usage_key('cat', 'name%20more')]
+        with self.assertRaises(InvalidKeyError):
+            UsageKey.map_keys_into_course(keys, CourseLocator('edX', 'toy', '2012_Fall'))
+
     @ddt.data(
         (BlockUsageLocator, '_id.', 'i4x', (CourseLocator('org', 'course', 'run', 'rev', deprecated=True), 'ct', 'n')),
         (BlockUsageLocator, '', 'i4x', (CourseLocator('org', 'course', 'run', 'rev', deprecated=True), 'ct', 'n')),
@@ -213,6 +357,32 @@ class TestBlockUsageLocators(LocatorBaseTest):
         self.assertEqual(son[prefix + 'name'], source_key.block_id)
         self.assertEqual(son[prefix + 'revision'], source_key.course_key.branch)
 
+    @ddt.data('', '_id.')
+    def test_deprecated_son_queries(self, prefix):
+        course_key = CourseLocator('org', 'course', 'run', deprecated=True)
+        keys = [
+            BlockUsageLocator(course_key, 'html', 'a', deprecated=True),
+            BlockUsageLocator(course_key, 'problem', 'b', deprecated=True),
+            BlockUsageLocator(course_key, 'html', 'c', deprecated=True),
+            BlockUsageLocator(course_key, 'html', 'a', deprecated=True),
+            BlockUsageLocator(course_key.for_branch('draft'), 'html', 'd', deprecated=True),
+            BlockUsageLocator(course_key, 'html', 'e', deprecated=True),
+        ]
+        queries = BlockUsageLocator.deprecated_son_queries(keys, prefix=prefix, chunk_size=2)
+        html_query = keys[0].to_deprecated_son(prefix=prefix)
+        html_query[prefix + 'name'] = {'$in': ['a', 'c']}
+        self.assertEqual(queries, [
+            html_query,
+            keys[5].to_deprecated_son(prefix=prefix),
+            keys[1].to_deprecated_son(prefix=prefix),
+            keys[4].to_deprecated_son(prefix=prefix),
+        ])
+        self.assertEqual(
+            [keys[1].to_deprecated_son(prefix=prefix, tag='c4x')],
+            BlockUsageLocator.deprecated_son_queries(keys[1:2], prefix=prefix, tag='c4x'),
+        )
+        self.assertEqual([], BlockUsageLocator.deprecated_son_queries([]))
+
     @ddt.data(
         (UsageKey.from_string('i4x://org/course/ct/n'), 'run'),
         (UsageKey.from_string('i4x://org/course/ct/n@rev'), 'run'),
@@ -224,6 +394,29 @@ class TestBlockUsageLocators(LocatorBaseTest):
             key.__class__._from_deprecated_son(key.to_deprecated_son(), run)  # pylint: disable=protected-access
         )
 
+    def test_from_deprecated_sons(self):
+        keys = [
+            UsageKey.from_string('i4x://org/course/html/a'),
+            UsageKey.from_string('i4x://org/course/problem/b@draft'),
+            UsageKey.from_string('i4x://org/course/html/a'),
+            UsageKey.from_string('i4x://org/other/html/c%20d'),
+        ]
+        decoded = list(BlockUsageLocator.from_deprecated_sons((key.to_deprecated_son() for key in keys), 'run'))
+        self.assertEqual(decoded, [
+            BlockUsageLocator._from_deprecated_son(key.to_deprecated_son(), 'run')  # pylint: disable=protected-access
+            for key in keys
+        ])
+        self.assertTrue(all(key.deprecated for key in decoded))
+        self.assertIs(decoded[0].course_key, decoded[2].course_key)
+        self.assertIsNot(decoded[0].course_key, decoded[1].course_key)
+
+    def test_from_deprecated_sons_invalid(self):
+        son = UsageKey.from_string('i4x://org/course/html/a').to_deprecated_son()
+        son['name'] = 'a b'
+        decoded = BlockUsageLocator.from_deprecated_sons([son], 'run')
+        with self.assertRaises(InvalidKeyError):
+            next(decoded)
+
     def test_block_constructor(self):
         expected_org = 'mit.eecs'
         expected_course = '6002x'
@@ -0,0 +1,62 @@
+"""
+Tests of opaque_keys.edx.cache
+"""
+import re
+from unittest import TestCase
+
+import ddt
+
+from opaque_keys.edx.cache import CachedPattern, pattern_cache_info
+from opaque_keys.edx.locator import BlockLocatorBase, CourseLocator
+
+
+@ddt.ddt
+class TestCachedPattern(TestCase):
+    """
+    Tests of :class:`.CachedPattern`
+    """
+    def setUp(self):
+        super(TestCachedPattern, self).setUp()
+        self.regex = re.compile(r'^[a-z]+\Z')
+        self.pattern = CachedPattern(self.regex, name='test', maxsize=3)
+
+    @ddt.data('abc', 'ABC', '', 'a b')
+    def test_matches_regex(self, string):
+        for _ in range(2):
+            self.assertEqual(bool(self.regex.match(string)), bool(self.pattern.match(string)))
+            self.assertEqual(bool(self.regex.search(string)), bool(self.pattern.search(string)))
+
+    def test_cached(self):
+        self.assertIs(self.pattern.match('abc'), self.pattern.match('abc'))
+        self.assertEqual(1, self.pattern.cache_info().misses)
+
+    def test_bounded(self):
+        for string in ('a', 'b', 'c', 'd'):
+            self.pattern.match(string)
+        self.assertEqual(1, self.pattern.cache_info().currsize)
+        self.pattern.cache_clear()
+        self.assertEqual(0, self.pattern.cache_info().currsize)
+
+    def test_stats(self):
+        self.assertIsNone(self.pattern.cache_info().hits)
+        self.pattern.track_stats()
+        self.addCleanup(self.pattern.track_stats, False)
+        for string in ('a', 'a', 'a', 'b'):
+            self.pattern.match(string)
+        self.pattern.search('a')
+        self.assertEqual((2, 3, 3, 3), self.pattern.cache_info())
+        self.assertEqual(self.pattern.cache_info(), pattern_cache_info()['test'])
+
+    def test_regex_attributes(self):
+        self.assertEqual(self.regex.pattern, self.pattern.pattern)
+        self.assertEqual('x', self.pattern.sub('x', 'abc'))
+
+    @ddt.data(None, 10, ['abc'])
+    def test_invalid_argument(self, value):
+        with self.assertRaises(TypeError):
+            self.pattern.match(value)
+
+    def test_locator_patterns(self):
+        self.assertIsInstance(BlockLocatorBase.ALLOWED_ID_RE, CachedPattern)
+        CourseLocator('org', 'course', 'run')
+        self.assertIn('org', BlockLocatorBase.ALLOWED_ID_RE._match_cache)  # pylint: disable=protected-access
@@ -0,0 +1,67 @@
+"""
+Tests of filling in the runs of deprecated keys
+"""
+import io
+from unittest import TestCase
+
+from opaque_keys.edx.catalog import RunCatalog
+from opaque_keys.edx.keys import AssetKey, CourseKey, UsageKey
+
+
+class TestRunCatalog(TestCase):
+    """
+    Tests of :class:`.RunCatalog`
+    """
+    def setUp(self):
+        super(TestRunCatalog, self).setUp()
+        self.catalog = RunCatalog([
+            'org/course/run',
+            CourseKey.from_string('course-v1:org+other+2015'),
+            'org/dup/a',
+            'org/dup/b',
+            'library-v1:org+lib',
+        ])
+
+    def test_runs(self):
+        self.assertEqual('run', self.catalog.run('org', 'course'))
+        self.assertEqual('2015', self.catalog.run('org', 'other'))
+        self.assertIsNone(self.catalog.run('org', 'dup'))
+        self.assertIsNone(self.catalog.run('org', 'missing'))
+        self.assertEqual({('org', 'dup')}, self.catalog.ambiguous)
+
+    def test_from_file(self):
+        catalog = RunCatalog.from_file(io.StringIO(u'org/course/run\n\ncourse-v1:org+other+2015\n'))
+        self.assertEqual('run', catalog.run('org', 'course'))
+        self.assertEqual('2015', catalog.run('org', 'other'))
+
+    def test_upgrade_keys(self):
+        keys = [
+            UsageKey.from_string('i4x://org/course/html/a'),
+            AssetKey.from_string('/c4x/org/course/asset/a.png'),
+            UsageKey.from_string('i4x://org/course/html/b@draft'),
+            UsageKey.from_string('i4x://org/course/html/c'),
+            UsageKey.from_string('aside-usage-v1:i4x://org/course/html/a::aside'),
+            CourseKey.from_string('org/course/run'),
+            UsageKey.from_string('block-v1:org+course+run+type@html+block@a'),
+        ]
+        upgraded = self.catalog.upgrade_keys(iter(keys))
+        self.assertEqual(upgraded[:4], [key.replace(course_key=key.course_key.replace(run='run')) for key in keys[:4]])
+        self.assertEqual(upgraded[4], keys[4].map_into_course(upgraded[0].course_key))
+        self.assertEqual(upgraded[5:], keys[5:])
+        self.assertTrue(all(key.deprecated for key in upgraded[:4]))
+        self.assertIs(upgraded[0].course_key, upgraded[3].course_key)
+        self.assertIs(upgraded[0].course_key, self.catalog.upgrade_key(keys[0]).course_key)
+        self.assertEqual('draft', upgraded[2].course_key.branch)
+        self.assertFalse(self.catalog.unresolved)
+
+    def test_unresolved(self):
+        keys = [
+            UsageKey.from_string('i4x://org/dup/html/a'),
+            UsageKey.from_string('i4x://org/missing/html/a'),
+            UsageKey.from_string('i4x://org/dup/html/b'),
+        ]
+        self.assertEqual(keys, self.catalog.upgrade_keys(keys))
+        self.assertEqual({('org', 'dup'): 2, ('org', 'missing'): 1}, self.catalog.unresolved)
+
+        self.catalog.update(['org/missing/run'])
+        self.assertEqual('run', self.catalog.upgrade_key(keys[1]).course_key.run)
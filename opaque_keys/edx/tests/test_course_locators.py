@@ -1,6 +1,8 @@
 """
 Tests of CourseKeys and CourseLocators
 """
+import pickle
+
 from six import text_type
 
 import ddt
@@ -11,11 +13,19 @@ from bson.objectid import ObjectId
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
-from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
+from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator, LocalId
 
 from opaque_keys.edx.tests import LocatorBaseTest, TestDeprecated
 
 
+class ExtendedCourseLocator(CourseLocator):
+    """
+    A course locator with an extra key field, like the CCXLocator of edx-ccx-keys
+    """
+    CANONICAL_NAMESPACE = 'extended-v1'
+    KEY_FIELDS = CourseLocator.KEY_FIELDS + ('ccx',)
+
+
 @ddt.ddt
 class TestCourseKeys(LocatorBaseTest, TestDeprecated):
     """
@@ -167,6 +177,83 @@ class TestCourseKeys(LocatorBaseTest, TestDeprecated):
         with self.assertRaises(InvalidKeyError):
             CourseKey.from_string(url_with_whitespace_fmt.format(whitespace))
 
+    def test_lazy_version_guid(self):
+        version = '519665f6223ebd6980884f2b'
+        parsed = CourseKey.from_string('course-v1:org+course+run+branch@draft+version@' + version)
+        constructed = CourseLocator('org', 'course', 'run', branch='draft', version_guid=ObjectId(version))
+        self.assertEqual(constructed, parsed)
+        self.assertEqual(hash(constructed), hash(parsed))
+        self.assertFalse(parsed < constructed or constructed < parsed)
+        self.assertIsInstance(parsed.version_guid, ObjectId)
+        self.assertEqual(ObjectId(version), parsed.version_guid)
+        self.assertEqual(constructed, pickle.loads(pickle.dumps(parsed)))
+        self.assertEqual(repr(constructed), repr(parsed))
+
+    def test_serialization_memoized(self):
+        course_key = CourseLocator('org', 'course', 'run')
+        serialized = text_type(course_key)
+        # pylint: disable=protected-access
+        self.assertIs(course_key._to_string(), course_key._to_string())
+        self.assertEqual(course_key, pickle.loads(pickle.dumps(course_key)))
+        self.assertEqual(serialized + '+branch@draft', text_type(course_key.for_branch('draft')))
+        self.assertEqual(
+            course_key._to_string() + '+type@html+block@intro',
+            course_key.make_usage_key('html', 'intro')._to_string(),
+        )
+        with self.assertRaises(AttributeError):
+            course_key.org = 'other'
+
+    def test_derived_keys_memoized(self):
+        key = CourseLocator('org', 'course', 'run', version_guid=ObjectId('519665f6223ebd6980884f2b'))
+        version = ObjectId()
+        self.assertIs(key.version_agnostic(), key.version_agnostic())
+        self.assertIs(key.course_agnostic(), key.course_agnostic())
+        self.assertIs(key.for_branch('draft'), key.for_branch('draft'))
+        self.assertIs(key.for_version(version), key.for_version(version))
+        self.assertEqual(version, key.for_version(version).version_guid)
+        self.assertEqual(key, pickle.loads(pickle.dumps(key)))
+
+    @ddt.data(False, True)
+    def test_make_usage_keys(self, deprecated):
+        course_key = CourseLocator('org', 'course', 'run', deprecated=deprecated)
+        pairs = [('html', 'intro'), ('problem', 'quiz:1'), ('html', LocalId())]
+        usage_keys = course_key.make_usage_keys(iter(pairs))
+        self.assertEqual([course_key.make_usage_key(*pair) for pair in pairs], usage_keys)
+        for usage_key in usage_keys:
+            self.assertIsInstance(usage_key, BlockUsageLocator)
+            self.assertIs(course_key, usage_key.course_key)
+            self.assertEqual(deprecated, usage_key.deprecated)
+
+    @ddt.data(
+        [('html', 'intro'), ('html', 'in tro')],
+        [('html', 'intro\nquiz')],
+        [('html', '')],
+    )
+    def test_make_usage_keys_invalid(self, pairs):
+        with self.assertRaises(InvalidKeyError):
+            CourseLocator('org', 'course', 'run').make_usage_keys(pairs)
+
+    @ddt.data(
+        'course-v1:mit.eecs+6002x+2014_T2',
+        'course-v1:mit.eecs+6002x+2014_T2+branch@published+version@519665f6223ebd6980884f2b',
+        'course-v1:version@519665f6223ebd6980884f2b',
+        'library-v1:TestX+lib1',
+        'foo/bar/baz',
+    )
+    def test_course_from_bytes(self, course_id):
+        self.assertEqual(CourseKey.from_string(course_id), CourseKey.from_bytes(course_id.encode('ascii')))
+
+    @ddt.data(
+        b'course-v1:',
+        b'course-v1:mit+course+run+',
+        b'course-v1:mit+course+run\n',
+        b'course-v1:mit+course+run+version@519665F6223EBD6980884F2B',
+        b'foo!/bar/baz',
+    )
+    def test_course_from_bad_bytes(self, bad_url):
+        with self.assertRaises(InvalidKeyError):
+            CourseKey.from_bytes(bad_url)
+
     def test_course_constructor_url(self):
         # Test parsing a url when it starts with a version ID and there is also a block ID.
         # This hits the parsers parse_guid method.
@@ -279,3 +366,12 @@ class TestCourseKeys(LocatorBaseTest, TestDeprecated):
             'org/course/',
             text_type(CourseLocator('org', 'course', '', deprecated=True))
         )
+
+    def test_subclass_key_fields(self):
+        first = ExtendedCourseLocator('org', 'course', 'run', ccx='1')
+        second = ExtendedCourseLocator('org', 'course', 'run', ccx='2')
+        self.assertNotEqual(first, second)
+        self.assertEqual(2, len({first, second}))
+        self.assertEqual(first, ExtendedCourseLocator('org', 'course', 'run', ccx='1'))
+        version = ExtendedCourseLocator('org', 'course', 'run', version_guid=ObjectId(), ccx='1')
+        self.assertNotEqual(first, version)
@@ -3,12 +3,14 @@ Tests of deprecated Locations and SlashSeparatedCourseKeys
 """
 import re
 
+from six import text_type
+
 from opaque_keys import InvalidKeyError
 
 from opaque_keys.edx.locator import AssetLocator, BlockUsageLocator, CourseLocator
 from opaque_keys.edx.locations import AssetLocation, Location, SlashSeparatedCourseKey
 from opaque_keys.edx.tests import TestDeprecated
-from opaque_keys.edx.keys import CourseKey, UsageKey
+from opaque_keys.edx.keys import AssetKey, CourseKey, UsageKey
 
 # Allow protected method access throughout this test file
 # pylint: disable=protected-access
@@ -99,6 +101,18 @@ class TestV0Strings(TestDeprecated):
         self.assertEqual(parsed_key.block_type, 'chapter')
         self.assertEqual(parsed_key.block_id, '4420ef6679b34ee8ba0cfd6d514b1b38')
 
+    def test_parse_asset_location(self):
+        """
+        Test that we can parse asset-location:org+course+run+type+path
+        """
+        parsed_key = AssetKey.from_string('asset-location:GradingUniv+GT101+2014+asset+logo%20small.png')
+        self.assertEqual(parsed_key.org, 'GradingUniv')
+        self.assertEqual(parsed_key.course, 'GT101')
+        self.assertEqual(parsed_key.run, '2014')
+        self.assertEqual(parsed_key.asset_type, 'asset')
+        self.assertEqual(parsed_key.path, 'logo%20small.png')
+        self.assertEqual('asset-location:GradingUniv+GT101+2014+asset+logo%20small.png', text_type(parsed_key))
+
 
 class TestLocation(TestLocationDeprecatedBase):
     """Tests that Location raises a deprecation warning and returns a BlockUsageLocator"""
@@ -120,6 +134,14 @@ class TestLocation(TestLocationDeprecatedBase):
             self.assertEqual('a._:%-', Location.clean_for_url_name('a.*:%-'))
             self.assertEqual('a_-', Location.clean_for_html('a.*:%-'))
 
+    def test_clean_all(self):
+        values = ['a.*:%-', 'a b']
+        with self.assertDeprecationWarning(count=4):
+            self.assertEqual(['a._%-', 'a_b'], Location.clean_all(values))
+            self.assertEqual(['a.__%-', 'a_b'], Location.clean_all_keeping_underscores(values))
+            self.assertEqual(['a._:%-', 'a_b'], Location.clean_all_for_url_name(values))
+            self.assertEqual(['a_-', 'a_b'], Location.clean_all_for_html(values))
+
     def test_deprecated_replace(self):
         self.check_deprecated_replace(Location)
 
@@ -0,0 +1,127 @@
+"""
+Tests of reporting the use of deprecated APIs
+"""
+import io
+import warnings
+from unittest import TestCase
+
+from opaque_keys.edx.deprecation import (
+    DeprecationCounter, deprecation_warning, get_deprecation_handler, ignore, set_deprecation_handler,
+    warn
+)
+from opaque_keys.edx.locations import Location, SlashSeparatedCourseKey
+from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
+
+
+def _deprecated():
+    """A deprecated function"""
+    deprecation_warning("_deprecated is deprecated!")
+
+
+class TestDeprecationWarning(TestCase):
+    """
+    Tests of the default deprecation handler
+    """
+    def test_warns_at_caller(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            _deprecated()
+        self.assertEqual(1, len(caught))
+        self.assertIs(DeprecationWarning, caught[0].category)
+        self.assertEqual("_deprecated is deprecated!", str(caught[0].message))
+        self.assertEqual(__file__.rstrip('c'), caught[0].filename.rstrip('c'))
+
+    def test_key_warns_at_caller(self):
+        key = BlockUsageLocator(CourseLocator('org', 'course', 'run'), 'html', 'name')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual('name', key.name)
+        self.assertEqual(__file__.rstrip('c'), caught[0].filename.rstrip('c'))
+
+    def test_set_handler(self):
+        self.assertIs(warn, get_deprecation_handler())
+        calls = []
+        previous = set_deprecation_handler(lambda message, stacklevel: calls.append((message, stacklevel)))
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                _deprecated()
+        finally:
+            self.assertIs(warn, previous)
+            set_deprecation_handler(None)
+        self.assertEqual([], caught)
+        self.assertEqual([("_deprecated is deprecated!", 2)], calls)
+        self.assertIs(warn, get_deprecation_handler())
+
+    def test_ignore(self):
+        set_deprecation_handler(ignore)
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                _deprecated()
+        finally:
+            set_deprecation_handler(None)
+        self.assertEqual([], caught)
+
+
+class TestDeprecationCounter(TestCase):
+    """
+    Tests of :class:`.DeprecationCounter`
+    """
+    def setUp(self):
+        super(TestDeprecationCounter, self).setUp()
+        self.counter = DeprecationCounter(sample_every=3, max_stacks=2)
+
+    def test_counts_call_sites(self):
+        key = BlockUsageLocator(CourseLocator('org', 'course', 'run'), 'html', 'name')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with self.counter.installed():
+                for __ in range(10):
+                    key.name  # pylint: disable=pointless-statement
+                key.category  # pylint: disable=pointless-statement
+        self.assertEqual([], caught)
+        self.assertIs(warn, get_deprecation_handler())
+
+        report = self.counter.report()
+        self.assertEqual([10, 1], [count for __, count, __ in report])
+        site, __, stacks = report[0]
+        self.assertEqual(__file__.rstrip('c'), site.filename.rstrip('c'))
+        self.assertEqual('test_counts_call_sites', site.function)
+        self.assertIn('block_id', site.message)
+        # The 1st, 4th, 7th and 10th uses are sampled, but only 2 stacks are kept
+        self.assertEqual(2, len(stacks))
+        self.assertEqual('test_counts_call_sites', stacks[0][-1][2])
+
+    def test_deprecated_classes(self):
+        with self.counter.installed():
+            SlashSeparatedCourseKey('org', 'course', 'run')
+            Location('org', 'course', 'run', 'html', 'name')
+        functions = set(site.function for site in self.counter.counts)
+        self.assertEqual({'test_deprecated_classes'}, functions)
+        self.assertEqual(2, len(self.counter.counts))
+
+    def test_dump(self):
+        with self.counter.installed():
+            for __ in range(2):
+                _deprecated()
+        output = io.StringIO()
+        self.counter.dump(output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(u'2 uses of deprecated APIs at 1 call sites', lines[0])
+        self.assertIn(u'test_dump: _deprecated is deprecated!', lines[1])
+        self.assertIn(u'_deprecated()', output.getvalue())
+
+        output = io.StringIO()
+        self.counter.dump(output, stacks=False)
+        self.assertEqual(2, len(output.getvalue().splitlines()))
+
+    def test_reset(self):
+        with self.counter.installed():
+            _deprecated()
+        self.counter.reset()
+        self.assertEqual([], self.counter.report())
+
+    def test_sample_every(self):
+        with self.assertRaises(ValueError):
+            DeprecationCounter(sample_every=0)
@@ -0,0 +1,74 @@
+"""
+Tests of opaque_keys.edx.grammar
+"""
+import itertools
+import re
+from unittest import TestCase
+
+import ddt
+
+from opaque_keys.edx.grammar import Field, FieldGroup, KeyGrammar
+from opaque_keys.edx.locator import BlockLocatorBase
+
+# The hand-written regex that BlockLocatorBase.GRAMMAR replaced
+LEGACY_URL_RE = re.compile(r"""^
+    ((?P<org>[\w\-~.:]+)\+(?P<course>[\w\-~.:]+)(\+(?P<run>[\w\-~.:]+))?(\+(?=.)|\Z))??
+    (branch@(?P<branch>[\w\-~.:]+)(\+(?=.)|\Z))?
+    (version@(?P<version_guid>[a-f0-9]+)(\+(?=.)|\Z))?
+    (type@(?P<block_type>[\w\-~.:]+)(\+(?=.)|\Z))?
+    (block@(?P<block_id>[\w\-~.:%]+))?
+\Z""", re.VERBOSE | re.UNICODE)
+
+TOKENS = ('org', 'c:1', '', 'branch@draft', 'version@519665f6223ebd6980884f2b', 'version@XYZ',
+          'type@problem', 'block@a%b', 'block@', 'x@y', '\n')
+
+
+@ddt.ddt
+class TestKeyGrammar(TestCase):
+    """
+    Tests of :class:`.KeyGrammar`
+    """
+    def test_matches_legacy_regex(self):
+        for count in range(5):
+            for tokens in itertools.product(TOKENS, repeat=count):
+                serialized = u'+'.join(tokens)
+                legacy = LEGACY_URL_RE.match(serialized)
+                expected = legacy.groupdict() if legacy else None
+                self.assertEqual(expected, BlockLocatorBase.GRAMMAR.parse(serialized), serialized)
+
+    @ddt.data(
+        ({}, u''),
+        ({'org': 'o', 'course': 'c', 'run': 'r'}, u'o+c+r'),
+        ({'org': 'o', 'course': 'c', 'run': None, 'branch': 'b'}, u'o+c+branch@b'),
+        ({'version_guid': 'abc', 'block_type': 't', 'block_id': 'i'}, u'version@abc+type@t+block@i'),
+    )
+    @ddt.unpack
+    def test_serialize_round_trip(self, fields, serialized):
+        self.assertEqual(serialized, BlockLocatorBase.GRAMMAR.serialize(**fields))
+        parsed = BlockLocatorBase.GRAMMAR.parse(serialized)
+        self.assertEqual({name: value for name, value in fields.items() if value is not None},
+                         {name: value for name, value in parsed.items() if value is not None})
+
+    def test_template(self):
+        self.assertEqual(u'type@{block_type}+block@{block_id}',
+                         BlockLocatorBase.GRAMMAR.template('block_type', 'block_id'))
+        with self.assertRaises(ValueError):
+            BlockLocatorBase.GRAMMAR.template('block_id', 'block_type')
+
+    def test_bytes_regex(self):
+        match = BlockLocatorBase.GRAMMAR.bytes_regex.match(b'org+course+run+type@t+block@i')
+        self.assertEqual(b'run', match.group('run'))
+        self.assertIsNone(BlockLocatorBase.GRAMMAR.bytes_regex.match(u'org+c\xe9+run'.encode('utf-8')))
+
+    @ddt.data('+', '@')
+    def test_separator_in_field(self, char):
+        with self.assertRaises(ValueError):
+            Field('name', u'[\\w{}]'.format(re.escape(char)))
+
+    def test_invalid_grammars(self):
+        with self.assertRaises(ValueError):
+            FieldGroup(Field('a', r'\w', optional=True), Field('b', r'\w'))
+        with self.assertRaises(ValueError):
+            FieldGroup(Field('a', r'\w', prefix='a'))
+        with self.assertRaises(ValueError):
+            KeyGrammar(Field('a', r'\w'), Field('a', r'\w', prefix='a'))
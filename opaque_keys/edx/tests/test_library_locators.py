@@ -237,3 +237,23 @@ class TestLibraryLocators(LocatorBaseTest, TestDeprecated):
         self.assertEqual(lib_key2, lib_key3)
         self.assertEqual(lib_key3.org, None)
         self.assertEqual(lib_key3.library, None)
+
+    def test_make_usage_keys(self):
+        lib_key = LibraryLocator(org='TestX', library='lib1')
+        pairs = [('html', 'intro'), ('problem', 'quiz:1'), ('html', 'intro')]
+        usage_keys = lib_key.make_usage_keys(iter(pairs))
+        self.assertEqual([lib_key.make_usage_key(*pair) for pair in pairs], usage_keys)
+        for usage_key in usage_keys:
+            self.assertIsInstance(usage_key, LibraryUsageLocator)
+            self.assertIs(lib_key, usage_key.library_key)
+        self.assertEqual([], lib_key.make_usage_keys([]))
+
+    @ddt.data(
+        [('html', 'intro'), ('html', 'in tro')],
+        [('html', 'intro'), ('ht ml', 'intro')],
+        [('html', 'intro\nquiz')],
+    )
+    def test_make_usage_keys_invalid(self, pairs):
+        lib_key = LibraryLocator(org='TestX', library='lib1')
+        with self.assertRaises(InvalidKeyError):
+            lib_key.make_usage_keys(pairs)
@@ -34,6 +34,13 @@ class TestLibraryUsageLocators(LocatorBaseTest):
             text_type(UsageKey.from_string(url))
         )
 
+    @ddt.data(
+        u"lib-block-v1:org+lib+{}@category+{}@name".format(BLOCK_TYPE_PREFIX, BLOCK_PREFIX),
+        u"lib-block-v1:ΩmegaX+Ωμέγα+{}@html+{}@html15".format(BLOCK_TYPE_PREFIX, BLOCK_PREFIX),
+    )
+    def test_bytes_roundtrip(self, url):
+        self.assertEqual(UsageKey.from_string(url), UsageKey.from_bytes(url.encode('utf-8')))
+
     @ddt.data(
         ("TestX", "lib3", "html", "html17"),
         (u"ΩmegaX", u"Ωμέγα", u"html", u"html15"),
@@ -73,6 +80,9 @@ class TestLibraryUsageLocators(LocatorBaseTest):
 
     @ddt.data(
         "lib-block-v1:org+lib+{}@category".format(BLOCK_TYPE_PREFIX),
+        "lib-block-v1:org+lib+{}@name".format(BLOCK_PREFIX),
+        "lib-block-v1:org+lib+{}@category+{}@na%me".format(BLOCK_TYPE_PREFIX, BLOCK_PREFIX),
+        "lib-block-v1:{}@category+{}@name".format(BLOCK_TYPE_PREFIX, BLOCK_PREFIX),
     )
     def test_constructor_invalid_from_string(self, url):
         with self.assertRaises(InvalidKeyError):
@@ -165,3 +175,9 @@ class TestLibraryUsageLocators(LocatorBaseTest):
 
         with self.assertRaises(NotImplementedError):
             usage.to_deprecated_son()
+
+        with self.assertRaises(NotImplementedError):
+            LibraryUsageLocator.deprecated_son_queries([usage])
+
+        with self.assertRaises(NotImplementedError):
+            LibraryUsageLocator.from_deprecated_sons([], "")
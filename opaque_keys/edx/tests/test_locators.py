@@ -8,6 +8,7 @@ import random
 from six import text_type
 from bson.objectid import ObjectId
 
+from opaque_keys import InvalidKeyError
 from opaque_keys.edx.locator import Locator, CourseLocator, DefinitionLocator, VersionTree
 from opaque_keys.edx.keys import DefinitionKey
 
@@ -20,6 +21,27 @@ class LocatorTests(TestCase):
     def test_cant_instantiate_abstract_class(self):
         self.assertRaises(TypeError, Locator)
 
+    def test_is_valid_object_id(self):
+        object_id = ObjectId()
+        for value in (object_id, object_id.binary, str(object_id), str(object_id).upper()):
+            self.assertTrue(Locator.is_valid_object_id(value))
+        for value in (None, '', 'z' * 24, str(object_id) + '\n', str(object_id)[:-1], object_id.binary + b'x', 10):
+            self.assertFalse(Locator.is_valid_object_id(value))
+
+    def test_as_object_ids(self):
+        object_ids = [ObjectId() for _ in range(3)]
+        self.assertEqual(object_ids, Locator.as_object_ids(str(object_id) for object_id in object_ids))
+        self.assertEqual(
+            object_ids,
+            Locator.as_object_ids([object_ids[0], object_ids[1].binary, str(object_ids[2]).upper()])
+        )
+        self.assertEqual([], Locator.as_object_ids([]))
+
+        hex_ids = [str(object_id) for object_id in object_ids]
+        for invalid in ('z' * 24, '', None, '\n'.join(hex_ids[:2])):
+            with self.assertRaises(InvalidKeyError):
+                Locator.as_object_ids(hex_ids + [invalid])
+
 
 class DefinitionLocatorTests(TestCase):
     """
@@ -33,6 +55,20 @@ class DefinitionLocatorTests(TestCase):
                          text_type(definition_locator))
         self.assertEqual(definition_locator, DefinitionKey.from_string(text_type(definition_locator)))
 
+    def test_description_locator_from_bytes(self):
+        object_id = '{:024x}'.format(random.randrange(16 ** 24))
+        serialized = 'def-v1:{}+{}@html'.format(object_id, DefinitionLocator.BLOCK_TYPE_PREFIX)
+        self.assertEqual(DefinitionLocator('html', object_id), DefinitionKey.from_bytes(serialized.encode('ascii')))
+
+    def test_description_locator_lazy_object_id(self):
+        object_id = '{:024x}'.format(random.randrange(16 ** 24))
+        parsed = DefinitionKey.from_string('def-v1:{}+{}@html'.format(object_id, DefinitionLocator.BLOCK_TYPE_PREFIX))
+        constructed = DefinitionLocator('html', ObjectId(object_id))
+        self.assertEqual(constructed, parsed)
+        self.assertEqual(hash(constructed), hash(parsed))
+        self.assertEqual(ObjectId(object_id), parsed.definition_id)
+        self.assertIsInstance(parsed.definition_id, ObjectId)
+
     def test_description_locator_version(self):
         object_id = '{:024x}'.format(random.randrange(16 ** 24))
         definition_locator = DefinitionLocator('html', object_id)
@@ -59,3 +95,114 @@ class VersionTreeTests(TestCase):
         test_id = ObjectId(test_id_loc)
         valid_locator = CourseLocator(version_guid=test_id)
         self.assertEqual(VersionTree(valid_locator).children, [])
+
+    def _history(self, parents):
+        """
+        Return the locators of a history in which version `i` is a child of `parents[i]`
+        (None for the root), and its tree_dict.
+        """
+        locators = [CourseLocator(version_guid=ObjectId()) for __ in parents]
+        tree_dict = {}
+        for locator, parent in zip(locators, parents):
+            if parent is not None:
+                tree_dict.setdefault(locators[parent].version_guid, []).append(locator)
+        return locators, tree_dict
+
+    def test_children(self):
+        locators, tree_dict = self._history([None, 0, 0, 1])
+        tree = VersionTree(locators[0], tree_dict)
+        self.assertEqual(locators[0].version_guid, tree.version)
+        self.assertEqual(locators[1:3], [child.locator for child in tree.children])
+        self.assertEqual([locators[3]], [child.locator for child in tree.children[0].children])
+        self.assertEqual([], tree.children[1].children)
+        self.assertIs(tree.children, tree.children)
+        self.assertEqual([locators[index] for index in (0, 1, 3, 2)], [node.locator for node in tree.walk()])
+
+    def test_deep_history(self):
+        count = 10000
+        locators, tree_dict = self._history([None] + list(range(count - 1)))
+        tree = VersionTree(locators[0], tree_dict)
+        node = tree.find(locators[-1].version_guid)
+        self.assertIs(locators[-1], node.locator)
+        self.assertEqual([], node.children)
+        self.assertEqual(count, len(list(tree.walk())))
+
+    def test_find(self):
+        locators, tree_dict = self._history([None, 0, 1, 0])
+        tree = VersionTree(locators[0], tree_dict)
+        self.assertIs(tree, tree.find(locators[0].version_guid))
+        for locator in locators:
+            self.assertIs(locator, tree.children[0].find(locator.version_guid).locator)
+        self.assertIs(tree.find(locators[2].version_guid), tree.children[0].children[0])
+        self.assertIsNone(tree.find(ObjectId()))
+
+    def test_repeated_version(self):
+        locators, tree_dict = self._history([None, 0])
+        tree_dict[locators[1].version_guid] = [locators[0]]
+        tree = VersionTree(locators[0], tree_dict)
+        with self.assertRaises(ValueError):
+            tree.children[0].children  # pylint: disable=pointless-statement
+
+    def test_invalid_child(self):
+        locators, tree_dict = self._history([None, 0])
+        tree_dict[locators[0].version_guid].append(CourseLocator(org="mit.eecs", course="6.002x", run="2014"))
+        tree = VersionTree(locators[0], tree_dict)
+        for __ in range(2):
+            with self.assertRaises(ValueError):
+                tree.children  # pylint: disable=pointless-statement
+        with self.assertRaises(ValueError):
+            tree.find(locators[1].version_guid)
+
+    def test_parents(self):
+        locators, tree_dict = self._history([None, 0, 1, 0])
+        tree = VersionTree(locators[0], tree_dict)
+        node = tree.find(locators[2].version_guid)
+        self.assertEqual(2, node.depth)
+        self.assertIs(tree.children[0], node.parent)
+        self.assertIsNone(tree.parent)
+        self.assertEqual(
+            [locators[1], locators[0]],
+            [ancestor.locator for ancestor in tree.ancestors(locators[2].version_guid)]
+        )
+        self.assertEqual([], tree.ancestors(locators[0].version_guid))
+
+    def test_ancestry(self):
+        rng = random.Random(0)
+        parents = [None] + [rng.randrange(index) for index in range(1, 200)]
+        locators, tree_dict = self._history(parents)
+        tree = VersionTree(locators[0], tree_dict)
+
+        def ancestors(index):
+            """The indexes of the ancestors of `index`, nearest first"""
+            result = []
+            while parents[index] is not None:
+                index = parents[index]
+                result.append(index)
+            return result
+
+        versions = [locator.version_guid for locator in locators]
+        for __ in range(500):
+            index_a, index_b = rng.randrange(len(parents)), rng.randrange(len(parents))
+            self.assertEqual(index_a in ancestors(index_b), tree.is_ancestor(versions[index_a], versions[index_b]))
+            common = [index_a] + ancestors(index_a)
+            expected = next(index for index in [index_b] + ancestors(index_b) if index in common)
+            self.assertIs(locators[expected], tree.lowest_common_ancestor(versions[index_a], versions[index_b]).locator)
+        self.assertEqual(
+            [locators[index] for index in ancestors(150)],
+            [node.locator for node in tree.children[0].ancestors(versions[150])]
+        )
+
+    def test_ancestry_of_one_version(self):
+        tree = VersionTree(CourseLocator(version_guid=ObjectId()))
+        self.assertFalse(tree.is_ancestor(tree.version, tree.version))
+        self.assertIs(tree, tree.lowest_common_ancestor(tree.version, tree.version))
+
+    def test_ancestry_of_unknown_version(self):
+        locators, tree_dict = self._history([None, 0])
+        tree = VersionTree(locators[0], tree_dict)
+        with self.assertRaises(ValueError):
+            tree.ancestors(ObjectId())
+        with self.assertRaises(ValueError):
+            tree.is_ancestor(tree.version, ObjectId())
+        with self.assertRaises(ValueError):
+            tree.lowest_common_ancestor(ObjectId(), tree.version)
@@ -0,0 +1,156 @@
+"""
+Tests of the migration of keys from deprecated to canonical forms
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import ddt
+
+from opaque_keys.edx.catalog import RunCatalog
+from opaque_keys.edx.migrate import KeyMigrator, main, migrate_file
+
+KEYS = [
+    (u'org/course/run', u'course-v1:org+course+run'),
+    (u'slashes:org+course+run', u'course-v1:org+course+run'),
+    (u'i4x://org/course/html/intro', u'block-v1:org+course+run+type@html+block@intro'),
+    (u'i4x://org/course/html/intro@draft', u'block-v1:org+course+run+branch@draft+type@html+block@intro'),
+    (u'location:org+course+run+html+intro', u'block-v1:org+course+run+type@html+block@intro'),
+    (u'/c4x/org/course/asset/logo.png', u'asset-v1:org+course+run+type@asset+block@logo.png'),
+    (u'asset-location:org+course+run+asset+logo.png', u'asset-v1:org+course+run+type@asset+block@logo.png'),
+    (
+        u'aside-usage-v1:i4x://org/course/html/intro::tags',
+        u'aside-usage-v2:block-v1$:org+course+run+type@html+block@intro::tags',
+    ),
+    (
+        u'aside-def-v1:def-v1:519665f6223ebd6980884f2b+type@html::tags',
+        u'aside-def-v2:def-v1$:519665f6223ebd6980884f2b+type@html::tags',
+    ),
+    (u'block-v1:org+course+run+type@html+block@intro', u'block-v1:org+course+run+type@html+block@intro'),
+    (u'i4x://org/unknown/html/intro', u'i4x://org/unknown/html/intro'),
+    (u'not a key', u'not a key'),
+]
+
+
+@ddt.ddt
+class TestKeyMigrator(TestCase):
+    """
+    Tests of :class:`.KeyMigrator`
+    """
+    @ddt.data(*KEYS)
+    @ddt.unpack
+    def test_migrate(self, serialized, migrated):
+        migrator = KeyMigrator(RunCatalog([u'org/course/run']))
+        self.assertEqual(migrated, migrator.migrate(serialized))
+
+    def test_counts(self):
+        migrator = KeyMigrator(RunCatalog([u'org/course/run']))
+        for serialized, __ in KEYS:
+            migrator.migrate(serialized)
+        self.assertEqual({'converted': 9, 'unchanged': 1, 'failed': 2}, migrator.counts)
+
+
+class TestMigrateFile(TestCase):
+    """
+    Tests of :func:`.migrate_file`
+    """
+    def setUp(self):
+        super(TestMigrateFile, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.courses = self.write('courses.txt', u'org/course/run\n')
+        self.output = os.path.join(self.directory, 'output')
+
+    def write(self, name, text):
+        """
+        Write `text` to the file `name` in the temporary directory, and return its path.
+        """
+        path = os.path.join(self.directory, name)
+        with io.open(path, 'w', encoding='utf-8') as output:
+            output.write(text)
+        return path
+
+    def read_output(self):
+        """
+        Return the text of the output file.
+        """
+        with io.open(self.output, encoding='utf-8') as output:
+            return output.read()
+
+    def test_lines(self):
+        source = self.write('keys.txt', u''.join(serialized + u'\n' for serialized, __ in KEYS) + u'\n')
+        counts = migrate_file(source, self.output, courses_path=self.courses, processes=1, chunk_size=2)
+        self.assertEqual(u''.join(migrated + u'\n' for __, migrated in KEYS) + u'\n', self.read_output())
+        self.assertEqual({'converted': 9, 'unchanged': 1, 'failed': 2}, counts)
+        self.assertFalse(os.path.exists(self.output + '.checkpoint'))
+
+    def test_process_pool(self):
+        source = self.write('keys.txt', u''.join(serialized + u'\n' for serialized, __ in KEYS))
+        self.assertEqual(0, main([source, self.output, '--courses', self.courses, '--processes', '2',
+                                  '--chunk-size', '3', '--checkpoint-every', '1']))
+        self.assertEqual(u''.join(migrated + u'\n' for __, migrated in KEYS), self.read_output())
+
+    def test_csv(self):
+        source = self.write('rows.csv', u'id,usage_id,note\n1,i4x://org/course/html/a,"a, b"\n2,,c\n')
+        migrate_file(source, self.output, courses_path=self.courses, csv_columns='usage_id', header=True, processes=1)
+        self.assertEqual(
+            u'id,usage_id,note\n1,block-v1:org+course+run+type@html+block@a,"a, b"\n2,,c\n',
+            self.read_output(),
+        )
+
+    def test_csv_quoted_newlines(self):
+        text = (
+            u'id,usage_id,"multi\nline ""note"""\n'
+            u'1,i4x://org/course/html/a,"multi\nline"\n'
+            u'2,i4x://org/course/html/b,c\n'
+        )
+        source = self.write('rows.csv', text)
+        migrate_file(source, self.output, courses_path=self.courses, csv_columns='usage_id', header=True,
+                     processes=1, chunk_size=1)
+        self.assertEqual(
+            text.replace(u'i4x://org/course/html/', u'block-v1:org+course+run+type@html+block@'),
+            self.read_output(),
+        )
+
+    def test_csv_unterminated_quote(self):
+        source = self.write('rows.csv', u'1,i4x://org/course/html/a,"multi\nline\n')
+        with self.assertRaises(ValueError):
+            migrate_file(source, self.output, courses_path=self.courses, csv_columns='1', processes=1)
+
+    def test_resume(self):
+        lines = [serialized + u'\n' for serialized, __ in KEYS]
+        source = self.write('keys.txt', u''.join(lines))
+        # An interrupted run, which wrote the first two keys (and part of the third) after its checkpoint
+        self.write('output', KEYS[0][1] + u'\n' + KEYS[1][1] + u'\nblock-v1:')
+        with io.open(self.output + '.checkpoint', 'w', encoding='utf-8') as checkpoint:
+            checkpoint.write(json.dumps({
+                'input': os.path.abspath(source),
+                'input_offset': len(u''.join(lines[:2]).encode('utf-8')),
+                'output_offset': len((KEYS[0][1] + u'\n' + KEYS[1][1] + u'\n').encode('utf-8')),
+                'counts': {'converted': 2},
+            }))
+        counts = migrate_file(source, self.output, courses_path=self.courses, processes=1)
+        self.assertEqual(u''.join(migrated + u'\n' for __, migrated in KEYS), self.read_output())
+        self.assertEqual({'converted': 9, 'unchanged': 1, 'failed': 2}, counts)
+
+    def test_checkpoint_past_end_of_output(self):
+        source = self.write('keys.txt', u'org/course/run\n')
+        checkpoint = json.dumps({'input': os.path.abspath(source), 'input_offset': 0, 'output_offset': 50})
+        self.write('output.checkpoint', checkpoint)
+        with self.assertRaises(ValueError):
+            migrate_file(source, self.output, processes=1)
+        self.assertFalse(os.path.exists(self.output))
+
+        self.write('output', u'course-v1:org+course+run\n')
+        with self.assertRaises(ValueError):
+            migrate_file(source, self.output, processes=1)
+        self.assertEqual(u'course-v1:org+course+run\n', self.read_output())
+
+    def test_checkpoint_for_other_input(self):
+        source = self.write('keys.txt', u'org/course/run\n')
+        self.write('output.checkpoint', u'{"input": "/elsewhere"}')
+        with self.assertRaises(ValueError):
+            migrate_file(source, self.output, processes=1)
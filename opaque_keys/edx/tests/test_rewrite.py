@@ -0,0 +1,217 @@
+"""
+Tests of opaque_keys.edx.rewrite
+"""
+import io
+from unittest import TestCase
+
+import ddt
+from six import text_type
+
+from opaque_keys.edx.keys import AssetKey, CourseKey, UsageKey
+from opaque_keys.edx.locator import CourseLocator
+from opaque_keys.edx.rewrite import AssetUrlRewriter, CourseKeyRewriter
+
+SOURCE = CourseLocator('edX', 'DemoX', '2014')
+TARGET = CourseLocator('edX', 'DemoX', '2015')
+DEPRECATED_SOURCE = CourseLocator('MITx', '6.002x', '2012_Fall', deprecated=True)
+DEPRECATED_TARGET = CourseLocator('MITx', '6.002x', '2013_Spring', deprecated=True)
+VERSION = '519665f6223ebd6980884f2b'
+
+TEXT = u'''id,key
+1,course-v1:edX+DemoX+2014
+2,"block-v1:edX+DemoX+2014+branch@draft+type@html+block@intro"
+3,course-v1:edX+DemoX+2014+version@{version}
+4,asset-v1:edX+DemoX+2014+type@asset+block@logo%20small.png
+5,MITx/6.002x/2012_Fall
+6,i4x://MITx/6.002x/problem/Sample_Problem@draft
+7,/c4x/MITx/6.002x/asset/logo%20small.png
+'''.format(version=VERSION)
+
+REWRITTEN = u'''id,key
+1,course-v1:edX+DemoX+2015
+2,"block-v1:edX+DemoX+2015+branch@draft+type@html+block@intro"
+3,course-v1:edX+DemoX+2015+version@{version}
+4,asset-v1:edX+DemoX+2015+type@asset+block@logo%20small.png
+5,course-v1:MITx+6.002x+2012_Fall
+6,block-v1:MITx+6.002x+2012_Fall+branch@draft+type@problem+block@Sample_Problem
+7,asset-v1:MITx+6.002x+2012_Fall+type@asset+block@logo%20small.png
+'''.format(version=VERSION)
+
+
+@ddt.ddt
+class TestCourseKeyRewriter(TestCase):
+    """
+    Tests of :class:`.CourseKeyRewriter`
+    """
+    def setUp(self):
+        super(TestCourseKeyRewriter, self).setUp()
+        self.rewriter = CourseKeyRewriter({
+            SOURCE: TARGET,
+            DEPRECATED_SOURCE: CourseLocator('MITx', '6.002x', '2012_Fall'),
+        })
+
+    def test_rewrite(self):
+        self.assertEqual(REWRITTEN, self.rewriter.rewrite(TEXT))
+        self.assertEqual({SOURCE: 4, DEPRECATED_SOURCE: 3}, self.rewriter.counts)
+        self.assertEqual(0, self.rewriter.skipped)
+
+    def test_rewritten_keys_parse(self):
+        usage_key = UsageKey.from_string('block-v1:edX+DemoX+2014+branch@draft+type@html+block@intro')
+        self.assertEqual(
+            usage_key.replace(course_key=TARGET.for_branch('draft')),
+            UsageKey.from_string(self.rewriter.rewrite(text_type(usage_key))),
+        )
+        asset_key = AssetKey.from_string('/c4x/MITx/6.002x/asset/logo%20small.png')
+        self.assertEqual(
+            asset_key.replace(course_key=CourseLocator('MITx', '6.002x', '2012_Fall')),
+            AssetKey.from_string(self.rewriter.rewrite(text_type(asset_key))),
+        )
+
+    @ddt.data(
+        u'course-v1:edX+DemoX+20145',
+        u'course-v1:Other+DemoX+2014',
+        u'lib-block-v1:edX+DemoX+2014+type@html+block@intro',
+        u'block-v1:edX+DemoX+2014+type@html',
+        u'block-v1:edX+DemoX+2014+type@html+block@bad%id',
+        u'course-v1:edX+DemoX+2014+foo@bar',
+        u'MITx/6.002x/2012_Fall/about',
+        u'/courses/MITx/6.002x/2012_Fall',
+        u'i4x://MITx/6.002x.new/problem/p',
+        u'https://example.com/c4x/MITx/6.002x/asset/logo.png',
+        u'https://example.com/i4x://MITx/6.002x/problem/p',
+    )
+    def test_unchanged(self, text):
+        self.assertEqual(text, self.rewriter.rewrite(text))
+        self.assertEqual({}, self.rewriter.counts)
+
+    def test_skipped(self):
+        text = u'i4x://MITx/6.002x/problem/a%20b'
+        self.assertEqual(text, self.rewriter.rewrite(text))
+        self.assertEqual(1, self.rewriter.skipped)
+
+    def test_deprecated_target(self):
+        rewriter = CourseKeyRewriter([(DEPRECATED_SOURCE, DEPRECATED_TARGET)])
+        self.assertEqual(
+            u'MITx/6.002x/2013_Spring i4x://MITx/6.002x/problem/a%20b@draft',
+            rewriter.rewrite(u'MITx/6.002x/2012_Fall i4x://MITx/6.002x/problem/a%20b@draft'),
+        )
+
+    @ddt.data(1, 7, 64, 1 << 20)
+    def test_rewrite_chunks(self, chunk_size):
+        chunks = [TEXT[index:index + chunk_size] for index in range(0, len(TEXT), chunk_size)]
+        self.assertEqual(REWRITTEN, u''.join(self.rewriter.rewrite_chunks(chunks)))
+
+    @ddt.data(u'x', u'/course-v1:edX+DemoX+2014', u'MITx/6.002x/2012_Fall/')
+    def test_rewrite_long_run_of_key_chars(self, part):
+        run = part * (100000 // len(part))
+        text = u'{},{}{}'.format(run, TEXT, run)
+        expected = self.rewriter.rewrite(text)
+        chunks = [text[index:index + 100] for index in range(0, len(text), 100)]
+        rewritten = list(self.rewriter.rewrite_chunks(chunks))
+        self.assertEqual(expected, u''.join(rewritten))
+        # The run is rewritten as it's read, rather than carried over to the end of it
+        self.assertLess(max(len(part) for part in rewritten), 4000)
+
+    def test_rewrite_file(self):
+        destination = io.StringIO()
+        self.rewriter.rewrite_file(io.StringIO(TEXT), destination, chunk_size=16)
+        self.assertEqual(REWRITTEN, destination.getvalue())
+        self.assertEqual(7, sum(self.rewriter.counts.values()))
+
+    def test_no_courses(self):
+        self.assertEqual(TEXT, CourseKeyRewriter({}).rewrite(TEXT))
+
+    def test_invalid_mappings(self):
+        with self.assertRaises(ValueError):
+            CourseKeyRewriter({SOURCE: DEPRECATED_TARGET})
+        with self.assertRaises(ValueError):
+            CourseKeyRewriter([
+                (DEPRECATED_SOURCE, CourseKey.from_string('course-v1:MITx+6.002x+2012_Fall')),
+                (DEPRECATED_TARGET, CourseKey.from_string('course-v1:MITx+6.002x+2013_Spring')),
+            ])
+
+
+HTML = u'''<p><img src="/c4x/MITx/6.002x/asset/logo%20small.png" alt="logo"/>
+<a href="/asset-v1:edX+DemoX+2014+type@asset+block@notes.pdf?raw">notes</a>
+<a href='asset-v1:edX+DemoX+2014+branch@draft+type@asset+block@notes.pdf#page=2'>draft</a>
+<img src="/c4x/MITx/6.002x/asset/logo%20small.png"/></p>
+'''
+
+REWRITTEN_HTML = u'''<p><img src="https://cdn.example.com/MITx/6.002x/logo%20small.png" alt="logo"/>
+<a href="https://cdn.example.com/edX/DemoX/notes.pdf?raw">notes</a>
+<a href='https://cdn.example.com/edX/DemoX/notes.pdf#page=2'>draft</a>
+<img src="https://cdn.example.com/MITx/6.002x/logo%20small.png"/></p>
+'''
+
+
+@ddt.ddt
+class TestAssetUrlRewriter(TestCase):
+    """
+    Tests of :class:`.AssetUrlRewriter`
+    """
+    def setUp(self):
+        super(TestAssetUrlRewriter, self).setUp()
+        self.asset_keys = []
+        self.rewriter = AssetUrlRewriter(self.url_for)
+
+    def url_for(self, asset_key):
+        """
+        Return the CDN url of `asset_key`, or None for thumbnails.
+        """
+        self.asset_keys.append(asset_key)
+        if asset_key.asset_type == u'thumbnail':
+            return None
+        return u'https://cdn.example.com/{}/{}/{}'.format(asset_key.org, asset_key.course, asset_key.path)
+
+    def test_rewrite(self):
+        self.assertEqual(REWRITTEN_HTML, self.rewriter.rewrite(HTML))
+        self.assertEqual(4, self.rewriter.rewritten)
+        self.assertEqual(0, self.rewriter.skipped)
+        # Each distinct url is only parsed once
+        self.assertEqual(
+            [
+                AssetKey.from_string(u'/c4x/MITx/6.002x/asset/logo%20small.png'),
+                AssetKey.from_string(u'asset-v1:edX+DemoX+2014+type@asset+block@notes.pdf'),
+                AssetKey.from_string(u'asset-v1:edX+DemoX+2014+branch@draft+type@asset+block@notes.pdf'),
+            ],
+            self.asset_keys,
+        )
+
+    @ddt.data(
+        u'http://example.com/c4x/MITx/6.002x/asset/logo.png',
+        u'http://example.com/asset-v1:edX+DemoX+2014+type@asset+block@notes.pdf',
+        u'/static/c4x/MITx/6.002x/asset/logo.png',
+        u'/c4x/MITx/6.002x/asset/logo.png/more',
+        u'/c4x/MITx/6.002x/asset',
+        u'asset-v1:edX+DemoX+2014+type@asset',
+        u'block-v1:edX+DemoX+2014+type@asset+block@notes.pdf',
+        u'xasset-v1:edX+DemoX+2014+type@asset+block@notes.pdf',
+    )
+    def test_unchanged(self, text):
+        self.assertEqual(text, self.rewriter.rewrite(text))
+        self.assertEqual(0, self.rewriter.rewritten)
+        self.assertEqual([], self.asset_keys)
+
+    @ddt.data(
+        u'/c4x/MITx/6.002x/thumbnail/logo.jpg',
+        u'/asset-v1:edX+DemoX+2014+type@thumbnail+block@notes.jpg',
+    )
+    def test_skipped(self, text):
+        html = u'<img src="{}">'.format(text)
+        self.assertEqual(html, self.rewriter.rewrite(html + html)[:len(html)])
+        self.assertEqual(2, self.rewriter.skipped)
+
+    @ddt.data(1, 7, 64, 1 << 20)
+    def test_rewrite_chunks(self, chunk_size):
+        chunks = [HTML[index:index + chunk_size] for index in range(0, len(HTML), chunk_size)]
+        self.assertEqual(REWRITTEN_HTML, u''.join(self.rewriter.rewrite_chunks(chunks)))
+
+    def test_rewrite_file(self):
+        destination = io.StringIO()
+        self.rewriter.rewrite_file(io.StringIO(HTML), destination, chunk_size=16)
+        self.assertEqual(REWRITTEN_HTML, destination.getvalue())
+
+    def test_max_cached(self):
+        rewriter = AssetUrlRewriter(self.url_for, max_cached=1)
+        self.assertEqual(REWRITTEN_HTML, rewriter.rewrite(HTML))
+        self.assertEqual(4, len(self.asset_keys))
@@ -142,6 +142,50 @@ class KeyTests(TestCase):
         with self.assertRaises(InvalidKeyError):
             DummyKey.from_string(u'\xfb:abcd')
 
+    def test_from_bytes(self):
+        self.assertEqual(DummyKey.from_bytes(b'hex:0x10'), DummyKey.from_string('hex:0x10'))
+        self.assertEqual(DummyKey.from_buffer(memoryview(b'base10:15')), DummyKey.from_string('base10:15'))
+        self.assertEqual(DummyKey.from_buffer(bytearray(b'base10:15')), DummyKey.from_string('base10:15'))
+        self.assertEqual(
+            DummyKey.from_bytes(u'dict:{"foo": "\xfb"}'.encode('utf-8')),
+            DummyKey.from_string(u'dict:{"foo": "\xfb"}')
+        )
+
+    def test_bad_bytes_keys(self):
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(b'hex:10')
+
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(b'0x10')
+
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(b'\xfb:abcd')
+
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(b'dict:"\xfb"')
+
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(None)
+
+    def test_max_key_length(self):
+        DummyKey.MAX_KEY_LENGTH = 10
+        self.addCleanup(delattr, DummyKey, 'MAX_KEY_LENGTH')
+
+        self.assertEqual(DummyKey.from_string('hex:0x10'), DummyKey.from_bytes(b'hex:0x10'))
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_string('hex:0x10000')
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_bytes(b'base10:1000')
+
+    def test_default_max_key_length(self):
+        serialized = 'hex:0x' + '1' * 2000
+        with self.assertRaises(InvalidKeyError):
+            DummyKey.from_string(serialized)
+
+        DummyKey.MAX_KEY_LENGTH = None
+        self.addCleanup(delattr, DummyKey, 'MAX_KEY_LENGTH')
+        self.assertEqual(int('1' * 2000, 16), DummyKey.from_string(serialized).value)
+
     def test_unknown_namespace(self):
         with self.assertRaises(InvalidKeyError):
             DummyKey.from_string('no_namespace:0x10')
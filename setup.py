@@ -40,6 +40,7 @@ setup(
         ],
         'asset_key': [
             'asset-v1 = opaque_keys.edx.locator:AssetLocator',
+            'asset-location = opaque_keys.edx.locations:DeprecatedAssetLocation',
         ],
         'definition_key': [
             'def-v1 = opaque_keys.edx.locator:DefinitionLocator',